@@ -21,5 +21,7 @@ __all__ = [
     'GITHUB',
     'PATHS',
     'CATEGORIES',
+    'SEARCH',
+    'STORAGE',
     'MESSAGES',
 ]
@@ -38,6 +38,10 @@ class COLORS:
     HOVER_DARK = "#404040"
     HOVER_LIGHT = "#505050"
     HOVER_DANGER = "#e81123"
+    
+    # Подсветка совпадений с поисковым запросом
+    HIGHLIGHT_BG = "#5c4b00"
+    HIGHLIGHT_TEXT = "#FFD54F"
 
 
 # ==================== ШРИФТЫ ====================
@@ -124,3 +128,10 @@ class UI_CONFIG:
     
     # Статус-бар
     STATUS_MESSAGE_DURATION = 2000  # ms
+    
+    # Постепенная отрисовка длинных списков шаблонов
+    RENDER_FIRST_BATCH = 50     # Карточек сразу (первый экран)
+    RENDER_BATCH = 10           # Карточек за один проход цикла событий
+    
+    # Панель фильтра по тегам
+    TAG_BAR_LIMIT = 15          # Сколько самых частых тегов показывать
@@ -36,6 +36,18 @@ class PATHS:
     TEMPLATES_CLIENTS = os.path.join(APP_DATA_DIR, "templates_clients.json")
     TEMPLATES_COLLEAGUES = os.path.join(APP_DATA_DIR, "templates_colleagues.json")
     
+    # Снимок поискового индекса (быстрый запуск без построения индекса)
+    INDEX_SNAPSHOT = os.path.join(APP_DATA_DIR, "search_index.bin")
+    
+    # Журнал изменений шаблонов (ещё не перенесённых в файлы шаблонов)
+    TEMPLATES_JOURNAL = os.path.join(APP_DATA_DIR, "templates.journal")
+    
+    # База шаблонов (хранилище SQLite)
+    TEMPLATES_DB = os.path.join(APP_DATA_DIR, "templates.db")
+    
+    # Счётчики использования шаблонов (записи фиксированной ширины)
+    USAGE_COUNTERS = os.path.join(APP_DATA_DIR, "usage_counters.bin")
+    
     # Системные файлы
     VERSION_FILE = "version.json"
     ICON_FILE = "icon.ico"
@@ -125,6 +137,69 @@ class CATEGORIES:
         return None
 
 
+# ==================== ПОИСК ====================
+class SEARCH:
+    """Настройки поискового индекса"""
+    # Режим проверки: после каждого изменения шаблонов сравнивать
+    # инкрементальный индекс с построенным заново (медленно, для отладки)
+    CHECK_INDEX_CONSISTENCY = os.getenv('HELPER_CHECK_INDEX') == '1'
+    
+    # Ранжирование BM25
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+    TITLE_BOOST = 2.5           # Вес совпадения в названии относительно текста
+    PINNED_PRIOR = 1.0          # Бонус закреплённым шаблонам
+    USAGE_PRIOR_WEIGHT = 0.3    # Вес log(1 + число копирований)
+    RANKED_RESULTS_LIMIT = 50   # Сколько лучших результатов отбирать
+    
+    # Нечёткий поиск (индекс удалений)
+    FUZZY_MAX_DISTANCE = 2              # Максимум опечаток в слове
+    FUZZY_PREFIX_LENGTH = 7             # Длина префикса для вариантов удалений
+    FUZZY_MIN_WORD_LENGTH = 4           # Более короткие слова не исправляются
+    FUZZY_DISTANCE_2_WORD_LENGTH = 8    # С этой длины допускаются 2 опечатки
+    
+    # Неверная раскладка и транслит
+    LAYOUT_SWAP = True                  # Искать набранное в другой раскладке
+    TRANSLIT = True                     # Искать кириллицу по латинской записи
+    ALTERNATE_MIN_LENGTH = 3            # Более короткие части запроса не переводятся
+    
+    # Морфологическая нормализация (одинаково для шаблонов и запроса)
+    NORMALIZE_TEXT = True               # NFKC, casefold, ё -> е
+    # Основы слов (Snowball): "доставками" находит "доставка", но слово
+    # индексируется только основой, и часть окончания ("ками") уже не найти
+    STEMMING = False                    # Сводить слова к основам
+    
+    # Фразы в кавычках и NEAR/k (позиционный индекс, +8 байт на каждое слово)
+    PHRASE_QUERIES = True
+    
+    # Кэш результатов запросов (поиск по мере ввода)
+    QUERY_CACHE_SIZE = 128              # Сколько последних запросов помнить
+    
+    # Выдача результатов частями (для больших категорий)
+    STREAM_FIRST_CHUNK = 50             # Первая часть - как можно быстрее
+    STREAM_CHUNK = 200                  # Остальные части
+
+
+# ==================== ХРАНЕНИЕ ====================
+class STORAGE:
+    """Настройки сохранения шаблонов"""
+    # Хранилище: "json" - файл на каждый тип категорий, "sqlite" - база
+    # SQLite с полнотекстовым поиском (шаблоны из JSON переносятся в неё
+    # при первом запуске)
+    BACKEND = os.getenv('HELPER_STORAGE', 'json')
+    
+    # Журнал изменений (JSON): каждое изменение дописывается в журнал одной
+    # строкой, а файлы шаблонов перезаписываются в фоне (контрольная точка)
+    JOURNAL = True
+    CHECKPOINT_BYTES = 256 * 1024       # Контрольная точка при таком размере журнала
+    CHECKPOINT_AGE_S = 30               # Или через столько секунд после первой записи
+    
+    # Формат файлов шаблонов (JSON): "pretty" - с отступами, "compact" -
+    # без отступов, "orjson" - компактный через orjson, "auto" - orjson,
+    # если он установлен, иначе compact (см. scripts/serialization_benchmark.py)
+    FORMAT = os.getenv('HELPER_FORMAT', 'auto')
+
+
 # ==================== СООБЩЕНИЯ ====================
 class MESSAGES:
     """Текстовые сообщения приложения"""
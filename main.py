@@ -2,7 +2,7 @@
 Точка входа приложения Template Helper
 """
 import customtkinter as ctk
-from models.template_manager import TemplateManager
+from models.template_manager import create_template_manager
 from views.main_window import MainWindow
 from views.welcome_window import WelcomeWindow
 from config import UI_CONFIG
@@ -28,13 +28,17 @@ def main():
         PATHS.mark_first_run_complete()
     
     # Инициализация менеджера шаблонов
-    template_manager = TemplateManager()
+    template_manager = create_template_manager()
     
     # Создание главного окна приложения
     app = MainWindow(root, template_manager)
     
-    # Запуск главного цикла
-    root.mainloop()
+    # Запуск главного цикла; отложенные изменения и снимок поискового
+    # индекса дописываются и при выходе по ошибке
+    try:
+        root.mainloop()
+    finally:
+        template_manager.close()
 
 
 if __name__ == "__main__":
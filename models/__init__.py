@@ -1,3 +1,3 @@
-from .template_manager import TemplateManager
+from .template_manager import TemplateManager, create_template_manager
 
-__all__ = ['TemplateManager']
\ No newline at end of file
+__all__ = ['TemplateManager', 'create_template_manager']
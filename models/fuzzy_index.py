@@ -0,0 +1,224 @@
+"""
+Индекс опечаток по принципу SymSpell (окрестность удалений)
+
+Для каждого термина заранее сохраняются все варианты его префикса с
+удалёнными 0..N символами. Запрос с опечаткой порождает такие же варианты,
+и совпавшие ключи дают кандидатов без сравнения со всем словарём.
+Кандидаты проверяются ограниченным расстоянием Дамерау-Левенштейна.
+"""
+from typing import Dict, List, Set
+
+
+class DeletionIndex:
+    """
+    Индекс удалений над словарём терминов.
+    
+    Варианты хранятся по уровням (сколько символов удалено из термина):
+    зная число удалений с обеих сторон, большую часть кандидатов можно
+    принять или отбросить без подсчёта расстояния. Для длинных терминов
+    так же индексируется окончание: слову длиннее префикса подходят только
+    термины, у которых совпали и начало, и конец.
+    
+    Attributes:
+        max_distance (int): Максимальное расстояние редактирования
+        prefix_length (int): Длина префикса, из которого строятся удаления
+            (ограничивает число вариантов на термин)
+    """
+    
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        
+        # Уровень удалений -> {вариант: ID терминов}.
+        # Один ID хранится числом, несколько - списком (экономия памяти)
+        self.levels: List[Dict[str, object]] = [{} for _ in range(max_distance + 1)]
+        
+        # То же для окончаний терминов, которые могут совпасть
+        # со словом длиннее префикса
+        self.suffix_levels: List[Dict[str, object]] = [{} for _ in range(max_distance + 1)]
+    
+    def __len__(self) -> int:
+        """Общее число вариантов в индексе"""
+        return sum(len(level) for level in self.levels + self.suffix_levels)
+    
+    def add(self, term_id: int, term: str) -> None:
+        """Добавить термин в индекс"""
+        self._add_variants(self.levels, term_id, term[:self.prefix_length])
+        if len(term) > self.prefix_length - self.max_distance:
+            self._add_variants(self.suffix_levels, term_id, term[-self.prefix_length:])
+    
+    def clear(self) -> None:
+        """Очистить индекс"""
+        for level in self.levels + self.suffix_levels:
+            level.clear()
+    
+    def lookup(self, word: str, terms: List[str], max_distance: int) -> Set[int]:
+        """
+        Найти термины на расстоянии не больше max_distance от слова.
+        
+        Args:
+            word: Слово запроса (возможно, с опечаткой)
+            terms: Словарь терминов (ID -> термин)
+            max_distance: Допустимое расстояние (не больше self.max_distance)
+        
+        Returns:
+            Множество ID подходящих терминов
+        """
+        max_distance = min(max_distance, self.max_distance)
+        
+        # Кандидаты по сумме удалений из слова и из термина
+        by_deletions = self._collect(self.levels, word[:self.prefix_length], max_distance)
+        
+        word_is_whole = len(word) <= self.prefix_length
+        if not word_is_whole:
+            ending_matches = set()
+            for candidates in self._collect(self.suffix_levels,
+                                            word[-self.prefix_length:], max_distance):
+                ending_matches |= candidates
+            by_deletions = [candidates & ending_matches for candidates in by_deletions]
+        
+        result = set()
+        seen = set()
+        for deletions, candidates in enumerate(by_deletions):
+            # Каждый кандидат проверяется на минимальной сумме удалений
+            candidates -= seen
+            seen |= candidates
+            for term_id in candidates:
+                term = terms[term_id]
+                if abs(len(term) - len(word)) > max_distance:
+                    continue
+                
+                if word_is_whole and len(term) <= self.prefix_length:
+                    if deletions <= max_distance:
+                        # Общая подпоследовательность: deletions вставок/удалений
+                        result.add(term_id)
+                        continue
+                    if deletions == 2 * max_distance:
+                        # Подходят только замены и перестановки при равной длине
+                        if len(term) != len(word):
+                            continue
+                        mismatches = sum(map(str.__ne__, word, term))
+                        if mismatches <= max_distance:
+                            result.add(term_id)
+                            continue
+                        if mismatches > 2 * max_distance:
+                            continue
+                
+                if bounded_distance(word, term, max_distance) <= max_distance:
+                    result.add(term_id)
+        
+        return result
+    
+    def _collect(self, levels: List[Dict[str, object]], word: str,
+                 max_distance: int) -> List[Set[int]]:
+        """Кандидаты из уровней индекса, сгруппированные по сумме удалений"""
+        by_deletions = [set() for _ in range(2 * max_distance + 1)]
+        variants = self._delete_levels(word, max_distance)
+        for word_level, keys in enumerate(variants):
+            for key in keys:
+                for term_level in range(max_distance + 1):
+                    found = levels[term_level].get(key)
+                    if found is None:
+                        continue
+                    candidates = by_deletions[word_level + term_level]
+                    if isinstance(found, list):
+                        candidates.update(found)
+                    else:
+                        candidates.add(found)
+        return by_deletions
+    
+    @staticmethod
+    def _add_variants(levels: List[Dict[str, object]], term_id: int, word: str) -> None:
+        """Записать варианты удалений слова в уровни индекса"""
+        for level, keys in zip(levels, DeletionIndex._delete_levels(word, len(levels) - 1)):
+            for key in keys:
+                current = level.get(key)
+                if current is None:
+                    level[key] = term_id
+                elif isinstance(current, list):
+                    current.append(term_id)
+                else:
+                    level[key] = [current, term_id]
+    
+    @staticmethod
+    def _delete_levels(word: str, distance: int) -> List[Set[str]]:
+        """Варианты слова по числу удалённых символов (0..distance)"""
+        levels = [{word}]
+        for _ in range(distance):
+            next_level = set()
+            for variant in levels[-1]:
+                for i in range(len(variant)):
+                    next_level.add(variant[:i] + variant[i + 1:])
+            levels.append(next_level)
+        return levels
+
+
+def bounded_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (вариант OSA) с ранним выходом.
+    
+    Общие префикс и суффикс отбрасываются, одна правка проверяется за
+    линейное время, иначе считается только полоса |i - j| <= max_distance.
+    
+    Returns:
+        Расстояние, либо max_distance + 1 если оно заведомо больше
+    """
+    if a == b:
+        return 0
+    
+    too_far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return too_far
+    
+    # Общие префикс и суффикс не влияют на расстояние
+    start = 0
+    limit = min(len(a), len(b))
+    while start < limit and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    len_a, len_b = len(a), len(b)
+    
+    # После обрезки осталась одна вставка, удаление, замена или перестановка
+    if len_a <= 1 and len_b <= 1:
+        return 1
+    if len_a == len_b == 2 and a[0] == b[1] and a[1] == b[0]:
+        return 1
+    if max_distance < 2:
+        return too_far
+    if not a or not b:
+        distance = len_a or len_b
+        return distance if distance <= max_distance else too_far
+    
+    # Полоса шириной max_distance вокруг диагонали, остальное - "бесконечность"
+    previous_previous = None
+    previous = [j if j <= max_distance else too_far for j in range(len_b + 1)]
+    for i in range(1, len_a + 1):
+        current = [too_far] * (len_b + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = too_far
+        char_a = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len_b, i + max_distance) + 1):
+            cost = 0 if char_a == b[j - 1] else 1
+            value = previous[j - 1] + cost
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (previous_previous is not None and j > 1
+                    and char_a == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous_previous[j - 2] + 1 < value):
+                value = previous_previous[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous_previous, previous = previous, current
+    
+    distance = previous[len_b]
+    return distance if distance <= max_distance else too_far
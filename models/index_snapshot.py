@@ -0,0 +1,215 @@
+"""
+Снимок поискового индекса на диске для быстрого запуска
+
+Формат файла:
+    MAGIC (4 байта) | версия формата (uint32) | длина ключа (uint32)
+    | ключ (JSON, UTF-8) | SHA-256 данных (32 байта) | данные
+
+Данные:
+    длина описания (uint64) | описание (JSON, UTF-8) | разделы массивов
+
+Ключ описывает, из чего построен индекс: настройки нормализации и
+состояние файлов шаблонов (хэш содержимого и mtime). Файл читается через
+mmap: ключ сверяется до разбора данных, данные проверяются по контрольной
+сумме, поэтому устаревший или повреждённый снимок просто отбрасывается.
+
+Данные не содержат ничего исполняемого: словари и списки строк лежат в
+описании (JSON), массивы номеров - в разделах как есть (байты array) и
+копируются из отображённого файла без разбора. Словарь, все значения
+которого - array одного типа (списки вхождений), хранится двумя
+разделами: все значения подряд и границы значения каждого ключа.
+"""
+import gc
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import islice
+from typing import Dict, List, Optional
+
+
+MAGIC = b"HTSI"
+
+# Версия формата: увеличивается при любом изменении структуры индекса
+SNAPSHOT_VERSION = 4
+
+# Заголовок: MAGIC, версия, длина ключа
+_HEADER = struct.Struct("<4sII")
+_DIGEST_SIZE = hashlib.sha256().digest_size
+
+# Длина описания данных
+_META_LENGTH = struct.Struct("<Q")
+
+# Тип границ значений в словаре массивов
+_OFFSETS_TYPECODE = 'Q'
+
+
+def _encode_key(key) -> bytes:
+    """Ключ снимка в каноническом виде"""
+    return json.dumps(key, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+def _is_array_map(value) -> bool:
+    """Словарь, все значения которого - array одного типа"""
+    if not isinstance(value, dict) or not value:
+        return False
+    typecodes = {getattr(item, 'typecode', None) for item in value.values()}
+    return len(typecodes) == 1 and all(isinstance(item, array) for item in value.values())
+
+
+def _encode_state(state: dict) -> List[bytes]:
+    """
+    Данные снимка по частям: длина описания, описание, разделы массивов.
+    
+    Значения state - JSON-совместимые данные, array или словари array.
+    """
+    sections = []
+    size = 0
+    
+    def add_section(values: array) -> list:
+        nonlocal size
+        raw = values.tobytes()
+        sections.append(raw)
+        entry = [values.typecode, values.itemsize, size, len(values)]
+        size += len(raw)
+        return entry
+    
+    meta = {"byteorder": sys.byteorder, "values": {}, "arrays": {}, "array_maps": {}}
+    for name, value in state.items():
+        if isinstance(value, array):
+            meta["arrays"][name] = add_section(value)
+        elif _is_array_map(value):
+            keys = list(value)
+            joined = array(value[keys[0]].typecode)
+            offsets = array(_OFFSETS_TYPECODE, [0])
+            for key in keys:
+                joined.extend(value[key])
+                offsets.append(len(joined))
+            meta["array_maps"][name] = [keys, add_section(offsets), add_section(joined)]
+        else:
+            meta["values"][name] = value
+    
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return [_META_LENGTH.pack(len(meta_bytes)), meta_bytes, *sections]
+
+
+def _decode_state(payload: memoryview) -> dict:
+    """Разобрать данные снимка (ValueError и др. - если данные не того вида)"""
+    (meta_length,) = _META_LENGTH.unpack_from(payload, 0)
+    start = _META_LENGTH.size + meta_length
+    meta = json.loads(bytes(payload[_META_LENGTH.size:start]))
+    if meta["byteorder"] != sys.byteorder:
+        raise ValueError("снимок записан с другим порядком байт")
+    
+    def load_section(entry: list) -> array:
+        typecode, itemsize, offset, count = entry
+        values = array(typecode)
+        if values.itemsize != itemsize:
+            raise ValueError("снимок записан с другим размером элементов")
+        end = start + offset + count * itemsize
+        if end > len(payload):
+            raise ValueError("раздел массива за концом данных")
+        values.frombytes(payload[start + offset:end])
+        return values
+    
+    state = dict(meta["values"])
+    for name, entry in meta["arrays"].items():
+        state[name] = load_section(entry)
+    for name, (keys, offsets_entry, values_entry) in meta["array_maps"].items():
+        offsets = load_section(offsets_entry)
+        values = load_section(values_entry)
+        if len(offsets) != len(keys) + 1:
+            raise ValueError("границы массивов не соответствуют ключам")
+        state[name] = {key: values[begin:end]
+                       for key, begin, end in zip(keys, offsets, islice(offsets, 1, None))}
+    return state
+
+
+def write_snapshot(path: str, key, state: Dict[str, object]) -> bool:
+    """
+    Записать снимок атомарно (временный файл + замена).
+    
+    Args:
+        path: Путь к файлу снимка
+        key: Ключ (JSON-совместимый), с которым снимок будет прочитан
+        state: Данные индекса: JSON-совместимые значения, array
+            и словари array одного типа
+    
+    Returns:
+        bool: True если снимок записан
+    """
+    key_bytes = _encode_key(key)
+    parts = _encode_state(state)
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part)
+    
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(key_bytes)))
+            f.write(key_bytes)
+            f.write(digest.digest())
+            for part in parts:
+                f.write(part)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        print(f"Ошибка при сохранении снимка индекса: {e}")
+        return False
+
+
+def read_snapshot(path: str, key) -> Optional[dict]:
+    """
+    Прочитать снимок, если он построен для того же ключа и не повреждён.
+    
+    Args:
+        path: Путь к файлу снимка
+        key: Ожидаемый ключ
+    
+    Returns:
+        Данные индекса (словари массивов - обычными dict) или None
+        (нет снимка, другой ключ или повреждение)
+    """
+    if not os.path.exists(path):
+        return None
+    
+    key_bytes = _encode_key(key)
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if len(mapped) < _HEADER.size:
+                return None
+            magic, version, key_length = _HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or version != SNAPSHOT_VERSION:
+                return None
+            
+            # Ключ сверяется до чтения данных: устаревший снимок не разбирается
+            offset = _HEADER.size
+            if mapped[offset:offset + key_length] != key_bytes:
+                return None
+            offset += key_length
+            digest = mapped[offset:offset + _DIGEST_SIZE]
+            offset += _DIGEST_SIZE
+            
+            with memoryview(mapped) as view, view[offset:] as payload:
+                if hashlib.sha256(payload).digest() != digest:
+                    print("Снимок индекса повреждён, индекс будет построен заново")
+                    return None
+                
+                # Сборщик мусора на время разбора отключаем: миллионы новых
+                # контейнеров иначе заставляют его многократно обходить кучу
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    return _decode_state(payload)
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+        print(f"Ошибка при чтении снимка индекса: {e}")
+        return None
@@ -0,0 +1,80 @@
+"""
+Раскладка клавиатуры и транслитерация для поиска
+
+Оператор может набрать запрос в неверной раскладке ("ifkjy" вместо "шаблон")
+или латиницей ("shablon"). Функции модуля переводят слово в такие
+альтернативные написания, чтобы их можно было проиндексировать заранее.
+"""
+from typing import Set
+
+
+# Клавиши ЙЦУКЕН и QWERTY в одинаковом порядке
+RU_KEYS = "ёйцукенгшщзхъфывапролджэячсмитьбю"
+EN_KEYS = "`qwertyuiop[]asdfghjkl;'zxcvbnm,."
+
+# Перевод в обе стороны одной таблицей: наборы символов не пересекаются
+_LAYOUT_TABLE = str.maketrans(RU_KEYS + EN_KEYS, EN_KEYS + RU_KEYS)
+
+# Кириллица -> латиница (упрощённая общепринятая схема)
+_TRANSLIT_TABLE = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'c', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+# Сведение вариантов латинского написания к одному (порядок важен)
+_TRANSLIT_FOLDS = [
+    ('shch', 'sch'), ('kh', 'h'), ('ts', 'c'), ('tz', 'c'), ('ph', 'f'),
+    ('x', 'ks'), ('j', 'y'), ('w', 'v'), ('q', 'k'), ('yo', 'e'),
+]
+
+
+def swap_layout(text: str) -> str:
+    """Текст, набранный в другой раскладке (ЙЦУКЕН <-> QWERTY)"""
+    return text.translate(_LAYOUT_TABLE)
+
+
+def translit_key(text: str) -> str:
+    """
+    Нормализованная латинская запись текста.
+    
+    Кириллица транслитерируется, варианты написания ("kh"/"h", "j"/"y")
+    сводятся к одному: "хост", "host" и "khost" дают один ключ.
+    """
+    key = text.translate(_TRANSLIT_TABLE)
+    for variant, canonical in _TRANSLIT_FOLDS:
+        key = key.replace(variant, canonical)
+    return key
+
+
+def has_cyrillic(text: str) -> bool:
+    """Есть ли в тексте кириллица"""
+    return any('а' <= char <= 'я' or char == 'ё' for char in text)
+
+
+def has_latin(text: str) -> bool:
+    """Есть ли в тексте латинские буквы"""
+    return any('a' <= char <= 'z' for char in text)
+
+
+def alternate_keys(term: str, layout: bool = True, translit: bool = True) -> Set[str]:
+    """
+    Альтернативные написания термина для индекса.
+    
+    Args:
+        term: Термин в нижнем регистре
+        layout: Добавить написание в другой раскладке
+        translit: Добавить транслитерацию (для кириллических терминов)
+    
+    Returns:
+        Множество ключей, отличных от самого термина
+    """
+    keys = set()
+    if layout:
+        keys.add(swap_layout(term))
+    if translit and has_cyrillic(term):
+        keys.add(translit_key(term))
+    keys.discard(term)
+    return keys
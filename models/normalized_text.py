@@ -0,0 +1,121 @@
+"""
+Кэш нормализованных полей шаблонов
+
+Поиск сравнивает текст в одной форме (text_normalizer: NFKC, casefold,
+ё -> е; пробелы схлопнуты до одного). Для каждого шаблона эта форма
+названия, текста и тегов считается один раз - при загрузке (построении
+индекса) или после изменения шаблона - и дальше берётся из кэша всеми
+путями поиска: индексом и поиском просмотром, пока индекс строится.
+
+Запись помнит поколение шаблона. TemplateManager увеличивает его при
+изменении шаблона (touch), и следующее обращение пересчитывает запись.
+"""
+from functools import lru_cache
+from typing import Dict, Hashable, NamedTuple, Tuple
+
+from config.settings import SEARCH
+from models.text_normalizer import normalize_text
+
+
+class NormalizedFields(NamedTuple):
+    """Нормализованные поля шаблона"""
+    generation: Tuple[int, bool]    # (поколение шаблона, режим нормализации)
+    title: str                      # Название
+    text: str                       # Текст (без тегов)
+    tags: Tuple[str, ...]           # Каждый тег (в порядке шаблона)
+
+
+def normalize_search_text(text: str) -> str:
+    """Нормализовать текст (или только привести к нижнему регистру)"""
+    if SEARCH.NORMALIZE_TEXT:
+        return normalize_text(text)
+    return text.lower()
+
+
+def normalize_field(text) -> str:
+    """Нормализованное поле шаблона: с одним пробелом между словами"""
+    return " ".join(normalize_search_text(str(text)).split())
+
+
+def normalize_token(word: str) -> str:
+    """Нормализовать отдельное слово исходного текста (через кэш слов)"""
+    return _normalize_token(word, SEARCH.NORMALIZE_TEXT)
+
+
+@lru_cache(maxsize=65536)
+def _normalize_token(word: str, full: bool) -> str:
+    """Нормализация слова в заданном режиме (full - как normalize_text)"""
+    return normalize_text(word) if full else word.lower()
+
+
+class NormalizedTextCache:
+    """
+    Нормализованные поля шаблонов по их ID.
+    
+    Без блокировки: одновременный пересчёт одной записи из двух потоков
+    даёт одинаковый результат, а операции со словарями атомарны.
+    """
+    
+    def __init__(self):
+        self._entries: Dict[Hashable, NormalizedFields] = {}
+        self._generations: Dict[Hashable, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def _key(template: dict) -> Hashable:
+        """Ключ шаблона (как в поисковом индексе: ID или id() объекта)"""
+        return template.get('id') or id(template)
+    
+    def get(self, template: dict) -> NormalizedFields:
+        """Нормализованные поля шаблона (пересчитываются после touch)"""
+        key = self._key(template)
+        generation = (self._generations.get(key, 0), SEARCH.NORMALIZE_TEXT)
+        entry = self._entries.get(key)
+        if entry is None or entry.generation != generation:
+            entry = self._compute(template, generation)
+            self._entries[key] = entry
+        return entry
+    
+    @staticmethod
+    def _compute(template: dict, generation: Tuple[int, bool]) -> NormalizedFields:
+        """Нормализовать поля шаблона"""
+        tags = template.get('tags')
+        return NormalizedFields(
+            generation,
+            normalize_field(template.get('title', '')),
+            normalize_field(template.get('text', '')),
+            tuple(normalize_field(tag) for tag in tags) if isinstance(tags, list) else (),
+        )
+    
+    def is_fresh(self, template: dict) -> bool:
+        """Совпадает ли запись с полями шаблона (для проверки согласованности)"""
+        entry = self._entries.get(self._key(template))
+        return entry is None or entry[1:] == self._compute(template, entry.generation)[1:]
+    
+    def touch(self, template_id: Hashable) -> None:
+        """Шаблон изменился: запись будет пересчитана при следующем обращении"""
+        self._generations[template_id] = self._generations.get(template_id, 0) + 1
+        self._entries.pop(template_id, None)
+    
+    def forget(self, template_id: Hashable) -> None:
+        """Шаблон удалён"""
+        self._generations.pop(template_id, None)
+        self._entries.pop(template_id, None)
+    
+    def clear(self) -> None:
+        """Забыть все шаблоны (например, перед загрузкой из файлов)"""
+        self._entries.clear()
+        self._generations.clear()
+
+
+# Общий кэш (синглтон)
+_normalized_cache = None
+
+def get_normalized_cache() -> NormalizedTextCache:
+    """Получить общий кэш нормализованных полей"""
+    global _normalized_cache
+    if _normalized_cache is None:
+        _normalized_cache = NormalizedTextCache()
+    return _normalized_cache
@@ -0,0 +1,198 @@
+"""
+Списки вхождений (postings) на компактных массивах
+
+Список - отсортированный array('I') плотных порядковых номеров: 4 байта
+на вхождение вместо записи в set (десятки байт на элемент). Пересечение -
+слияние двух списков: линейное, когда длины близки, и галопом (бинарный
+поиск по большему списку от предыдущей позиции), когда сильно различаются;
+номера совсем короткого списка просто ищутся в другом по одному.
+Объединение - k-way слияние: немногие списки сливаются сортировкой по
+готовым отсортированным участкам, множество списков - отметками в
+битовой карте номеров, которая сразу даёт отсортированный результат.
+Пересечение с объединением плотных списков отбирает номера прямо по
+отметкам, не собирая само объединение.
+
+Позиционные списки (слово -> где именно оно стоит) хранят в одном
+array('Q') пары (номер шаблона, позиция слова), упакованные в число.
+Они отсортированы, поэтому записи одного шаблона лежат подряд: их
+диапазон находится бинарным поиском и удаляется одним срезом.
+"""
+from array import array
+from bisect import bisect_left
+from itertools import chain, compress, islice
+from operator import ne
+from typing import Iterable, List, Tuple
+
+
+# Тип элементов: беззнаковое 32-битное число
+TYPECODE = 'I'
+
+# Позиционная запись: (номер << POSITION_BITS) | позиция (64 бита)
+POSITION_TYPECODE = 'Q'
+POSITION_BITS = 16
+POSITION_MASK = (1 << POSITION_BITS) - 1
+
+# Во сколько раз больший список должен быть длиннее меньшего,
+# чтобы галоп был выгоднее линейного слияния
+GALLOP_RATIO = 8
+
+# Список не длиннее этого проверяется поиском каждого номера в другом
+# списке (без выбора способа и без слияния)
+SMALL_LIST_SIZE = 4
+
+# Объединение идёт через битовую карту, когда записей в списках больше
+# 1/DENSE_UNION_RATIO диапазона номеров (иначе - слиянием участков)
+DENSE_UNION_RATIO = 8
+
+
+def new_postings(values: Iterable[int] = ()) -> array:
+    """Новый список вхождений (values должны быть отсортированы)"""
+    return array(TYPECODE, values)
+
+
+def add_posting(postings: array, value: int) -> None:
+    """Добавить номер в список, сохранив порядок (в конец - за O(1))"""
+    if not postings or postings[-1] < value:
+        postings.append(value)
+        return
+    index = bisect_left(postings, value)
+    if index == len(postings) or postings[index] != value:
+        postings.insert(index, value)
+
+
+def remove_posting(postings: array, value: int) -> bool:
+    """Удалить номер из списка; True если он там был"""
+    index = bisect_left(postings, value)
+    if index < len(postings) and postings[index] == value:
+        del postings[index]
+        return True
+    return False
+
+
+def union_postings(lists: List[array]) -> array:
+    """
+    Объединение списков (отсортированное, без повторов).
+    
+    Единственный список возвращается как есть - его нельзя изменять.
+    """
+    lists = [postings for postings in lists if postings]
+    if not lists:
+        return new_postings()
+    if len(lists) == 1:
+        return lists[0]
+    
+    size = max(postings[-1] for postings in lists) + 1
+    total = sum(map(len, lists))
+    if total * DENSE_UNION_RATIO >= size:
+        return new_postings(compress(range(size), _marks(lists, size)))
+    
+    # sorted() находит готовые отсортированные участки и сливает их
+    merged = sorted(chain.from_iterable(lists))
+    result = new_postings(compress(merged, map(ne, merged, islice(merged, 1, None))))
+    result.append(merged[-1])
+    return result
+
+
+def intersect_union(postings: array, lists: List[array]) -> Tuple[array, int]:
+    """
+    Пересечение списка с объединением lists и размер этого объединения.
+    
+    Для плотных lists объединение не строится: номера postings
+    отбираются по отметкам битовой карты.
+    """
+    lists = [other for other in lists if other]
+    if not lists:
+        return new_postings(), 0
+    
+    size = max(other[-1] for other in lists) + 1
+    if sum(map(len, lists)) * DENSE_UNION_RATIO < size:
+        union = union_postings(lists)
+        return intersect_postings(postings, union), len(union)
+    
+    marks = _marks(lists, size)
+    end = bisect_left(postings, size)
+    within = postings[:end] if end < len(postings) else postings
+    return new_postings(compress(within, map(marks.__getitem__, within))), marks.count(1)
+
+
+def intersect_postings(first: array, second: array) -> array:
+    """Пересечение двух отсортированных списков"""
+    small, large = (first, second) if len(first) <= len(second) else (second, first)
+    if len(small) <= SMALL_LIST_SIZE:
+        return _probe(small, large)
+    if len(large) >= GALLOP_RATIO * len(small):
+        return _gallop(small, large)
+    return _merge(small, large)
+
+
+def new_positions(values: Iterable[int] = ()) -> array:
+    """Новый позиционный список (values должны быть отсортированы)"""
+    return array(POSITION_TYPECODE, values)
+
+
+def pack_position(ordinal: int, position: int) -> int:
+    """Позиционная запись для слова на позиции position в шаблоне ordinal"""
+    return (ordinal << POSITION_BITS) | position
+
+
+def document_range(positions: array, ordinal: int) -> Tuple[int, int]:
+    """Границы [start, end) записей шаблона в позиционном списке"""
+    start = bisect_left(positions, ordinal << POSITION_BITS)
+    return start, bisect_left(positions, (ordinal + 1) << POSITION_BITS, start)
+
+
+def _merge(small: array, large: array) -> array:
+    """Линейное слияние: O(n + k), один проход по обоим спискам"""
+    result = new_postings()
+    others = iter(large)
+    other = next(others)
+    try:
+        for value in small:
+            while other < value:
+                other = next(others)
+            if other == value:
+                result.append(value)
+                other = next(others)
+    except StopIteration:
+        pass
+    return result
+
+
+def _probe(small: array, large: array) -> array:
+    """Короткий список: каждый номер ищется в длинном бинарным поиском"""
+    result = new_postings()
+    size = len(large)
+    for value in small:
+        index = bisect_left(large, value)
+        if index < size and large[index] == value:
+            result.append(value)
+    return result
+
+
+def _gallop(small: array, large: array) -> array:
+    """
+    Галопирующее пересечение: O(k log n) для k = len(small).
+    
+    Граница каждого номера из короткого списка ищется в длинном
+    бинарным поиском от предыдущей найденной позиции.
+    """
+    result = new_postings()
+    size = len(large)
+    low = 0
+    for value in small:
+        low = bisect_left(large, value, low)
+        if low == size:
+            break
+        if large[low] == value:
+            result.append(value)
+            low += 1
+    return result
+
+
+def _marks(lists: List[array], size: int) -> bytearray:
+    """Битовая карта номеров [0, size): 1 - номер есть в каком-то из списков"""
+    marks = bytearray(size)
+    for postings in lists:
+        for value in postings:
+            marks[value] = 1
+    return marks
@@ -0,0 +1,79 @@
+"""
+Кэш результатов поисковых запросов для поиска по мере ввода
+
+Хранит ограниченное число последних запросов (LRU) с найденными ID шаблонов.
+Запрос, который дописывает закэшированный ("шаб" -> "шабл"), может только
+сузить результат, поэтому уточняется проверкой одного кэшированного набора.
+
+Записи не удаляются при изменении шаблонов: каждая помнит поколение своей
+области поиска и считается устаревшей, как только поколение изменилось.
+"""
+from array import array
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Hashable, List, NamedTuple, Optional, Set, Tuple
+
+
+class CachedQuery(NamedTuple):
+    """Закэшированный результат запроса"""
+    generation: Hashable                    # Поколение области поиска
+    index_generation: int                   # Поколение всего индекса (для df)
+    words: Dict[str, Set[int]]              # Разобранные слова запроса
+    result_ids: FrozenSet[str]              # ID найденных шаблонов
+    result_postings: array                  # Их номера в индексе (отсортированы)
+    word_matches: List[Tuple[Set[str], Optional[int]]]  # (термины слова, df или None)
+    constraints: tuple = ()                 # Фразы и NEAR (Proximity) запроса
+
+
+class QueryCache:
+    """
+    LRU-кэш (область поиска, нормализованный запрос) -> результат.
+    
+    Attributes:
+        max_size (int): Максимальное число запросов в кэше
+    """
+    
+    def __init__(self, max_size: int = 128):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[Hashable, str, bool], CachedQuery]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, scope: Hashable, query: str, fuzzy: bool,
+            generation: Hashable) -> Optional[CachedQuery]:
+        """Запись для точно такого же запроса, если она не устарела"""
+        key = (scope, query, fuzzy)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.generation != generation:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+    
+    def find_prefix(self, scope: Hashable, query: str,
+                    generation: Hashable) -> Optional[CachedQuery]:
+        """
+        Самый длинный закэшированный запрос, который query дописывает.
+        
+        Только для точного поиска: в нечётком режиме более длинное слово
+        допускает больше опечаток и результат может расшириться.
+        """
+        for end in range(len(query) - 1, 0, -1):
+            entry = self.get(scope, query[:end], False, generation)
+            if entry is not None:
+                return entry
+        return None
+    
+    def put(self, scope: Hashable, query: str, fuzzy: bool, entry: CachedQuery) -> None:
+        """Сохранить результат, вытеснив самый давний запрос при переполнении"""
+        key = (scope, query, fuzzy)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Очистить кэш"""
+        self._entries.clear()
@@ -0,0 +1,61 @@
+"""
+Операторы поискового запроса: фразы в кавычках и NEAR/k
+    
+    "номер заказа"        - слова стоят подряд и в этом порядке
+    оплата NEAR/3 счёт    - между словами не больше трёх позиций (порядок любой)
+
+Всё остальное - обычные слова: каждое должно встретиться в шаблоне где
+угодно. Слова фраз и операндов NEAR тоже остаются обычными словами:
+шаблоны сначала находятся как по запросу без операторов, а затем
+проверяются по позициям слов (позиционный индекс).
+"""
+import re
+from typing import List, NamedTuple, Tuple
+
+
+# Фраза: текст между парными кавычками
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+
+# NEAR/k между двумя соседними частями запроса (правая часть не поглощается,
+# чтобы работали цепочки "а NEAR/2 б NEAR/3 в")
+NEAR_PATTERN = re.compile(r'(\S+)\s+NEAR/(\d+)\s+(?=(\S+))', re.IGNORECASE)
+
+# Сам оператор (удаляется из текста запроса)
+NEAR_OPERATOR = re.compile(r'(?<!\S)NEAR/\d+(?!\S)', re.IGNORECASE)
+
+# Наибольшее расстояние NEAR (большие значения ограничиваются им)
+MAX_NEAR_DISTANCE = 32
+
+
+class ParsedQuery(NamedTuple):
+    """Запрос, разобранный на обычный текст и ограничения по позициям"""
+    text: str                           # Все слова запроса без операторов и кавычек
+    phrases: List[str]                  # Текст каждой фразы в кавычках
+    nears: List[Tuple[str, str, int]]   # (левая часть, правая часть, расстояние)
+    
+    @property
+    def has_operators(self) -> bool:
+        """Есть ли в запросе фразы или NEAR"""
+        return bool(self.phrases or self.nears)
+
+
+def parse_query_syntax(query: str) -> ParsedQuery:
+    """
+    Выделить из запроса фразы и операторы NEAR/k.
+    
+    Непарная кавычка ничего не значит: такой запрос ищется как обычные
+    слова (пока фраза дописывается, результат не пропадает).
+    
+    Args:
+        query: Запрос как его ввёл пользователь
+    
+    Returns:
+        ParsedQuery
+    """
+    phrases = PHRASE_PATTERN.findall(query)
+    nears = [
+        (left.strip('"'), right.strip('"'), min(int(distance), MAX_NEAR_DISTANCE))
+        for left, distance, right in NEAR_PATTERN.findall(query)
+    ]
+    text = NEAR_OPERATOR.sub(' ', query).replace('"', ' ')
+    return ParsedQuery(text, phrases, nears)
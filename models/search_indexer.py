@@ -1,182 +1,1759 @@
 """
-Быстрый индекс для поиска и фильтрации шаблонов O(1)
+Быстрый индекс для поиска и фильтрации шаблонов
+
+Структуры индекса (шаблоны представлены плотными номерами):
+    word_index        - термин (нормализованное слово) -> номера шаблонов
+    gram_index        - триграмма -> ID терминов (поиск по подстроке)
+    _suffixes         - отсортированные суффиксы (слова короче триграммы)
+    alternate_index   - другая раскладка и транслит -> ID терминов
+    _fuzzy_index      - индекс удалений (опечатки на расстоянии 1-2)
+    position_index    - позиции слов в шаблонах (фразы и NEAR/k)
+    tag_postings      - тег -> номера шаблонов
+    category_postings - (тип, категория) -> номера шаблонов
+
+Списки номеров - отсортированные массивы (posting_list). Индекс общий
+для всех типов категорий, обновляется инкрементально при каждом
+изменении шаблона, сохраняется в снимок (index_snapshot) и без снимка
+строится в фоновом потоке.
 """
-from typing import Dict, List, Set, Tuple
-from collections import defaultdict
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from collections import Counter, defaultdict
+from functools import partial
+from operator import is_not
+from array import array
+from bisect import bisect_left, insort
+import heapq
+import itertools
+import math
 import re
-from threading import Lock
+import sys
+from threading import Event, Lock, Thread
+import zlib
+
+from config.settings import SEARCH
+from models.fuzzy_index import DeletionIndex
+from models.index_snapshot import read_snapshot, write_snapshot
+from models.keyboard_layout import alternate_keys, has_latin, translit_key
+from models.normalized_text import (
+    get_normalized_cache, normalize_field, normalize_search_text, normalize_token
+)
+from models.posting_list import (
+    POSITION_BITS, POSITION_MASK, add_posting, document_range, intersect_postings,
+    intersect_union, new_positions, new_postings, pack_position, remove_posting, union_postings
+)
+from models.query_cache import CachedQuery, QueryCache
+from models.query_syntax import MAX_NEAR_DISTANCE, ParsedQuery, parse_query_syntax
+from models.text_normalizer import stem_word
+
+
+# Слово: буквы (ASCII и кириллица) и цифры
+WORD_PATTERN = re.compile(r'[a-яa-z0-9]{1,}')
+
+# Слово в исходном (ненормализованном) тексте - для позиций совпадений
+SPAN_WORD_PATTERN = re.compile(r'\w+')
+
+# Длина n-граммы для индекса подстрок
+NGRAM_SIZE = 3
+
+# Упаковка суффикса в одно число: (ID термина << 16) | смещение в термине
+SUFFIX_SHIFT = 16
+SUFFIX_MASK = (1 << SUFFIX_SHIFT) - 1
+
+# Символ больше любого другого: верхняя граница диапазона префикса
+_MAX_CHAR = chr(0x10FFFF)
+
+# Проверка одного кандидата по его терминам стоит примерно как слияние
+# стольких записей списков шаблонов (выбор способа уточнения результата)
+REFINE_COST = 40
+
+# Результат меньше 1/ORDER_SORT_RATIO категории упорядочивается сортировкой
+# по позициям шаблонов, а не просмотром всей категории
+ORDER_SORT_RATIO = 8
+
+# Раз в сколько оценённых шаблонов проверять отмену поиска
+CANCEL_CHECK_INTERVAL = 512
+
+# Поля шаблона для ранжирования: название и текст (вместе с тегами)
+FIELD_TITLE = 0
+FIELD_TEXT = 1
+
+# Позиции текста начинаются после названия с таким промежутком,
+# чтобы фраза или NEAR не находились на стыке полей
+FIELD_POSITION_GAP = MAX_NEAR_DISTANCE + 1
+
+# Поиск позиций одного кандидата бинарным поиском стоит примерно
+# как просмотр стольких записей позиционного списка
+POSITION_LOOKUP_COST = 16
+
+
+# Фасет шаблона: (тип категорий, категория)
+Facet = Tuple[str, str]
+
+
+class SearchCancelled(Exception):
+    """Поиск прерван: should_stop сообщил, что результат больше не нужен"""
+
+
+class MatchSpan(NamedTuple):
+    """Совпадение в поле шаблона: символы [start, end) исходного текста поля"""
+    field: int                      # FIELD_TITLE (название) или FIELD_TEXT (текст без тегов)
+    start: int
+    end: int
+
+
+class Proximity(NamedTuple):
+    """Ограничение на позиции слов запроса (фраза или NEAR/k)"""
+    words: Tuple[str, ...]          # Слова запроса (ключи разобранного запроса)
+    distance: int                   # Фраза - 1 (подряд), NEAR/k - k
+    ordered: bool                   # Фраза - в порядке запроса, NEAR - в любом
+
+
+class SearchHit(NamedTuple):
+    """Результат ранжированного поиска (с типом и категорией шаблона)"""
+    template: dict
+    score: float
+    category_type: str = None
+    category: str = None
+    spans: Tuple[MatchSpan, ...] = ()
 
 
 class SearchIndexer:
     """
     Индекс для молниеносного поиска по шаблонам.
     
-    Хранит инвертированный индекс всех слов/подстрок для O(1) поиска.
+    Хранит инвертированный индекс слов и триграммный индекс словаря терминов.
     Потокобезопасен через Lock.
     """
     
     def __init__(self):
         self.lock = Lock()
         
-        # Инвертированный индекс: слово -> набор ID шаблонов
-        self.word_index: Dict[str, Set[int]] = defaultdict(set)
+        # Нормализованные поля шаблонов (общий кэш для всех путей поиска)
+        self.normalized_text = get_normalized_cache()
+        
+        # Порядковые номера шаблонов в списках вхождений: номер <-> ID шаблона.
+        # Номер удалённого шаблона не переиспользуется (в doc_ids - None)
+        self.doc_ids: List[Optional[str]] = []
+        self.doc_ordinals: Dict[str, int] = {}
+        
+        # Инвертированный индекс: слово -> отсортированные номера шаблонов
+        self.word_index: Dict[str, array] = defaultdict(new_postings)
+        
+        # Позиционный индекс: слово -> отсортированные (номер, позиция) вхождений
+        self.position_index: Dict[str, array] = defaultdict(new_positions)
+        
+        # Словарь терминов: ID термина <-> слово
+        self.terms: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        
+        # Триграммный индекс: триграмма -> отсортированные ID терминов с ней
+        self.gram_index: Dict[str, array] = defaultdict(new_postings)
+        
+        # Отсортированный словарь суффиксов терминов (строится лениво)
+        self._suffixes = None
+        
+        # Индекс удалений для нечёткого поиска (строится лениво)
+        self._fuzzy_index = None
+        
+        # Альтернативные ключи: другая раскладка / транслит -> ID терминов.
+        # Один ID хранится числом, несколько - списком (экономия памяти)
+        self.alternate_index: Dict[str, object] = {}
+        
+        # Отсортированные альтернативные ключи для поиска по началу (лениво)
+        self._alternate_keys = None
+        
+        # Словоформы, отличные от своей основы, чьи ключи уже сохранены
+        self.surface_forms: Set[str] = set()
+        
+        # Кэш шаблонов в памяти: template_id -> template_dict
+        self.template_cache: Dict[str, dict] = {}
+        
+        # Слова каждого шаблона с частотами по полям:
+        # template_id -> {слово: (в названии, в тексте)}
+        self.doc_terms: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        
+        # Длины полей в словах: template_id -> (название, текст) и суммы по всем
+        self.doc_lengths: Dict[str, Tuple[int, int]] = {}
+        self.field_length_totals = [0, 0]
+        
+        # Индекс категорий: (тип, категория) -> список ID шаблонов (в порядке
+        # категории) и отсортированные номера шаблонов (для пересечений)
+        self.category_index: Dict[Facet, List[str]] = defaultdict(list)
+        self.category_postings: Dict[Facet, array] = defaultdict(new_postings)
+        
+        # Фасет каждого шаблона: template_id -> (тип, категория)
+        self.doc_facets: Dict[str, Facet] = {}
+        
+        # Закреплённые шаблоны (выдаются первыми без просмотра всей категории)
+        self.pinned_ids: Set[str] = set()
         
-        # Кэш шаблонов в памяти: (category, template_id) -> template_dict
-        self.template_cache: Dict[Tuple[str, int], dict] = {}
+        # Индекс тегов: нормализованный тег -> отсортированные номера шаблонов,
+        # и как тег показывать (написание из шаблона)
+        self.tag_postings: Dict[str, array] = defaultdict(new_postings)
+        self.tag_names: Dict[str, str] = {}
         
-        # Индекс категорий: category -> список ID шаблонов
-        self.category_index: Dict[str, List[int]] = defaultdict(list)
+        # Тип категорий, к которому относятся вызовы без явного типа
+        self.active_type = None
+        
+        # Число копирований шаблона для ранжирования (счётчики менеджера
+        # шаблонов); None - из поля stats самого шаблона
+        self.usage_source: Optional[Callable[[dict], int]] = None
         
         # Кэш для результатов категорий
-        self.category_cache: Dict[str, List[dict]] = {}
+        self.category_cache: Dict[Facet, List[dict]] = {}
+        
+        # Позиции шаблонов в категориях: фасет -> (поколение, {ID: позиция})
+        self._category_positions_cache: Dict[Facet, Tuple[int, Dict[str, int]]] = {}
+        
+        # Поколения для кэша запросов: категории - при изменении её шаблонов,
+        # словаря - когда словоформа начинает вести к уже известному термину,
+        # всего индекса - при любом изменении (от него зависят df в BM25)
+        self.generations: Dict[Facet, int] = {}
+        self.vocabulary_generation = 0
+        self.generation = 0
+        
+        # Кэш результатов запросов (для поиска по мере ввода)
+        self.query_cache = QueryCache(SEARCH.QUERY_CACHE_SIZE)
         
         # Флаг что индекс нужно пересчитать
         self.is_dirty = False
+        
+        # Индекс построен (до этого инкрементальные изменения не нужны)
+        self.is_built = False
+        
+        # Изменения шаблонов, пропущенные до построения индекса
+        # (фоновое построение по ним узнаёт, что его данные устарели)
+        self._missed_changes = 0
+        self._built_event = Event()
+        self._built_callbacks: List[Callable[[], None]] = []
     
     def build_index(self, template_manager) -> None:
-        """Построить индекс для всех шаблонов"""
-        with self.lock:
-            self.word_index.clear()
-            self.template_cache.clear()
-            self.category_index.clear()
-            self.category_cache.clear()
-            
-            # Получаем все категории
-            categories = template_manager.get_categories()
-            
-            for category in categories:
-                templates = template_manager.get_templates(category)
-                template_ids = []
-                
-                for template in templates:
-                    template_id = id(template)  # Уникальный ID
-                    template_ids.append(template_id)
-                    
-                    # Сохраняем шаблон в кэш
-                    cache_key = (category, template_id)
-                    self.template_cache[cache_key] = template
+        """Построить индекс для всех шаблонов всех типов категорий"""
+        with self.lock:
+            self._reset(template_manager)
+            
+            # Все категории всех типов - в одном индексе
+            for category_type in template_manager.get_category_types():
+                for category in template_manager.get_categories(category_type):
+                    facet = (category_type, category)
+                    template_ids = []
                     
-                    # Индексируем все слова
-                    text_to_index = self._extract_text(template)
-                    words = self._tokenize(text_to_index)
+                    for template in template_manager.get_templates(category, category_type):
+                        template_id = self._index_document(template)
+                        self._add_to_facet(template_id, facet)
+                        template_ids.append(template_id)
                     
-                    for word in words:
-                        self.word_index[word].add(template_id)
-                
-                # Сохраняем ID шаблонов по категориям
-                self.category_index[category] = template_ids
+                    # Сохраняем ID шаблонов по категориям
+                    self.category_index[facet] = template_ids
             
-            self.is_dirty = False
+            self._mark_built()
+        self._notify_built()
     
-    def search_in_category(self, query: str, category: str, 
-                          template_manager) -> List[dict]:
+    def build_index_in_background(self, template_manager) -> None:
+        """
+        Построить индекс в фоновом потоке.
+        
+        До окончания построения is_built=False: поиск должен использовать
+        простой просмотр шаблонов, а изменения шаблонов только отмечаются.
+        
+        Args:
+            template_manager: Источник шаблонов
+        """
+        with self.lock:
+            self.is_built = False
+            self._built_event.clear()
+        Thread(target=self._build_in_background, args=(template_manager,),
+               name="SearchIndexBuild", daemon=True).start()
+    
+    def _build_in_background(self, template_manager) -> None:
+        """Строить индекс, пока за время построения не перестанут меняться шаблоны"""
+        while True:
+            with self.lock:
+                missed_changes = self._missed_changes
+            
+            fresh = SearchIndexer()
+            try:
+                fresh.build_index(template_manager)
+            except RuntimeError:
+                continue  # Категории изменились прямо во время обхода
+            
+            with self.lock:
+                if self._missed_changes == missed_changes:
+                    self._adopt(fresh, template_manager)
+                    break
+        
+        self._notify_built()
+    
+    # Поля состояния индекса, которые _adopt переносит из построенного экземпляра
+    _STATE_FIELDS = (
+        "doc_ids", "doc_ordinals", "word_index", "position_index", "terms", "term_ids", "gram_index",
+        "_suffixes", "_fuzzy_index", "alternate_index", "_alternate_keys", "surface_forms",
+        "template_cache", "doc_terms", "doc_lengths", "field_length_totals",
+        "category_index", "category_postings", "doc_facets", "pinned_ids",
+        "tag_postings", "tag_names",
+    )
+    
+    def _adopt(self, fresh: 'SearchIndexer', template_manager) -> None:
+        """Принять состояние построенного отдельно индекса (под lock)"""
+        self._reset(template_manager)
+        for name in self._STATE_FIELDS:
+            setattr(self, name, getattr(fresh, name))
+        self._mark_built()
+    
+    def _mark_built(self) -> None:
+        """Отметить индекс построенным (под lock)"""
+        self.is_dirty = False
+        self.is_built = True
+        self._built_event.set()
+    
+    def wait_until_built(self, timeout: float = None) -> bool:
+        """Дождаться построения индекса; True если он построен"""
+        return self._built_event.wait(timeout)
+    
+    def when_built(self, callback: Callable[[], None]) -> None:
+        """
+        Вызвать callback, когда индекс будет построен (сразу, если уже).
+        
+        Вызывается из потока построения - для UI его нужно передать
+        в главный поток (MainThreadDispatcher).
+        """
+        with self.lock:
+            if not self.is_built:
+                self._built_callbacks.append(callback)
+                return
+        callback()
+    
+    def _notify_built(self) -> None:
+        """Вызвать ожидающих построения индекса"""
+        with self.lock:
+            callbacks, self._built_callbacks = self._built_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[ERROR] Ошибка в обработчике построения индекса: {e}")
+    
+    def _reset(self, template_manager) -> None:
+        """Очистить индекс и все производные структуры"""
+        self.doc_ids.clear()
+        self.doc_ordinals.clear()
+        self.word_index.clear()
+        self.position_index.clear()
+        self.terms.clear()
+        self.term_ids.clear()
+        self.gram_index.clear()
+        self._suffixes = None
+        self._fuzzy_index = None
+        self.alternate_index.clear()
+        self._alternate_keys = None
+        self.surface_forms.clear()
+        self.template_cache.clear()
+        self.doc_terms.clear()
+        self.doc_lengths.clear()
+        self.field_length_totals = [0, 0]
+        self.category_index.clear()
+        self.category_postings.clear()
+        self.doc_facets.clear()
+        self.pinned_ids.clear()
+        self.tag_postings.clear()
+        self.tag_names.clear()
+        self.category_cache.clear()
+        self._category_positions_cache.clear()
+        self.generations.clear()
+        self.generation += 1
+        self.query_cache.clear()
+        self.active_type = template_manager.current_category_type
+        self.usage_source = getattr(template_manager, 'get_usage_count', None)
+    
+    def save_snapshot(self, path: str, source_key) -> bool:
+        """
+        Сохранить индекс в снимок на диске.
+        
+        Args:
+            path: Путь к файлу снимка
+            source_key: Состояние файлов шаблонов, из которых построен индекс
+        
+        Returns:
+            bool: True если снимок записан
+        """
+        with self.lock:
+            # Шаблоны без ID (ключ - id() объекта) по снимку не опознать
+            if not self.is_built or not all(isinstance(template_id, str)
+                                            for template_id in self.template_cache):
+                return False
+            
+            # Термины шаблона - парами (ID термина, номер частот в term_counts):
+            # различных пар частот (в названии, в тексте) немного
+            term_ids = self.term_ids
+            count_ids = {}
+            doc_terms = {
+                template_id: new_postings(itertools.chain.from_iterable(
+                    (term_ids[term], count_ids.setdefault(counts, len(count_ids)))
+                    for term, counts in terms.items()))
+                for template_id, terms in self.doc_terms.items()
+            }
+            state = {
+                "doc_ids": self.doc_ids,
+                "terms": self.terms,
+                "gram_index": self.gram_index,
+                "word_index": self.word_index,
+                "position_index": self.position_index,
+                "alternate_index": self.alternate_index,
+                "surface_forms": sorted(self.surface_forms),
+                "doc_terms": doc_terms,
+                "term_counts": list(count_ids),
+                "doc_lengths": self.doc_lengths,
+                "field_length_totals": self.field_length_totals,
+                "fingerprints": {template_id: self._fingerprint(template)
+                                 for template_id, template in self.template_cache.items()},
+            }
+            return write_snapshot(path, self._snapshot_key(source_key), state)
+    
+    def load_snapshot(self, template_manager, path: str, source_key) -> bool:
+        """
+        Загрузить индекс из снимка вместо построения.
+        
+        Снимок подходит, если совпали ключ (файлы шаблонов и настройки)
+        и отпечатки полей каждого шаблона. Шаблоны в индексе - живые
+        объекты менеджера, категории берутся из менеджера.
+        
+        Returns:
+            bool: True если индекс загружен (иначе его нужно построить)
+        """
+        state = read_snapshot(path, self._snapshot_key(source_key))
+        if state is None:
+            return False
+        
+        fingerprints = state["fingerprints"]
+        doc_ordinals = {template_id: ordinal for ordinal, template_id in enumerate(state["doc_ids"])
+                        if template_id is not None}
+        template_cache = {}
+        category_index = defaultdict(list)
+        category_postings = defaultdict(new_postings)
+        doc_facets = {}
+        pinned_ids = set()
+        tag_ordinals = defaultdict(list)
+        tag_names = {}
+        for category_type in template_manager.get_category_types():
+            for category in template_manager.get_categories(category_type):
+                facet = (category_type, category)
+                template_ids = category_index[facet]
+                ordinals = []
+                for template in template_manager.get_templates(category, category_type):
+                    template_id = template.get('id')
+                    if fingerprints.get(template_id) != self._fingerprint(template):
+                        return False
+                    template_cache[template_id] = template
+                    doc_facets[template_id] = facet
+                    if template.get('pinned', False):
+                        pinned_ids.add(template_id)
+                    for key, tag in self._template_tags(template).items():
+                        tag_names.setdefault(key, tag)
+                        tag_ordinals[key].append(doc_ordinals[template_id])
+                    template_ids.append(template_id)
+                    ordinals.append(doc_ordinals[template_id])
+                category_postings[facet] = new_postings(sorted(ordinals))
+        if len(template_cache) != len(fingerprints):
+            return False
+        
+        with self.lock:
+            self._reset(template_manager)
+            self.doc_ids = state["doc_ids"]
+            self.doc_ordinals = doc_ordinals
+            self.terms = terms = state["terms"]
+            self.term_ids = {term: term_id for term_id, term in enumerate(terms)}
+            self.gram_index = defaultdict(new_postings, state["gram_index"])
+            self.word_index = defaultdict(new_postings, state["word_index"])
+            self.position_index = defaultdict(new_positions, state["position_index"])
+            self.alternate_index = state["alternate_index"]
+            self.surface_forms = set(state["surface_forms"])
+            term_counts = [tuple(counts) for counts in state["term_counts"]]
+            self.doc_terms = {
+                template_id: dict(zip(map(terms.__getitem__, pairs[0::2]),
+                                      map(term_counts.__getitem__, pairs[1::2])))
+                for template_id, pairs in state["doc_terms"].items()
+            }
+            self.doc_lengths = {template_id: tuple(lengths)
+                                for template_id, lengths in state["doc_lengths"].items()}
+            self.field_length_totals = state["field_length_totals"]
+            self.template_cache = template_cache
+            self.category_index = category_index
+            self.category_postings = category_postings
+            self.doc_facets = doc_facets
+            self.pinned_ids = pinned_ids
+            self.tag_postings = defaultdict(new_postings, {
+                key: new_postings(sorted(ordinals)) for key, ordinals in tag_ordinals.items()})
+            self.tag_names = tag_names
+            self._mark_built()
+        self._notify_built()
+        return True
+    
+    @staticmethod
+    def _snapshot_key(source_key) -> dict:
+        """Ключ снимка: файлы шаблонов и настройки, от которых зависит индекс"""
+        return {
+            "files": source_key,
+            "index": [NGRAM_SIZE, SEARCH.NORMALIZE_TEXT, SEARCH.STEMMING,
+                      SEARCH.LAYOUT_SWAP, SEARCH.TRANSLIT, SEARCH.PHRASE_QUERIES],
+        }
+    
+    def _fingerprint(self, template: dict) -> int:
+        """Контрольная сумма индексируемых полей шаблона"""
+        return zlib.crc32("\0".join(self._extract_fields(template)).encode('utf-8'))
+    
+    def set_active_type(self, category_type: str) -> None:
+        """Сменить тип категорий по умолчанию (индекс не перестраивается)"""
+        with self.lock:
+            self.active_type = category_type
+    
+    def _facet(self, category: str, category_type: str = None) -> Facet:
+        """Фасет категории (по умолчанию - активного типа)"""
+        return (category_type or self.active_type, category)
+    
+    def _add_to_facet(self, template_id: str, facet: Facet) -> None:
+        """Записать проиндексированный шаблон в категорию (фасет и номера)"""
+        self.doc_facets[template_id] = facet
+        add_posting(self.category_postings[facet], self.doc_ordinals[template_id])
+    
+    def _remove_from_facet(self, template_id: str) -> None:
+        """Убрать шаблон из номеров его категории (до снятия с индекса)"""
+        facet = self.doc_facets.pop(template_id, None)
+        ordinal = self.doc_ordinals.get(template_id)
+        if facet is not None and ordinal is not None:
+            remove_posting(self.category_postings[facet], ordinal)
+    
+    def _touch(self, facet: Facet) -> None:
+        """Отметить изменение шаблонов категории (устаревают её запросы в кэше)"""
+        self.generations[facet] = self.generations.get(facet, 0) + 1
+        self.generation += 1
+    
+    def _scope_generation(self, scope: Optional[Facet]):
+        """Поколение области поиска: категории (scope) или всего индекса (None)"""
+        if scope is None:
+            return self.generation
+        return (self.generations.get(scope, 0), self.vocabulary_generation)
+    
+    def add_template(self, category: str, template: dict, category_type: str = None) -> None:
+        """Добавить один шаблон в конец категории"""
+        with self.lock:
+            if not self.is_built:
+                self._missed_changes += 1
+                return
+            facet = self._facet(category, category_type)
+            template_id = self._index_document(template)
+            self._add_to_facet(template_id, facet)
+            self.category_index[facet].append(template_id)
+            self.category_cache.pop(facet, None)
+            self._touch(facet)
+    
+    def update_template(self, category: str, old_template: dict, new_template: dict,
+                        category_type: str = None) -> None:
+        """Переиндексировать изменённый шаблон, сохранив его позицию"""
+        with self.lock:
+            if not self.is_built:
+                self._missed_changes += 1
+                return
+            facet = self._facet(category, category_type)
+            old_id = self._template_id(old_template)
+            self._remove_from_facet(old_id)
+            self._unindex_document(old_id)
+            new_id = self._index_document(new_template)
+            self._add_to_facet(new_id, facet)
+            
+            template_ids = self.category_index[facet]
+            if old_id != new_id:
+                template_ids[template_ids.index(old_id)] = new_id
+            self.category_cache.pop(facet, None)
+            self._touch(facet)
+    
+    def remove_template(self, category: str, template: dict, category_type: str = None) -> None:
+        """Удалить шаблон из индекса"""
+        with self.lock:
+            if not self.is_built:
+                self._missed_changes += 1
+                return
+            facet = self._facet(category, category_type)
+            template_id = self._template_id(template)
+            self._remove_from_facet(template_id)
+            self._unindex_document(template_id)
+            self.category_index[facet].remove(template_id)
+            self.category_cache.pop(facet, None)
+            self._touch(facet)
+    
+    def rename_category(self, old_name: str, new_name: str, category_type: str = None) -> None:
+        """Переименовать категорию в индексе (шаблоны не переиндексируются)"""
+        with self.lock:
+            if not self.is_built:
+                self._missed_changes += 1
+                return
+            old_facet = self._facet(old_name, category_type)
+            new_facet = self._facet(new_name, category_type)
+            template_ids = self.category_index.pop(old_facet, [])
+            self.category_index[new_facet] = template_ids
+            self.category_postings[new_facet] = self.category_postings.pop(old_facet, new_postings())
+            for template_id in template_ids:
+                self.doc_facets[template_id] = new_facet
+            self.category_cache.pop(old_facet, None)
+            self.category_cache.pop(new_facet, None)
+            self._touch(old_facet)
+            self._touch(new_facet)
+    
+    def set_pinned(self, template: dict) -> None:
+        """Учесть изменённое закрепление шаблона (результаты не меняются - только порядок)"""
+        with self.lock:
+            if not self.is_built:
+                self._missed_changes += 1
+                return
+            template_id = self._template_id(template)
+            if template.get('pinned', False):
+                self.pinned_ids.add(template_id)
+            else:
+                self.pinned_ids.discard(template_id)
+    
+    def remove_category(self, category: str, category_type: str = None) -> None:
+        """Удалить категорию и все её шаблоны из индекса"""
+        with self.lock:
+            if not self.is_built:
+                self._missed_changes += 1
+                return
+            facet = self._facet(category, category_type)
+            for template_id in self.category_index.pop(facet, []):
+                self.doc_facets.pop(template_id, None)
+                self._unindex_document(template_id)
+            self.category_postings.pop(facet, None)
+            self.category_cache.pop(facet, None)
+            self._touch(facet)
+    
+    def check_consistency(self, template_manager) -> List[str]:
+        """
+        Сравнить инкрементальный индекс с построенным заново.
+        
+        Args:
+            template_manager: Источник актуальных шаблонов
+        
+        Returns:
+            Список найденных расхождений (пустой, если индекс согласован)
+        """
+        fresh = SearchIndexer()
+        fresh.build_index(template_manager)
+        problems = []
+        
+        with self.lock:
+            if not self.is_built:
+                return problems
+            
+            live_words = {word: set(map(self.doc_ids.__getitem__, ordinals))
+                          for word, ordinals in self.word_index.items() if ordinals}
+            fresh_words = {word: set(map(fresh.doc_ids.__getitem__, ordinals))
+                           for word, ordinals in fresh.word_index.items()}
+            for word in live_words.keys() | fresh_words.keys():
+                if live_words.get(word, set()) != fresh_words.get(word, set()):
+                    problems.append(f"Слово '{word}': разные наборы шаблонов")
+            
+            if any(list(ordinals) != sorted(set(ordinals)) for ordinals in self.word_index.values()):
+                problems.append("Списки вхождений не отсортированы")
+            
+            live_positions = {word: {(self.doc_ids[entry >> POSITION_BITS], entry & POSITION_MASK)
+                                     for entry in entries}
+                              for word, entries in self.position_index.items() if entries}
+            fresh_positions = {word: {(fresh.doc_ids[entry >> POSITION_BITS], entry & POSITION_MASK)
+                                      for entry in entries}
+                               for word, entries in fresh.position_index.items()}
+            if live_positions != fresh_positions:
+                problems.append("Позиционный индекс не совпадает")
+            if any(list(entries) != sorted(entries) for entries in self.position_index.values()):
+                problems.append("Позиционные списки не отсортированы")
+            
+            for facet in self.category_index.keys() | fresh.category_index.keys():
+                current = set(self.category_index.get(facet, []))
+                if current != set(fresh.category_index.get(facet, [])):
+                    problems.append(f"Категория '{facet[1]}' ({facet[0]}): разный состав шаблонов")
+                ordinals = self.category_postings.get(facet, new_postings())
+                if set(map(self.doc_ids.__getitem__, ordinals)) != current:
+                    problems.append(f"Категория '{facet[1]}' ({facet[0]}): устаревшие номера шаблонов")
+            
+            if self.pinned_ids != fresh.pinned_ids:
+                problems.append("Разный набор закреплённых шаблонов")
+            
+            live_tags = {key: set(map(self.doc_ids.__getitem__, ordinals))
+                         for key, ordinals in self.tag_postings.items()}
+            fresh_tags = {key: set(map(fresh.doc_ids.__getitem__, ordinals))
+                          for key, ordinals in fresh.tag_postings.items()}
+            if live_tags != fresh_tags:
+                problems.append("Индекс тегов не совпадает")
+            if self.tag_names.keys() != self.tag_postings.keys():
+                problems.append("Названия тегов не соответствуют индексу тегов")
+            
+            if self.doc_facets != fresh.doc_facets:
+                problems.append("Фасеты шаблонов не совпадают")
+            
+            if self.template_cache.keys() != fresh.template_cache.keys():
+                problems.append("Кэш шаблонов не совпадает")
+            
+            for template_id, template in self.template_cache.items():
+                if template is not fresh.template_cache.get(template_id):
+                    problems.append(f"Шаблон {template_id}: устаревшая ссылка")
+                if not self.normalized_text.is_fresh(template):
+                    problems.append(f"Шаблон {template_id}: устаревший нормализованный текст")
+        
+        return problems
+    
+    def search_in_category(self, query: str, category: str,
+                          template_manager, fuzzy: bool = False,
+                          category_type: str = None,
+                          should_stop: Callable[[], bool] = None,
+                          tags: Iterable[str] = ()) -> List[dict]:
         """
         Быстрый поиск в категории.
         
+        Шаблон подходит, если каждое слово запроса является подстрокой
+        какого-либо слова шаблона (название, текст, теги) и шаблон
+        отмечен всеми тегами из tags.
+        
         Args:
             query: Текст для поиска
             category: Категория
             template_manager: Для получения актуальных данных
+            fuzzy: Допускать опечатки в словах запроса
+            category_type: Тип категорий, по умолчанию активный
+            should_stop: Проверка отмены (True - прервать через SearchCancelled)
+            tags: Теги, которыми должен быть отмечен шаблон
         
         Returns:
             Список найденных шаблонов
         """
-        if not query.strip():
+        return [template
+                for chunk in self.iter_category_results(query, category, template_manager, fuzzy,
+                                                        category_type, should_stop, tags=tags)
+                for template in chunk]
+    
+    def iter_category_results(self, query: str, category: str, template_manager,
+                              fuzzy: bool = False, category_type: str = None,
+                              should_stop: Callable[[], bool] = None,
+                              first_chunk: int = None, chunk_size: int = None,
+                              with_spans: bool = False, tags: Iterable[str] = ()
+                              ) -> Iterator[list]:
+        """
+        Результаты search_in_category частями (в том же порядке).
+        
+        Запрос выполняется сразу, а шаблоны собираются по мере выдачи:
+        закреплённые, затем остальные - без сортировки всего результата.
+        Между частями блокировка индекса не удерживается.
+        
+        Args:
+            query: Текст для поиска
+            category: Категория
+            template_manager: Для получения актуальных данных
+            fuzzy: Допускать опечатки в словах запроса
+            category_type: Тип категорий, по умолчанию активный
+            should_stop: Проверка отмены (True - прервать через SearchCancelled)
+            first_chunk: Размер первой части (по умолчанию SEARCH.STREAM_FIRST_CHUNK)
+            chunk_size: Размер остальных частей (по умолчанию SEARCH.STREAM_CHUNK)
+            with_spans: Выдавать SearchHit с позициями совпадений вместо шаблонов
+            tags: Теги, которыми должен быть отмечен шаблон
+        
+        Yields:
+            Списки шаблонов (или SearchHit); для пустого результата - один пустой список
+        """
+        first_chunk = first_chunk or SEARCH.STREAM_FIRST_CHUNK
+        chunk_size = chunk_size or SEARCH.STREAM_CHUNK
+        
+        if not query.strip() and not tags:
             # Если нет поиска - возвращаем все из категории
-            return self._get_category_templates(category, template_manager)
+            templates = self._get_category_templates(category, template_manager, category_type)
+            if with_spans:
+                facet = self._facet(category, category_type)
+                templates = [SearchHit(template, 0.0, *facet) for template in templates]
+            return self._chunks(templates, first_chunk, chunk_size)
         
         with self.lock:
-            # Разбираем поисковый запрос
-            query_lower = query.lower().strip()
-            words = self._tokenize(query_lower)
-            
-            # Получаем ID шаблонов в категории
-            category_ids = set(self.category_index.get(category, []))
+            facet = self._facet(category, category_type)
+            has_templates = bool(self.category_index.get(facet))
             
+            result_ids, word_matches = frozenset(), []
+            if has_templates and tags:
+                ordinals, word_matches = self._tagged_results(facet, query, fuzzy, tags,
+                                                              should_stop=should_stop)
+                result_ids = frozenset(map(self.doc_ids.__getitem__, ordinals))
+            elif has_templates:
+                result_ids, word_matches = self._run_query(facet, query, fuzzy,
+                                                           should_stop=should_stop)
+            found_ids = self._in_category_order(facet, result_ids)
+        
+        # Собираем результаты из кэша
+        templates = filter(partial(is_not, None), map(self.template_cache.get, found_ids))
+        if with_spans:
+            # Позиции считаются лениво - только для выдаваемых частей
+            matched_terms = self._matched_terms(word_matches)
+            templates = (SearchHit(template, 0.0, *facet, self._match_spans(template, matched_terms))
+                         for template in templates)
+        return self._chunks(templates, first_chunk, chunk_size, should_stop)
+    
+    def _in_category_order(self, facet: Facet, result_ids: FrozenSet[str]) -> List[str]:
+        """
+        ID найденных шаблонов в порядке категории, закреплённые первыми,
+        как в TemplateManager.get_templates (под lock).
+        
+        Небольшой результат сортируется по позициям шаблонов в категории,
+        большой - отбирается одним проходом по ней.
+        """
+        category_ids = self.category_index.get(facet, ())
+        if len(result_ids) * ORDER_SORT_RATIO < len(category_ids):
+            found_ids = sorted(result_ids, key=self._category_positions(facet).__getitem__)
+        else:
+            found_ids = list(filter(result_ids.__contains__, category_ids))
+        
+        pinned_ids = result_ids & self.pinned_ids
+        if not pinned_ids:
+            return found_ids
+        return [*filter(pinned_ids.__contains__, found_ids),
+                *itertools.filterfalse(pinned_ids.__contains__, found_ids)]
+    
+    def _category_positions(self, facet: Facet) -> Dict[str, int]:
+        """Позиции шаблонов в категории (пересчитываются после её изменения)"""
+        generation = self.generations.get(facet, 0)
+        cached = self._category_positions_cache.get(facet)
+        if cached is None or cached[0] != generation:
+            positions = {template_id: position for position, template_id
+                         in enumerate(self.category_index.get(facet, ()))}
+            cached = self._category_positions_cache[facet] = (generation, positions)
+        return cached[1]
+    
+    @classmethod
+    def _chunks(cls, items: Iterable, first_chunk: int, chunk_size: int,
+                should_stop: Callable[[], bool] = None) -> Iterator[list]:
+        """Разбить поток шаблонов на части: первая - first_chunk, далее chunk_size"""
+        iterator = iter(items)
+        chunk = list(itertools.islice(iterator, first_chunk))
+        yield chunk
+        while chunk:
+            cls._check_cancelled(should_stop)
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if chunk:
+                yield chunk
+    
+    def search_ranked(self, query: str, category: str, limit: int = None,
+                      use_priors: bool = True, fuzzy: bool = False,
+                      category_type: str = None,
+                      should_stop: Callable[[], bool] = None) -> List[SearchHit]:
+        """
+        Ранжированный поиск в категории (BM25 по названию и тексту).
+        
+        Находит те же шаблоны, что и search_in_category, но возвращает
+        только limit лучших по убыванию релевантности.
+        
+        Args:
+            query: Текст для поиска
+            category: Категория
+            limit: Сколько лучших результатов вернуть
+            use_priors: Учитывать закрепление и число копирований
+            fuzzy: Допускать опечатки в словах запроса
+            category_type: Тип категорий, по умолчанию активный
+            should_stop: Проверка отмены (True - прервать через SearchCancelled)
+        
+        Returns:
+            Список SearchHit, лучшие первыми
+        """
+        if limit is None:
+            limit = SEARCH.RANKED_RESULTS_LIMIT
+        
+        with self.lock:
+            facet = self._facet(category, category_type)
+            category_ids = self.category_index.get(facet, [])
             if not category_ids:
                 return []
             
-            # Ищем пересечение: шаблоны содержащие ВСЕ слова
-            result_ids = category_ids.copy()
-            
-            for word in words:
-                # Ищем по точному совпадению и префиксам
-                matching_ids = set()
-                
-                for indexed_word, template_ids in self.word_index.items():
-                    if word in indexed_word or indexed_word.startswith(word):
-                        matching_ids.update(template_ids)
-                
-                # Пересекаем с результатом
-                result_ids &= matching_ids
-                
-                if not result_ids:
-                    return []  # Рано выходим если нет совпадений
-            
-            # Собираем результаты из кэша
-            results = []
-            for template_id in result_ids:
-                cache_key = (category, template_id)
-                if cache_key in self.template_cache:
-                    results.append(self.template_cache[cache_key])
-            
-            return results
-    
-    def get_category_templates(self, category: str, 
-                               template_manager) -> List[dict]:
+            result_ids, word_matches = self._run_query(facet, query, fuzzy, need_doc_freqs=True,
+                                                       should_stop=should_stop)
+            if not result_ids:
+                return []
+            
+            if not word_matches:
+                # Пустой запрос: порядок категории, закреплённые первыми
+                templates = sorted((self.template_cache[tid] for tid in category_ids),
+                                   key=lambda t: not t.get('pinned', False))
+                return [SearchHit(t, 0.0, *facet) for t in templates[:limit]]
+            
+            return self._top_hits(result_ids, word_matches, limit, use_priors, should_stop)
+    
+    def search_global(self, query: str, limit: int = None,
+                      use_priors: bool = True, fuzzy: bool = False,
+                      should_stop: Callable[[], bool] = None,
+                      tags: Iterable[str] = ()) -> List[SearchHit]:
+        """
+        Ранжированный поиск по всем категориям всех типов.
+        
+        Идёт по общему индексу без построения множества ID категории,
+        поэтому стоит столько же, сколько поиск в одной категории.
+        Каждый SearchHit содержит тип и категорию найденного шаблона.
+        
+        Args:
+            query: Текст для поиска
+            limit: Сколько лучших результатов вернуть
+            use_priors: Учитывать закрепление и число копирований
+            fuzzy: Допускать опечатки в словах запроса
+            should_stop: Проверка отмены (True - прервать через SearchCancelled)
+            tags: Теги, которыми должен быть отмечен шаблон
+        
+        Returns:
+            Список SearchHit, лучшие первыми (пустой для пустого запроса)
+        """
+        if limit is None:
+            limit = SEARCH.RANKED_RESULTS_LIMIT
+        
+        with self.lock:
+            if tags:
+                ordinals, word_matches = self._tagged_results(None, query, fuzzy, tags,
+                                                              need_doc_freqs=True,
+                                                              should_stop=should_stop)
+                result_ids = frozenset(map(self.doc_ids.__getitem__, ordinals))
+            else:
+                result_ids, word_matches = self._run_query(None, query, fuzzy, need_doc_freqs=True,
+                                                           should_stop=should_stop)
+            if not result_ids or not word_matches:
+                return []
+            return self._top_hits(result_ids, word_matches, limit, use_priors, should_stop)
+    
+    def tag_counts(self, query: str, category: str = None, category_type: str = None,
+                   fuzzy: bool = False, tags: Iterable[str] = (),
+                   should_stop: Callable[[], bool] = None) -> Dict[str, int]:
+        """
+        Сколько результатов запроса отмечено каждым тегом (для панели тегов).
+        
+        Номера результата (из кэша запросов) пересекаются со списком каждого
+        тега - шаблоны при этом не просматриваются.
+        
+        Args:
+            query: Текст запроса (пустой - все шаблоны области)
+            category: Категория или None - весь индекс
+            category_type: Тип категорий, по умолчанию активный
+            fuzzy: Допускать опечатки в словах запроса
+            tags: Уже выбранные теги (считается внутри отмеченного ими результата)
+            should_stop: Проверка отмены (True - прервать через SearchCancelled)
+        
+        Returns:
+            Тег -> число результатов с ним (только ненулевые, частые первыми)
+        """
+        with self.lock:
+            scope = None if category is None else self._facet(category, category_type)
+            ordinals, _ = self._tagged_results(scope, query, fuzzy, tags, should_stop=should_stop)
+            counts = {}
+            for key, postings in self.tag_postings.items():
+                count = len(intersect_postings(ordinals, postings))
+                if count:
+                    counts[self.tag_names[key]] = count
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0].casefold())))
+    
+    def _tagged_results(self, scope: Optional[Facet], query: str, fuzzy: bool,
+                        tags: Iterable[str], need_doc_freqs: bool = False,
+                        should_stop: Callable[[], bool] = None
+                        ) -> Tuple[array, List[Tuple[Set[str], Optional[int]]]]:
+        """Номера шаблонов, найденных запросом в области и отмеченных всеми тегами"""
+        if query.strip():
+            entry = self._query_entry(scope, query, fuzzy, need_doc_freqs, should_stop)
+            ordinals, word_matches = entry.result_postings, entry.word_matches
+        elif scope is not None:
+            ordinals, word_matches = self.category_postings.get(scope, new_postings()), []
+        else:
+            ordinals, word_matches = self._all_postings(), []
+        
+        for tag in tags:
+            self._check_cancelled(should_stop)
+            ordinals = intersect_postings(
+                ordinals, self.tag_postings.get(self._tag_key(tag), new_postings()))
+        return ordinals, word_matches
+    
+    def _all_postings(self) -> array:
+        """Номера всех шаблонов индекса"""
+        return new_postings(ordinal for ordinal, template_id in enumerate(self.doc_ids)
+                            if template_id is not None)
+    
+    def _top_hits(self, result_ids: Set[str], word_matches: List[Tuple[Set[str], int]],
+                  limit: int, use_priors: bool,
+                  should_stop: Callable[[], bool] = None) -> List[SearchHit]:
+        """limit лучших результатов по BM25 (через кучу) с фасетами и позициями совпадений"""
+        scored = ((self._score(template_id, word_matches, use_priors), template_id)
+                  for template_id in result_ids)
+        if should_stop is not None:
+            scored = self._checked(scored, should_stop)
+        top = heapq.nlargest(limit, scored, key=lambda item: item[0])
+        matched_terms = self._matched_terms(word_matches)
+        hits = []
+        for score, tid in top:
+            template = self.template_cache[tid]
+            hits.append(SearchHit(template, score, *self.doc_facets[tid],
+                                  self._match_spans(template, matched_terms)))
+        return hits
+    
+    @staticmethod
+    def _matched_terms(word_matches: List[Tuple[Set[str], Optional[int]]]) -> FrozenSet[str]:
+        """Все термины, найденные словами запроса"""
+        return frozenset(term for terms, _ in word_matches for term in terms)
+    
+    def _match_spans(self, template: dict, matched_terms: FrozenSet[str]
+                     ) -> Tuple[MatchSpan, ...]:
+        """
+        Позиции слов шаблона, совпавших с запросом.
+        
+        Слова берутся из исходного текста полей (с их смещениями), а
+        сравниваются после той же нормализации и стемминга, что и при
+        индексировании (слова нормализуются через кэш слов).
+        Теги в позиции не входят: в карточке их нет.
+        """
+        if not matched_terms:
+            return ()
+        spans = []
+        fields = ((FIELD_TITLE, str(template.get('title', ''))),
+                  (FIELD_TEXT, str(template.get('text', ''))))
+        for field, text in fields:
+            for match in SPAN_WORD_PATTERN.finditer(text):
+                words = WORD_PATTERN.findall(normalize_token(match.group()))
+                if any(self._stem(word) in matched_terms for word in words):
+                    spans.append(MatchSpan(field, match.start(), match.end()))
+        return tuple(spans)
+    
+    @staticmethod
+    def _checked(items, should_stop: Callable[[], bool]):
+        """Пропустить элементы, проверяя отмену раз в CANCEL_CHECK_INTERVAL"""
+        for count, item in enumerate(items):
+            if not count % CANCEL_CHECK_INTERVAL and should_stop():
+                raise SearchCancelled()
+            yield item
+    
+    @staticmethod
+    def _check_cancelled(should_stop: Optional[Callable[[], bool]]) -> None:
+        """Прервать поиск, если он больше не нужен"""
+        if should_stop is not None and should_stop():
+            raise SearchCancelled()
+    
+    def get_category_templates(self, category: str, template_manager,
+                               category_type: str = None) -> List[dict]:
         """Быстро получить все шаблоны в категории"""
-        return self._get_category_templates(category, template_manager)
+        return self._get_category_templates(category, template_manager, category_type)
     
-    def _get_category_templates(self, category: str, 
-                                template_manager) -> List[dict]:
+    def _get_category_templates(self, category: str, template_manager,
+                                category_type: str = None) -> List[dict]:
         """Внутренний метод получения категории"""
         # Проверяем кэш
-        if category in self.category_cache:
-            return self.category_cache[category]
+        facet = self._facet(category, category_type)
+        if facet in self.category_cache:
+            return self.category_cache[facet]
         
         # Если кэша нет - получаем из менеджера и кэшируем
-        templates = template_manager.get_templates(category)
-        self.category_cache[category] = templates
+        templates = template_manager.get_templates(category, facet[0])
+        self.category_cache[facet] = templates
         return templates
     
-    def invalidate_cache(self) -> None:
-        """Инвалидировать кэш при изменении шаблонов"""
+    def invalidate_cache(self, category: str = None, category_type: str = None) -> None:
+        """Инвалидировать кэш при изменении шаблонов (одной категории или всех)"""
+        with self.lock:
+            if category:
+                self.category_cache.pop(self._facet(category, category_type), None)
+            else:
+                self.category_cache.clear()
+                self.is_dirty = True
+    
+    @staticmethod
+    def _template_id(template: dict) -> str:
+        """Постоянный ID шаблона (для словарей без ID - id() объекта)"""
+        return template.get('id') or id(template)
+    
+    def _index_document(self, template: dict) -> str:
+        """Проиндексировать слова шаблона и вернуть его ID"""
+        template_id = self._template_id(template)
+        
+        # Сохраняем шаблон в кэш и выдаём ему следующий номер:
+        # номер больше всех прежних, поэтому добавляется в конец списков
+        self.template_cache[template_id] = template
+        if template.get('pinned', False):
+            self.pinned_ids.add(template_id)
+        ordinal = len(self.doc_ids)
+        self.doc_ids.append(template_id)
+        self.doc_ordinals[template_id] = ordinal
+        
+        for key, tag in self._template_tags(template).items():
+            self.tag_names.setdefault(key, tag)
+            self.tag_postings[key].append(ordinal)
+        
+        # Индексируем все слова (основы) с частотами по полям:
+        # нормализованные поля - из общего кэша
+        fields = self.normalized_text.get(template)
+        title_words = WORD_PATTERN.findall(fields.title)
+        text_words = WORD_PATTERN.findall(" ".join((fields.text, *fields.tags)))
+        stems = {word: self._stem(word) for word in {*title_words, *text_words}}
+        title_counts = Counter(stems[word] for word in title_words)
+        text_counts = Counter(stems[word] for word in text_words)
+        
+        terms = {}
+        for word in title_counts.keys() | text_counts.keys():
+            terms[word] = (title_counts[word], text_counts[word])
+            self._register_term(word)
+            self.word_index[word].append(ordinal)
+        self.doc_terms[template_id] = terms
+        
+        # Словоформы в другой раскладке/транслитом ведут к термину-основе
+        for word, stem in stems.items():
+            if word != stem and word not in self.surface_forms:
+                self.surface_forms.add(word)
+                self._register_alternates(self.term_ids[stem], word)
+                # Термин могут найти новые запросы - и в других категориях
+                self.vocabulary_generation += 1
+        
+        if SEARCH.PHRASE_QUERIES:
+            self._index_positions(ordinal, [stems[word] for word in title_words],
+                                  [stems[word] for word in text_words])
+        
+        lengths = (sum(title_counts.values()), sum(text_counts.values()))
+        self.doc_lengths[template_id] = lengths
+        self.field_length_totals[FIELD_TITLE] += lengths[FIELD_TITLE]
+        self.field_length_totals[FIELD_TEXT] += lengths[FIELD_TEXT]
+        
+        return template_id
+    
+    def _unindex_document(self, template_id: str) -> None:
+        """Убрать шаблон из списков всех его слов"""
+        self.template_cache.pop(template_id, None)
+        self.pinned_ids.discard(template_id)
+        lengths = self.doc_lengths.pop(template_id, (0, 0))
+        self.field_length_totals[FIELD_TITLE] -= lengths[FIELD_TITLE]
+        self.field_length_totals[FIELD_TEXT] -= lengths[FIELD_TEXT]
+        
+        ordinal = self.doc_ordinals.pop(template_id, None)
+        if ordinal is None:
+            return
+        self.doc_ids[ordinal] = None
+        
+        # Тегов у шаблона немного, а старые могли смениться на месте -
+        # номер ищется во всех списках тегов
+        for key in [key for key, ordinals in self.tag_postings.items()
+                    if remove_posting(ordinals, ordinal) and not ordinals]:
+            del self.tag_postings[key]
+            del self.tag_names[key]
+        
+        for word in self.doc_terms.pop(template_id, {}):
+            entries = self.position_index.get(word)
+            if entries is not None:
+                start, end = document_range(entries, ordinal)
+                del entries[start:end]
+                if not entries:
+                    del self.position_index[word]
+            
+            ordinals = self.word_index.get(word)
+            if ordinals is None:
+                continue
+            remove_posting(ordinals, ordinal)
+            if not ordinals:
+                # Термин остаётся в словаре: пустой список ничего не найдёт
+                del self.word_index[word]
+    
+    def _index_positions(self, ordinal: int, title_terms: List[str], text_terms: List[str]) -> None:
+        """
+        Записать позиции слов шаблона (текст - после промежутка за названием).
+        
+        Номер шаблона больше всех прежних, поэтому записи добавляются
+        в конец списков и те остаются отсортированными.
+        """
+        text_start = len(title_terms) + FIELD_POSITION_GAP
+        for start, terms in ((0, title_terms), (text_start, text_terms)):
+            for position, term in enumerate(terms, start):
+                if position > POSITION_MASK:
+                    break  # Дальше позиции не помещаются в запись
+                self.position_index[term].append(pack_position(ordinal, position))
+    
+    def _register_term(self, term: str) -> int:
+        """Добавить слово в словарь терминов и триграммный индекс"""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.terms.append(term)
+            self.term_ids[term] = term_id
+            for gram in self._ngrams(term):
+                # ID нового термина больше всех прежних - список остаётся отсортированным
+                self.gram_index[gram].append(term_id)
+            if self._suffixes is not None:
+                self._insert_suffixes(term_id)
+            if self._fuzzy_index is not None:
+                self._fuzzy_index.add(term_id, term)
+            self._register_alternates(term_id, term)
+        return term_id
+    
+    def _register_alternates(self, term_id: int, term: str) -> None:
+        """Сохранить написания термина в другой раскладке и транслитом"""
+        for key in alternate_keys(term, SEARCH.LAYOUT_SWAP, SEARCH.TRANSLIT):
+            current = self.alternate_index.get(key)
+            if current is None:
+                self.alternate_index[key] = term_id
+                if self._alternate_keys is not None:
+                    insort(self._alternate_keys, key)
+            elif isinstance(current, list):
+                current.append(term_id)
+            else:
+                self.alternate_index[key] = [current, term_id]
+    
+    def _run_query(self, scope: Optional[Facet], query: str, fuzzy: bool = False,
+                   need_doc_freqs: bool = False, should_stop: Callable[[], bool] = None
+                   ) -> Tuple[FrozenSet[str], List[Tuple[Set[str], Optional[int]]]]:
+        """Выполнить запрос через кэш: (ID найденных шаблонов, совпадения слов)"""
+        entry = self._query_entry(scope, query, fuzzy, need_doc_freqs, should_stop)
+        return entry.result_ids, entry.word_matches
+    
+    def _query_entry(self, scope: Optional[Facet], query: str, fuzzy: bool = False,
+                     need_doc_freqs: bool = False, should_stop: Callable[[], bool] = None
+                     ) -> CachedQuery:
+        """
+        Выполнить запрос через кэш результатов (запись кэша с результатом).
+        
+        Повтор запроса берётся из кэша. Запрос, дописывающий закэшированный,
+        проверяет только его результат, а термины дописанных слов выбирает
+        из терминов закэшированных. Остальные идут по индексу.
+        
+        Args:
+            scope: Фасет категории или None для всего индекса
+            query: Текст запроса
+            fuzzy: Допускать опечатки в словах запроса
+            need_doc_freqs: Нужны df слов (для ранжирования)
+            should_stop: Проверка отмены (до записи результата в кэш)
+        """
+        key = " ".join(self._normalize(query).split())
+        generation = self._scope_generation(scope)
+        
+        entry = self.query_cache.get(scope, key, fuzzy, generation)
+        if entry is not None:
+            fresh_doc_freqs = (entry.index_generation == self.generation
+                               and all(df is not None for _, df in entry.word_matches))
+            if not need_doc_freqs or fresh_doc_freqs:
+                return entry
+        elif not fuzzy:
+            entry = self.query_cache.find_prefix(scope, key, generation)
+        
+        parsed = parse_query_syntax(query)
+        words = self._parse_query(parsed.text)
+        constraints = self._proximity_constraints(parsed)
+        candidates = None
+        known_terms = {}
+        # Результат с фразами/NEAR - не надмножество: NEAR/1 -> NEAR/10 его расширяет
+        if entry is not None and not entry.constraints and self._narrows(words, entry.words):
+            candidates = entry.result_postings
+            # Новые термины (в других категориях) сделали бы df неполными
+            if not fuzzy and entry.index_generation == self.generation:
+                known_terms = self._extended_terms(words, entry)
+        scope_postings = None if scope is None else self.category_postings.get(scope, new_postings())
+        ordinals, word_matches = self._execute_query(words, scope_postings, fuzzy, candidates,
+                                                     should_stop, constraints, known_terms)
+        
+        if need_doc_freqs:
+            word_matches = self._fill_doc_freqs(word_matches)
+        if ordinals is None:
+            ordinals = self._all_postings()
+        result_ids = frozenset(map(self.doc_ids.__getitem__, ordinals))
+        entry = CachedQuery(generation, self.generation, words, result_ids, ordinals, word_matches,
+                            constraints)
+        self.query_cache.put(scope, key, fuzzy, entry)
+        return entry
+    
+    @staticmethod
+    def _narrows(words: Dict[str, Set[int]], cached_words: Dict[str, Set[int]]) -> bool:
+        """
+        Может ли запрос найти только часть результата закэшированного.
+        
+        Так будет, если каждое закэшированное слово входит в какое-то новое
+        слово, а термины нового по альтернативным ключам - среди его терминов.
+        """
+        return all(
+            any(old in new and new_alternates <= old_alternates
+                for new, new_alternates in words.items())
+            for old, old_alternates in cached_words.items()
+        )
+    
+    @classmethod
+    def _extended_terms(cls, words: Dict[str, Set[int]], entry: CachedQuery) -> Dict[str, Set[str]]:
+        """
+        Термины закэшированных слов для слов запроса, которые их дописывают.
+        
+        Термин, содержащий дописанное слово ("ставк"), содержит и прежнее
+        ("став"), поэтому его термины - среди терминов прежнего слова.
+        Для каждого слова берётся самое длинное прежнее (меньше терминов).
+        """
+        # word_matches идут в порядке выполнения слов (при пустом результате - не все)
+        cached_terms = dict(zip(cls._word_order(entry.words),
+                                (terms for terms, _ in entry.word_matches)))
+        known_terms = {}
+        for word, alternates in words.items():
+            for old, terms in cached_terms.items():
+                if old in word and alternates <= entry.words[old]:
+                    known_terms[word] = terms
+                    break
+        return known_terms
+    
+    @staticmethod
+    def _word_order(words: Dict[str, Set[int]]) -> List[str]:
+        """Порядок выполнения слов: сначала самые длинные - они самые избирательные"""
+        return sorted(words, key=len, reverse=True)
+    
+    def _execute_query(self, words: Dict[str, Set[int]], scope_postings: Optional[array],
+                       fuzzy: bool = False, candidates: Optional[array] = None,
+                       should_stop: Callable[[], bool] = None,
+                       constraints: Tuple[Proximity, ...] = (),
+                       known_terms: Dict[str, Set[str]] = None
+                       ) -> Tuple[Optional[array], List[Tuple[Set[str], Optional[int]]]]:
+        """
+        Найти номера шаблонов категории, содержащих ВСЕ слова запроса.
+        
+        В нечётком режиме слову подходят также термины с опечаткой.
+        При scope_postings=None ищется по всему индексу: начальный список
+        не строится, его заменяют шаблоны первого слова.
+        
+        Если результат уже сужен (категорией, кандидатами - заведомым
+        надмножеством результата - или предыдущими словами) и в нём намного
+        меньше номеров, чем записей в списках слова, списки не объединяются:
+        проверяются только термины найденных шаблонов, а df слова не
+        считается (None).
+        
+        Для слов из known_terms подходящие термины выбираются среди
+        переданных (терминов закэшированного слова, которое они дописывают),
+        а не по всему словарю.
+        
+        Перед каждым словом проверяется should_stop (SearchCancelled).
+        
+        Найденные шаблоны затем проверяются на ограничения constraints
+        (фразы, NEAR) по позиционному индексу.
+        
+        Returns:
+            (номера найденных шаблонов или None - все шаблоны,
+             [(подходящие термины слова, df слова)])
+        """
+        # Ищем пересечение: шаблоны содержащие ВСЕ слова
+        result = candidates if candidates is not None else scope_postings
+        word_matches = []
+        word_terms = {}
+        
+        known_terms = known_terms or {}
+        
+        for word in self._word_order(words):
+            self._check_cancelled(should_stop)
+            if word in known_terms:
+                term_ids = words[word]
+                matched_terms = {term for term in known_terms[word] if word in term}
+            else:
+                term_ids = self._match_terms(word) | words[word]
+                if fuzzy:
+                    term_ids |= self._match_fuzzy(word)
+                matched_terms = set()
+            matched_terms.update(self.terms[term_id] for term_id in term_ids
+                                 if self.word_index.get(self.terms[term_id]))
+            word_terms[word] = matched_terms
+            
+            refine = False
+            if result is not None:
+                postings = sum(len(self.word_index[term]) for term in matched_terms)
+                refine = len(result) * REFINE_COST < postings
+            
+            if refine:
+                # Уточнение: у каждого кандидата проверяем его собственные термины
+                doc_ids, doc_terms = self.doc_ids, self.doc_terms
+                result = new_postings(
+                    ordinal for ordinal in result
+                    if not doc_terms[doc_ids[ordinal]].keys().isdisjoint(matched_terms))
+                word_matches.append((matched_terms, None))
+            else:
+                lists = [self.word_index[term] for term in matched_terms]
+                if result is None:
+                    result = union_postings(lists)
+                    doc_freq = len(result)
+                else:
+                    # Пересекаем с результатом (df - размер объединения)
+                    result, doc_freq = intersect_union(result, lists)
+                word_matches.append((matched_terms, doc_freq))
+            
+            if not result:
+                break  # Рано выходим если нет совпадений
+        
+        if constraints and result:
+            result = self._apply_proximity(result, constraints, word_terms, should_stop)
+        return result, word_matches
+    
+    def _proximity_constraints(self, parsed: ParsedQuery) -> Tuple[Proximity, ...]:
+        """Фразы и NEAR запроса как ограничения на позиции его слов"""
+        if not SEARCH.PHRASE_QUERIES or not parsed.has_operators:
+            return ()
+        constraints = []
+        for phrase in parsed.phrases:
+            phrase_words = tuple(word for word, _ in self._query_words(phrase))
+            if len(phrase_words) > 1:
+                constraints.append(Proximity(phrase_words, 1, True))
+        for left, right, distance in parsed.nears:
+            left_words = self._query_words(left)
+            right_words = self._query_words(right)
+            if left_words and right_words:
+                # Соседние с оператором слова: "а б" NEAR/2 в - это б и в
+                constraints.append(Proximity((left_words[-1][0], right_words[0][0]),
+                                             max(distance, 1), False))
+        return tuple(constraints)
+    
+    def _apply_proximity(self, result: array, constraints: Tuple[Proximity, ...],
+                         word_terms: Dict[str, Set[str]],
+                         should_stop: Callable[[], bool] = None) -> array:
+        """Оставить шаблоны, где слова стоят так, как требуют ограничения"""
+        for constraint in constraints:
+            self._check_cancelled(should_stop)
+            positions = [self._word_positions(word_terms.get(word, ()), result)
+                         for word in constraint.words]
+            empty = new_postings()
+            result = new_postings(
+                ordinal for ordinal in result
+                if self._satisfies(constraint, [word_positions.get(ordinal, empty)
+                                                for word_positions in positions]))
+            if not result:
+                break
+        return result
+    
+    def _word_positions(self, terms: Iterable[str], ordinals: array) -> Dict[int, array]:
+        """
+        Позиции слова (любого из его терминов) в каждом из шаблонов ordinals.
+        
+        Для немногих кандидатов записи ищутся бинарным поиском, иначе
+        позиционный список термина просматривается целиком.
+        """
+        found = defaultdict(list)
+        wanted = None
+        for term in terms:
+            entries = self.position_index.get(term)
+            if not entries:
+                continue
+            if len(ordinals) * POSITION_LOOKUP_COST < len(entries):
+                for ordinal in ordinals:
+                    start, end = document_range(entries, ordinal)
+                    if start < end:
+                        found[ordinal].extend(entry & POSITION_MASK for entry in entries[start:end])
+            else:
+                if wanted is None:
+                    wanted = set(ordinals)
+                for entry in entries:
+                    ordinal = entry >> POSITION_BITS
+                    if ordinal in wanted:
+                        found[ordinal].append(entry & POSITION_MASK)
+        return {ordinal: new_postings(sorted(set(positions))) for ordinal, positions in found.items()}
+    
+    @staticmethod
+    def _satisfies(constraint: Proximity, positions: List[array]) -> bool:
+        """Проверить ограничение слиянием отсортированных списков позиций слов"""
+        if not all(positions):
+            return False
+        if constraint.ordered:
+            # Фраза: начала, от которых i-е слово стоит на i позиций дальше
+            starts = positions[0]
+            for offset, word_positions in enumerate(positions[1:], 1):
+                shifted = new_postings(position - offset for position in word_positions
+                                       if position >= offset)
+                starts = intersect_postings(starts, shifted)
+                if not starts:
+                    return False
+            return True
+        
+        # NEAR: два указателя по спискам, пока не найдётся пара ближе distance
+        first, second = positions
+        i = j = 0
+        while i < len(first) and j < len(second):
+            if abs(first[i] - second[j]) <= constraint.distance:
+                return True
+            if first[i] < second[j]:
+                i += 1
+            else:
+                j += 1
+        return False
+    
+    def _fill_doc_freqs(self, word_matches: List[Tuple[Set[str], Optional[int]]]
+                        ) -> List[Tuple[Set[str], int]]:
+        """Досчитать df слов, пропущенные при уточнении кэшированного результата"""
+        filled = []
+        for matched_terms, doc_freq in word_matches:
+            if doc_freq is None:
+                doc_freq = len(union_postings([self.word_index[term] for term in matched_terms]))
+            filled.append((matched_terms, doc_freq))
+        return filled
+    
+    def _parse_query(self, query: str) -> Dict[str, Set[int]]:
+        """
+        Разобрать запрос на слова с терминами по альтернативным ключам.
+        
+        Части запроса между пробелами проверяются по ключам целиком:
+        в другой раскладке буквы "бюжхэ" становятся знаками препинания,
+        и такая часть не должна распадаться на отдельные слова.
+        """
+        words = {}
+        for word, alternates in self._query_words(query):
+            words.setdefault(word, set()).update(alternates)
+        return words
+    
+    def _query_words(self, text: str) -> List[Tuple[str, Set[int]]]:
+        """Слова запроса по порядку (ключи _parse_query) с альтернативными терминами"""
+        words = []
+        for chunk in self._normalize(text).split():
+            alternates = self._match_alternates(chunk)
+            if alternates and not WORD_PATTERN.fullmatch(chunk):
+                words.append((chunk, alternates))
+                continue
+            words.extend((word, alternates) for word in self._tokenize(chunk))
+        return words
+    
+    def _match_alternates(self, chunk: str) -> Set[int]:
+        """Найти ID терминов, чьё другое написание начинается с chunk"""
+        if len(chunk) < SEARCH.ALTERNATE_MIN_LENGTH or not self.alternate_index:
+            return set()
+        
+        keys = {chunk}
+        if SEARCH.TRANSLIT and has_latin(chunk):
+            keys.add(translit_key(chunk))
+        
+        term_ids = set()
+        for key in keys:
+            # Дописанное слово находится сразу, недописанное - по началу ключа
+            found = self.alternate_index.get(key)
+            if found is not None:
+                term_ids.update(found if isinstance(found, list) else (found,))
+            
+            alternate_keys = self._get_alternate_keys()
+            start = bisect_left(alternate_keys, key)
+            end = bisect_left(alternate_keys, key + _MAX_CHAR, lo=start)
+            for other_key in alternate_keys[start:end]:
+                if other_key == key:
+                    continue
+                found = self.alternate_index[other_key]
+                term_ids.update(found if isinstance(found, list) else (found,))
+        return term_ids
+    
+    def _get_alternate_keys(self) -> List[str]:
+        """Отсортированный список альтернативных ключей (строится по требованию)"""
+        if self._alternate_keys is None:
+            self._alternate_keys = sorted(self.alternate_index)
+        return self._alternate_keys
+    
+    def alternate_memory_usage(self) -> int:
+        """
+        Оценка памяти под альтернативные ключи (раскладка и транслит), байт.
+        
+        Учитывает словарь ключей, сами строки, списки ID, отсортированный
+        список ключей для поиска по началу и учтённые словоформы.
+        """
         with self.lock:
-            self.category_cache.clear()
-            self.is_dirty = True
+            total = sys.getsizeof(self.alternate_index) + sys.getsizeof(self.surface_forms)
+            total += sum(sys.getsizeof(word) for word in self.surface_forms)
+            for key, found in self.alternate_index.items():
+                total += sys.getsizeof(key)
+                if isinstance(found, list):
+                    total += sys.getsizeof(found)
+            if self._alternate_keys is not None:
+                total += sys.getsizeof(self._alternate_keys)
+            return total
     
-    def _extract_text(self, template: dict) -> str:
-        """Извлечь текст для индексирования"""
+    def _score(self, template_id: str, word_matches: List[Tuple[Set[str], int]],
+               use_priors: bool) -> float:
+        """
+        Оценка BM25F шаблона для запроса.
+        
+        Частоты слова в полях складываются по всем подходящим терминам,
+        нормируются на длину поля и взвешиваются (название - с бустом).
+        """
+        total_docs = len(self.doc_lengths)
+        title_len, text_len = self.doc_lengths[template_id]
+        avg_title = max(self.field_length_totals[FIELD_TITLE] / total_docs, 1.0)
+        avg_text = max(self.field_length_totals[FIELD_TEXT] / total_docs, 1.0)
+        b = SEARCH.BM25_B
+        title_norm = 1 - b + b * title_len / avg_title
+        text_norm = 1 - b + b * text_len / avg_text
+        
+        doc_terms = self.doc_terms[template_id]
+        score = 0.0
+        for matched_terms, doc_freq in word_matches:
+            # Перебираем меньшее из двух множеств
+            if len(matched_terms) < len(doc_terms):
+                pairs = (doc_terms[t] for t in matched_terms if t in doc_terms)
+            else:
+                pairs = (tf for t, tf in doc_terms.items() if t in matched_terms)
+            
+            tf_title = tf_text = 0
+            for title_tf, text_tf in pairs:
+                tf_title += title_tf
+                tf_text += text_tf
+            
+            tf = SEARCH.TITLE_BOOST * tf_title / title_norm + tf_text / text_norm
+            idf = math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            score += idf * tf / (SEARCH.BM25_K1 + tf)
+        
+        if use_priors:
+            template = self.template_cache[template_id]
+            if template.get('pinned', False):
+                score += SEARCH.PINNED_PRIOR
+            if self.usage_source is not None:
+                usage = self.usage_source(template)
+            else:
+                usage = template.get('stats', {}).get('usage_count', 0)
+            score += SEARCH.USAGE_PRIOR_WEIGHT * math.log1p(usage)
+        
+        return score
+    
+    def _match_terms(self, word: str) -> Set[int]:
+        """
+        Найти ID терминов, содержащих слово как подстроку.
+        
+        Пересекает списки терминов по триграммам слова (от самого короткого),
+        затем проверяет кандидатов. Слова короче триграммы ищутся
+        по словарю суффиксов.
+        """
+        if len(word) < NGRAM_SIZE:
+            return self._match_suffixes(word)
+        
+        postings = []
+        for gram in self._ngrams(word):
+            term_ids = self.gram_index.get(gram)
+            if not term_ids:
+                return set()
+            postings.append(term_ids)
+        
+        postings.sort(key=len)
+        candidates = postings[0]
+        for term_ids in postings[1:]:
+            candidates = intersect_postings(candidates, term_ids)
+            if not candidates:
+                return set()
+        
+        # Совпадение всех триграмм не гарантирует вхождения - проверяем
+        if len(word) > NGRAM_SIZE:
+            return {term_id for term_id in candidates if word in self.terms[term_id]}
+        
+        return set(candidates)
+    
+    def _match_fuzzy(self, word: str) -> Set[int]:
+        """
+        Найти ID терминов на расстоянии редактирования 1-2 от слова.
+        
+        Допустимое расстояние зависит от длины слова: в коротких словах
+        одна опечатка уже меняет смысл, а слишком короткие не исправляются.
+        """
+        if len(word) < SEARCH.FUZZY_MIN_WORD_LENGTH:
+            return set()
+        
+        max_distance = 1
+        if len(word) >= SEARCH.FUZZY_DISTANCE_2_WORD_LENGTH:
+            max_distance = 2
+        
+        return self._get_fuzzy_index().lookup(word, self.terms, max_distance)
+    
+    def _get_fuzzy_index(self) -> DeletionIndex:
+        """Индекс удалений по словарю терминов (строится по требованию)"""
+        if self._fuzzy_index is None:
+            self._fuzzy_index = DeletionIndex(SEARCH.FUZZY_MAX_DISTANCE,
+                                              SEARCH.FUZZY_PREFIX_LENGTH)
+            for term_id, term in enumerate(self.terms):
+                self._fuzzy_index.add(term_id, term)
+        return self._fuzzy_index
+    
+    def _match_suffixes(self, prefix: str, whole_terms: bool = False) -> Set[int]:
+        """
+        Найти ID терминов, у которых есть суффикс с заданным префиксом.
+        
+        Суффикс с префиксом prefix означает вхождение prefix в термин.
+        Диапазон находится двумя бинарными поисками - O(log V + совпадения).
+        
+        Args:
+            prefix: Искомое начало суффикса
+            whole_terms: Учитывать только суффиксы с нулевым смещением,
+                то есть искать термины, начинающиеся с prefix
+        """
+        suffixes = self._get_suffixes()
+        key = self._suffix_key
+        start = bisect_left(suffixes, prefix, key=key)
+        end = bisect_left(suffixes, prefix + _MAX_CHAR, lo=start, key=key)
+        
+        if whole_terms:
+            return {entry >> SUFFIX_SHIFT for entry in suffixes[start:end]
+                    if not entry & SUFFIX_MASK}
+        return {entry >> SUFFIX_SHIFT for entry in suffixes[start:end]}
+    
+    def match_prefix(self, prefix: str) -> Set[str]:
+        """Получить все слова индекса, начинающиеся с prefix"""
+        with self.lock:
+            return {self.terms[term_id]
+                    for term_id in self._match_suffixes(self._normalize(prefix), whole_terms=True)}
+    
+    def _get_suffixes(self) -> array:
+        """Отсортированный массив упакованных суффиксов (строится по требованию)"""
+        if self._suffixes is None:
+            entries = [
+                (term_id << SUFFIX_SHIFT) | offset
+                for term_id, term in enumerate(self.terms)
+                for offset in range(min(len(term), SUFFIX_MASK + 1))
+            ]
+            entries.sort(key=self._suffix_key)
+            self._suffixes = array('Q', entries)
+        return self._suffixes
+    
+    def _insert_suffixes(self, term_id: int) -> None:
+        """Вставить суффиксы нового термина в уже построенный массив"""
+        key = self._suffix_key
+        for offset in range(min(len(self.terms[term_id]), SUFFIX_MASK + 1)):
+            entry = (term_id << SUFFIX_SHIFT) | offset
+            position = bisect_left(self._suffixes, key(entry), key=key)
+            self._suffixes.insert(position, entry)
+    
+    def _suffix_key(self, entry: int) -> str:
+        """Распаковать суффикс в строку для сравнения"""
+        return self.terms[entry >> SUFFIX_SHIFT][entry & SUFFIX_MASK:]
+    
+    def _extract_fields(self, template: dict) -> Tuple[str, str]:
+        """Извлечь поля для индексирования: (название, текст с тегами)"""
         parts = []
         
         # Используем точные ключи из шаблонов
-        if 'title' in template:
-            parts.append(template['title'])
         if 'text' in template:
             parts.append(template['text'])
         if 'tags' in template and isinstance(template['tags'], list):
             parts.extend(template['tags'])
         
-        return ' '.join(str(p) for p in parts)
+        return str(template.get('title', '')), ' '.join(str(p) for p in parts)
+    
+    def _template_tags(self, template: dict) -> Dict[str, str]:
+        """Теги шаблона: нормализованный ключ -> тег как написан"""
+        tags = template.get('tags')
+        if not isinstance(tags, list):
+            return {}
+        keyed = {}
+        for tag, key in zip(tags, self.normalized_text.get(template).tags):
+            if key:
+                keyed.setdefault(key, str(tag).strip())
+        return keyed
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        """Ключ тега в индексе (регистр и ё не различаются)"""
+        return normalize_field(tag)
     
     def _tokenize(self, text: str) -> List[str]:
-        """Разбить текст на слова (токены). Поддерживает русский язык."""
-        # Удаляем спецсимволы, приводим к нижнему регистру
-        text = text.lower()
+        """Разбить текст на уникальные слова (токены). Поддерживает русский язык."""
+        # Приводим к единой форме (регистр, ё, совместимые символы)
+        text = self._normalize(text)
         
         # Разбиваем на слова (мин. 1 символ, поддержка кириллицы)
-        # Включает буквы (ASCII и кириллица) и цифры
-        words = re.findall(r'[a-яa-z0-9]{1,}', text)
-        
-        # Добавляем подстроки (для поиска "те" в "тест")
-        substrings = set()
-        for word in words:
-            # Добавляем все подстроки длины >= 2
-            for i in range(len(word) - 1):
-                for j in range(i + 2, len(word) + 1):
-                    substrings.add(word[i:j])
-        
-        return list(set(words)) + list(substrings)
+        # Включает буквы (ASCII и кириллица) и цифры.
+        # Подстроки больше не храним: их находит триграммный индекс
+        return list(dict.fromkeys(self._stem(word) for word in WORD_PATTERN.findall(text)))
+    
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Нормализовать текст (или только привести к нижнему регистру)"""
+        return normalize_search_text(text)
+    
+    @staticmethod
+    def _stem(word: str) -> str:
+        """Основа слова, если включён стемминг"""
+        if SEARCH.STEMMING:
+            return stem_word(word)
+        return word
+    
+    @staticmethod
+    def _ngrams(word: str) -> Set[str]:
+        """Получить все триграммы слова"""
+        return {word[i:i + NGRAM_SIZE] for i in range(len(word) - NGRAM_SIZE + 1)}
 
 
 # Глобальный индекс (синглтон)
@@ -0,0 +1,474 @@
+"""
+Хранилище шаблонов в SQLite (для больших библиотек)
+
+Вместо JSON-файла на каждый тип категорий шаблоны, категории,
+закрепление и статистика хранятся в таблицах одной базы (режим WAL):
+изменение - одна короткая транзакция, файл не переписывается целиком.
+Счётчики использования, как и у JSON-хранилища, - в файле счётчиков.
+
+Интерфейс тот же, что у TemplateManager: шаблоны держатся в памяти
+(интерфейс и поисковый индекс работают с ними), а каждое изменение
+записывается в базу той же записью, что и в журнал JSON-хранилища.
+
+Полнотекстовая таблица FTS5 (токенизатор trigram, если он есть в
+SQLite) хранит нормализованные название, текст и теги. Через неё
+отвечает search_templates - пока поисковый индекс в памяти строится.
+
+Ключ снимка поискового индекса - номер ревизии базы, который растёт
+с каждой транзакцией изменения.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import PATHS, SEARCH
+from models.normalized_text import normalize_field
+from models.query_syntax import parse_query_syntax
+from models.template_manager import TemplateManager
+
+
+# Версия схемы базы: увеличивается при изменении таблиц
+SCHEMA_VERSION = 1
+
+# Токенизатор trigram ищет подстроки не короче 3 символов
+TRIGRAM_MIN_LENGTH = 3
+
+# Шаг обработчика прогресса SQLite (в инструкциях VM) для отмены поиска
+PROGRESS_STEPS = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS categories (
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (type, name)
+);
+CREATE TABLE IF NOT EXISTS templates (
+    num INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    text TEXT NOT NULL,
+    tags TEXT NOT NULL DEFAULT '[]',
+    pinned INTEGER NOT NULL DEFAULT 0,
+    stats TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS templates_by_category ON templates (type, category, position);
+"""
+
+
+class SQLiteTemplateManager(TemplateManager):
+    """
+    Менеджер шаблонов с хранением в SQLite
+    
+    Запись идёт из главного потока (и из потока отложенной записи)
+    через одно соединение под блокировкой; поиск через FTS5 - из рабочего
+    потока поиска через отдельное соединение для чтения (WAL позволяет
+    читать параллельно с записью).
+    """
+    
+    def __init__(self, path: str = None):
+        """
+        Args:
+            path: Путь к файлу базы (по умолчанию PATHS.TEMPLATES_DB)
+        """
+        self.db_path = path or PATHS.TEMPLATES_DB
+        self._db: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.RLock()
+        self._reader_lock = threading.Lock()
+        self._revision = 0
+        self._fts_tokenizer: Optional[str] = None
+        super().__init__()
+    
+    # ==================== БАЗА ====================
+    
+    def load_templates(self) -> None:
+        """Открыть базу (при первом запуске - перенести JSON) и загрузить шаблоны"""
+        self._open_database()
+        if self._get_meta('migrated') is None:
+            self._migrate_from_json()
+        super().load_templates()
+    
+    def _open_database(self) -> None:
+        """Открыть соединения, создать схему и полнотекстовую таблицу"""
+        self._close_database()
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.executescript(_SCHEMA)
+            self._set_meta('schema', SCHEMA_VERSION, replace=False)
+            self._set_meta('revision', 0, replace=False)
+        self._revision = int(self._get_meta('revision'))
+        self._create_fts()
+        
+        self._reader = sqlite3.connect(self.db_path, check_same_thread=False)
+    
+    def _create_fts(self) -> None:
+        """Создать таблицу FTS5 (trigram, иначе unicode61; без FTS5 - без неё)"""
+        self._fts_tokenizer = None
+        for tokenizer in ('trigram', 'unicode61'):
+            try:
+                with self._db:
+                    self._db.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS templates_fts"
+                        f" USING fts5(title, text, tags, tokenize='{tokenizer}')")
+            except sqlite3.OperationalError:
+                continue
+            self._fts_tokenizer = self._get_meta('fts_tokenizer') or tokenizer
+            break
+        if self._fts_tokenizer is None:
+            print("SQLite без FTS5: поиск до построения индекса - просмотром шаблонов")
+            return
+        
+        # Таблица хранит нормализованный текст: при смене нормализации
+        # (или при создании таблицы) она заполняется заново
+        normalization = str(SEARCH.NORMALIZE_TEXT)
+        if self._get_meta('fts_normalization') != normalization:
+            with self._db:
+                self._db.execute("DELETE FROM templates_fts")
+                rows = self._db.execute("SELECT num, title, text, tags FROM templates").fetchall()
+                self._db.executemany(
+                    "INSERT INTO templates_fts (rowid, title, text, tags) VALUES (?, ?, ?, ?)",
+                    [(num, *self._fts_fields({'title': title, 'text': text, 'tags': json.loads(tags)}))
+                     for num, title, text, tags in rows])
+                self._set_meta('fts_normalization', normalization)
+                self._set_meta('fts_tokenizer', self._fts_tokenizer)
+    
+    def _close_database(self) -> None:
+        """Закрыть соединения с базой"""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+    
+    def _get_meta(self, key: str) -> Optional[str]:
+        """Значение из таблицы meta (None - нет ключа)"""
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key: str, value, replace: bool = True) -> None:
+        """Записать значение в таблицу meta (внутри транзакции)"""
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        self._db.execute(f"{verb} INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+    
+    def _bump_revision(self) -> None:
+        """Новая ревизия базы (внутри транзакции изменения)"""
+        self._revision += 1
+        self._set_meta('revision', self._revision)
+    
+    def _migrate_from_json(self) -> None:
+        """
+        Однократный перенос шаблонов из JSON-файлов (с журналом изменений)
+        
+        Файлы остаются на месте как резервная копия; повторно перенос
+        не выполняется (отметка migrated в meta).
+        """
+        type_categories = {}
+        for category_type, filename in self.files.items():
+            if not os.path.exists(filename):
+                continue
+            try:
+                with open(filename, 'rb') as f:
+                    data = self.serializer.loads(f.read())
+                if not isinstance(data, dict):
+                    raise ValueError("Неверный формат JSON")
+            except (json.JSONDecodeError, IOError, ValueError) as e:
+                print(f"Ошибка при переносе шаблонов из {filename}: {e}")
+                continue
+            type_categories[category_type] = self._validate_templates(data, category_type)
+        
+        if type_categories:
+            # Изменения из журнала, ещё не перенесённые в файлы
+            self._type_categories = type_categories
+            self._ensure_template_ids()
+            self._rebuild_id_map()
+            for record in self.journal.read():
+                try:
+                    self._apply_record(record)
+                except (KeyError, TypeError, ValueError, AttributeError) as e:
+                    print(f"Пропущена запись журнала шаблонов: {e}")
+            self._journal_types.clear()
+            self.journal.close()
+        
+        with self._db_lock, self._db:
+            for category_type, categories in type_categories.items():
+                self._write_type(category_type, categories)
+            self._set_meta('migrated', 1)
+            self._bump_revision()
+        if type_categories:
+            print(f"Шаблоны перенесены из JSON в {self.db_path}")
+    
+    # ==================== ЗАГРУЗКА И ЗАПИСЬ ====================
+    
+    def _load_type_templates(self, category_type: str) -> Dict[str, List[Dict]]:
+        """Загрузить шаблоны одного типа из базы"""
+        categories: Dict[str, List[Dict]] = {
+            name: [] for (name,) in self._db.execute(
+                "SELECT name FROM categories WHERE type = ? ORDER BY position", (category_type,))
+        }
+        rows = self._db.execute(
+            "SELECT id, category, title, text, tags, pinned, stats FROM templates"
+            " WHERE type = ? ORDER BY position", (category_type,))
+        for template_id, category, title, text, tags, pinned, stats in rows:
+            template = {
+                'id': template_id,
+                'title': title,
+                'text': text,
+                'pinned': bool(pinned),
+                'stats': json.loads(stats)
+            }
+            tags = json.loads(tags)
+            if tags:
+                template['tags'] = tags
+            categories.setdefault(category, []).append(template)
+        
+        if not categories:
+            return self._create_default_templates(category_type)
+        return categories
+    
+    def save_templates(self, category_type: str = None) -> bool:
+        """
+        Переписать все шаблоны типа в базе (одной транзакцией)
+        
+        Args:
+            category_type (str): Тип категорий, по умолчанию текущий
+        
+        Returns:
+            bool: True если сохранение успешно, False в случае ошибки
+        """
+        category_type = category_type or self.current_category_type
+        try:
+            with self._db_lock, self._db:
+                self._write_type(category_type, self._copy_categories(category_type))
+                self._bump_revision()
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка при сохранении шаблонов в базу: {e}")
+            return False
+    
+    def _write_type(self, category_type: str, categories: Dict[str, List[Dict]]) -> None:
+        """Заменить категории и шаблоны типа (внутри транзакции)"""
+        db = self._db
+        if self._fts_tokenizer:
+            db.execute("DELETE FROM templates_fts WHERE rowid IN"
+                       " (SELECT num FROM templates WHERE type = ?)", (category_type,))
+        db.execute("DELETE FROM templates WHERE type = ?", (category_type,))
+        db.execute("DELETE FROM categories WHERE type = ?", (category_type,))
+        db.executemany("INSERT INTO categories (type, name, position) VALUES (?, ?, ?)",
+                       [(category_type, name, position) for position, name in enumerate(categories)])
+        for category, templates in categories.items():
+            for position, template in enumerate(templates):
+                self._insert_template(category_type, category, position, template)
+    
+    def _insert_template(self, category_type: str, category: str, position: int,
+                         template: dict) -> None:
+        """Добавить строку шаблона и его запись FTS (внутри транзакции)"""
+        cursor = self._db.execute(
+            "INSERT INTO templates (id, type, category, position, title, text, tags, pinned, stats)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (template['id'], category_type, category, position, *self._row_fields(template)))
+        if self._fts_tokenizer:
+            self._db.execute("INSERT INTO templates_fts (rowid, title, text, tags) VALUES (?, ?, ?, ?)",
+                             (cursor.lastrowid, *self._fts_fields(template)))
+    
+    @staticmethod
+    def _row_fields(template: dict) -> Tuple:
+        """Поля строки templates: title, text, tags, pinned, stats"""
+        return (template.get('title', ''), template.get('text', ''),
+                json.dumps(template.get('tags', []), ensure_ascii=False),
+                int(bool(template.get('pinned', False))),
+                json.dumps(template.get('stats', {}), ensure_ascii=False))
+    
+    @staticmethod
+    def _fts_fields(template: dict) -> Tuple[str, str, str]:
+        """Нормализованные поля для FTS (как их видит поиск просмотром)"""
+        tags = template.get('tags')
+        return (normalize_field(template.get('title', '')),
+                normalize_field(template.get('text', '')),
+                " ".join(normalize_field(tag) for tag in tags) if isinstance(tags, list) else "")
+    
+    def _commit(self, op: str, category_type: str, category: str, **fields) -> bool:
+        """
+        Записать изменение в базу одной транзакцией
+        
+        Принимает те же записи, что журнал JSON-хранилища (put, delete,
+        add_category, rename_category, delete_category).
+        """
+        category_type = category_type or self.current_category_type
+        try:
+            with self._db_lock, self._db:
+                self._write_record(op, category_type, category, fields)
+                self._bump_revision()
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка при сохранении шаблонов в базу: {e}")
+            return False
+    
+    def _write_record(self, op: str, category_type: str, category: str, fields: dict) -> None:
+        """Выполнить запись изменения в базе (внутри транзакции)"""
+        db = self._db
+        if op == 'put':
+            template = fields['template']
+            row = db.execute("SELECT num, title, text, tags FROM templates WHERE id = ?",
+                             (template['id'],)).fetchone()
+            if row is None:
+                position = db.execute(
+                    "SELECT COALESCE(MAX(position) + 1, 0) FROM templates"
+                    " WHERE type = ? AND category = ?", (category_type, category)).fetchone()[0]
+                self._insert_template(category_type, category, position, template)
+                return
+            
+            values = self._row_fields(template)
+            db.execute("UPDATE templates SET title = ?, text = ?, tags = ?, pinned = ?, stats = ?"
+                       " WHERE num = ?", (*values, row[0]))
+            # Закрепление и счётчик не меняют текст: запись FTS остаётся
+            if self._fts_tokenizer and tuple(row[1:]) != values[:3]:
+                db.execute("DELETE FROM templates_fts WHERE rowid = ?", (row[0],))
+                db.execute("INSERT INTO templates_fts (rowid, title, text, tags) VALUES (?, ?, ?, ?)",
+                           (row[0], *self._fts_fields(template)))
+        elif op == 'delete':
+            if self._fts_tokenizer:
+                db.execute("DELETE FROM templates_fts WHERE rowid IN"
+                           " (SELECT num FROM templates WHERE id = ?)", (fields['id'],))
+            db.execute("DELETE FROM templates WHERE id = ?", (fields['id'],))
+        elif op == 'add_category':
+            db.execute("INSERT OR IGNORE INTO categories (type, name, position)"
+                       " SELECT ?, ?, COALESCE(MAX(position) + 1, 0) FROM categories WHERE type = ?",
+                       (category_type, category, category_type))
+        elif op == 'rename_category':
+            # Переименованная категория переходит в конец (как в словаре в памяти)
+            db.execute("UPDATE categories SET name = ?,"
+                       " position = (SELECT MAX(position) + 1 FROM categories WHERE type = ?)"
+                       " WHERE type = ? AND name = ?",
+                       (fields['new'], category_type, category_type, category))
+            db.execute("UPDATE templates SET category = ? WHERE type = ? AND category = ?",
+                       (fields['new'], category_type, category))
+        elif op == 'delete_category':
+            if self._fts_tokenizer:
+                db.execute("DELETE FROM templates_fts WHERE rowid IN"
+                           " (SELECT num FROM templates WHERE type = ? AND category = ?)",
+                           (category_type, category))
+            db.execute("DELETE FROM templates WHERE type = ? AND category = ?", (category_type, category))
+            db.execute("DELETE FROM categories WHERE type = ? AND name = ?", (category_type, category))
+        else:
+            raise ValueError(f"неизвестная операция {op!r}")
+    
+    # ==================== ЖУРНАЛ И СНИМОК ====================
+    
+    def _replay_journal(self) -> None:
+        """Журнала нет: каждое изменение сразу записано в базу"""
+    
+    def _schedule_checkpoint(self) -> None:
+        """WAL переносится SQLite автоматически и при закрытии (файл журнала JSON не используется)"""
+    
+    def checkpoint(self) -> bool:
+        """Перенести WAL SQLite в основной файл базы (без ожидания читателей)"""
+        try:
+            with self._db_lock:
+                if self._db is not None:
+                    self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            return True
+        except sqlite3.Error as e:
+            print(f"Ошибка контрольной точки базы шаблонов: {e}")
+            return False
+    
+    def _snapshot_source_key(self) -> Optional[List]:
+        """
+        Ревизия базы для ключа снимка индекса
+        
+        Returns:
+            Optional[List]: [["sqlite", ревизия]] или None, если ожидается запись
+        """
+        if self.writer.pending:
+            return None
+        return [["sqlite", self._revision]]
+    
+    def close(self) -> None:
+        """Завершение работы: снимок индекса и закрытие базы"""
+        super().close()
+        self._close_database()
+    
+    # ==================== ПОИСК ====================
+    
+    def search_templates(self, query: str, category: str = None, category_type: str = None,
+                         tags: tuple = (), should_stop=None) -> Optional[List[Tuple[str, str, Dict]]]:
+        """
+        Поиск через FTS5: шаблоны, где каждое слово запроса есть в названии
+        или тексте (как поиск просмотром), лучшие по BM25 первыми
+        
+        Returns:
+            Список (тип, категория, шаблон) или None, если запрос нельзя
+            выполнить через FTS (нет FTS5 или в запросе только короткие слова)
+        """
+        if not self._fts_tokenizer or self._reader is None:
+            return None
+        
+        words = normalize_field(parse_query_syntax(query).text).split()
+        if self._fts_tokenizer == 'trigram':
+            indexed = [word for word in words if len(word) >= TRIGRAM_MIN_LENGTH]
+            match = " AND ".join('{title text} : "%s"' % word.replace('"', '""') for word in indexed)
+        else:
+            indexed = words
+            match = " AND ".join('{title text} : "%s" *' % word.replace('"', '""') for word in indexed)
+        if not indexed:
+            return None
+        
+        sql = ("SELECT t.id FROM templates_fts JOIN templates t ON t.num = templates_fts.rowid"
+               " WHERE templates_fts MATCH ?")
+        params: list = [match]
+        if category_type is not None:
+            sql += " AND t.type = ?"
+            params.append(category_type)
+        if category is not None:
+            sql += " AND t.category = ?"
+            params.append(category)
+        sql += " ORDER BY bm25(templates_fts, ?, 1.0, 0.0)"
+        params.append(SEARCH.TITLE_BOOST)
+        
+        with self._reader_lock:
+            if self._reader is None:
+                return None
+            if should_stop is not None:
+                self._reader.set_progress_handler(lambda: 1 if should_stop() else 0, PROGRESS_STEPS)
+            try:
+                template_ids = [template_id for (template_id,) in self._reader.execute(sql, params)]
+            except sqlite3.OperationalError as e:
+                if should_stop is not None and should_stop():
+                    return []  # Запрос устарел - SQLite прервал выполнение
+                print(f"Ошибка поиска в базе шаблонов: {e}")
+                return None
+            finally:
+                self._reader.set_progress_handler(None, 0)
+        
+        # Короткие слова (trigram их не ищет) и теги проверяются по памяти
+        short_words = [word for word in words if word not in indexed]
+        wanted_tags = {normalize_field(tag) for tag in tags}
+        found = []
+        for template_id in template_ids:
+            record = self._templates_by_id.get(template_id)
+            if record is None:
+                continue
+            if short_words or wanted_tags:
+                fields = self.normalized_text.get(record[2])
+                if not wanted_tags.issubset(fields.tags):
+                    continue
+                haystack = f"{fields.title} {fields.text}"
+                if not all(word in haystack for word in short_words):
+                    continue
+            found.append(record)
+        return found
@@ -0,0 +1,329 @@
+"""
+Стеммеры для русского и английского языков (алгоритмы Snowball)
+
+Отсекают окончания и суффиксы, чтобы "шаблон", "шаблона" и "шаблонами"
+(или "template", "templates") попадали в индекс одним термином.
+"""
+from typing import Tuple
+
+
+class RussianStemmer:
+    """Русский стеммер Snowball"""
+    
+    VOWELS = "аеиоуыэюя"
+    
+    # Окончания отсортированы от длинных к коротким: берётся самое длинное
+    PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")  # после а/я
+    PERFECTIVE_GERUND_2 = ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв")
+    
+    ADJECTIVE = (
+        "ими", "ыми", "его", "ого", "ему", "ому",
+        "ее", "ие", "ые", "ое", "ей", "ий", "ый", "ой", "ем", "им", "ым",
+        "ом", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+    )
+    PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")  # после а/я
+    PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+    
+    REFLEXIVE = ("ся", "сь")
+    
+    VERB_1 = (  # после а/я
+        "ете", "йте", "ешь", "нно",
+        "ла", "на", "ли", "ем", "ло", "но", "ет", "ют", "ны", "ть", "й", "л", "н",
+    )
+    VERB_2 = (
+        "ейте", "уйте",
+        "ила", "ыла", "ена", "ите", "или", "ыли", "ило", "ыло", "ено", "ует",
+        "уют", "ены", "ить", "ыть", "ишь",
+        "ей", "уй", "ил", "ыл", "им", "ым", "ен", "ят", "ит", "ыт", "ую", "ю",
+    )
+    
+    NOUN = (
+        "иями", "ями", "ами", "ией", "иям", "ием", "иях",
+        "ев", "ов", "ие", "ье", "еи", "ии", "ей", "ой", "ий", "ям", "ем", "ам",
+        "ом", "ах", "ях", "ию", "ью", "ия", "ья",
+        "а", "е", "и", "й", "о", "у", "ы", "ь", "ю", "я",
+    )
+    
+    SUPERLATIVE = ("ейше", "ейш")
+    DERIVATIONAL = ("ость", "ост")
+    
+    def stem(self, word: str) -> str:
+        """Получить основу слова (ожидается нижний регистр, ё уже заменена на е)"""
+        rv, r2 = self._regions(word)
+        if rv >= len(word):
+            return word
+        
+        # Шаг 1: деепричастие, иначе возвратная частица + прилагательное/глагол/сущ.
+        stem = self._remove_preceded(word, rv, self.PERFECTIVE_GERUND_1, "ая")
+        if stem is None:
+            stem = self._remove(word, rv, self.PERFECTIVE_GERUND_2)
+        if stem is None:
+            word = self._remove(word, rv, self.REFLEXIVE) or word
+            stem = self._remove_adjectival(word, rv)
+            if stem is None:
+                stem = self._remove_preceded(word, rv, self.VERB_1, "ая")
+            if stem is None:
+                stem = self._remove(word, rv, self.VERB_2)
+            if stem is None:
+                stem = self._remove(word, rv, self.NOUN)
+        word = stem if stem is not None else word
+        
+        # Шаг 2: конечная "и"
+        if word.endswith("и") and len(word) - 1 >= rv:
+            word = word[:-1]
+        
+        # Шаг 3: словообразовательный суффикс целиком в R2
+        word = self._remove(word, r2, self.DERIVATIONAL) or word
+        
+        # Шаг 4: "нн" -> "н", превосходная степень, мягкий знак
+        if word.endswith("нн") and len(word) - 2 >= rv:
+            return word[:-1]
+        superlative = self._remove(word, rv, self.SUPERLATIVE)
+        if superlative is not None:
+            word = superlative
+            if word.endswith("нн") and len(word) - 2 >= rv:
+                word = word[:-1]
+            return word
+        if word.endswith("ь") and len(word) - 1 >= rv:
+            word = word[:-1]
+        return word
+    
+    def _regions(self, word: str) -> Tuple[int, int]:
+        """Начала областей RV и R2"""
+        vowels = self.VOWELS
+        rv = len(word)
+        for i, char in enumerate(word):
+            if char in vowels:
+                rv = i + 1
+                break
+        
+        r1 = self._next_region(word, 0)
+        r2 = self._next_region(word, r1)
+        return rv, r2
+    
+    def _next_region(self, word: str, start: int) -> int:
+        """Позиция после первой согласной, следующей за гласной (начиная с start)"""
+        vowels = self.VOWELS
+        for i in range(start + 1, len(word)):
+            if word[i] not in vowels and word[i - 1] in vowels:
+                return i + 1
+        return len(word)
+    
+    @staticmethod
+    def _remove(word: str, region: int, endings: Tuple[str, ...]):
+        """Отрезать самое длинное окончание, целиком лежащее в области"""
+        for ending in endings:
+            if word.endswith(ending) and len(word) - len(ending) >= region:
+                return word[:-len(ending)]
+        return None
+    
+    @staticmethod
+    def _remove_preceded(word: str, region: int, endings: Tuple[str, ...], letters: str):
+        """Отрезать окончание, перед которым (внутри области) стоит одна из letters"""
+        for ending in endings:
+            if not word.endswith(ending):
+                continue
+            position = len(word) - len(ending)
+            if position - 1 >= region and word[position - 1] in letters:
+                return word[:position]
+        return None
+    
+    def _remove_adjectival(self, word: str, rv: int):
+        """Отрезать прилагательное окончание вместе с суффиксом причастия"""
+        stem = self._remove(word, rv, self.ADJECTIVE)
+        if stem is None:
+            return None
+        participle = self._remove_preceded(stem, rv, self.PARTICIPLE_1, "ая")
+        if participle is None:
+            participle = self._remove(stem, rv, self.PARTICIPLE_2)
+        return participle if participle is not None else stem
+
+
+class EnglishStemmer:
+    """Английский стеммер Snowball (Porter2)"""
+    
+    VOWELS = "aeiouy"
+    DOUBLES = ("bb", "dd", "ff", "gg", "mm", "nn", "pp", "rr", "tt")
+    LI_ENDINGS = "cdeghkmnrt"
+    
+    EXCEPTIONS = {
+        "skis": "ski", "skies": "sky", "dying": "die", "lying": "lie",
+        "tying": "tie", "idly": "idl", "gently": "gentl", "ugly": "ugli",
+        "early": "earli", "only": "onli", "singly": "singl",
+        "sky": "sky", "news": "news", "howe": "howe", "atlas": "atlas",
+        "cosmos": "cosmos", "bias": "bias", "andes": "andes",
+    }
+    EXCEPTIONS_AFTER_1A = {
+        "inning", "outing", "canning", "herring", "earring",
+        "proceed", "exceed", "succeed",
+    }
+    
+    STEP_2 = (
+        ("ization", "ize"), ("ational", "ate"), ("fulness", "ful"),
+        ("ousness", "ous"), ("iveness", "ive"), ("tional", "tion"),
+        ("biliti", "ble"), ("lessli", "less"), ("entli", "ent"), ("ation", "ate"),
+        ("alism", "al"), ("aliti", "al"), ("ousli", "ous"), ("iviti", "ive"),
+        ("fulli", "ful"), ("enci", "ence"), ("anci", "ance"), ("abli", "able"),
+        ("izer", "ize"), ("ator", "ate"), ("alli", "al"), ("bli", "ble"),
+        ("ogi", "og"), ("li", ""),
+    )
+    STEP_3 = (
+        ("ational", "ate"), ("tional", "tion"), ("alize", "al"), ("icate", "ic"),
+        ("iciti", "ic"), ("ative", ""), ("ical", "ic"), ("ness", ""), ("ful", ""),
+    )
+    STEP_4 = (
+        "ement", "ance", "ence", "able", "ible", "ment", "ant", "ent", "ism",
+        "ate", "iti", "ous", "ive", "ize", "ion", "al", "er", "ic",
+    )
+    
+    def stem(self, word: str) -> str:
+        """Получить основу слова (ожидается нижний регистр)"""
+        if len(word) <= 2:
+            return word
+        if word in self.EXCEPTIONS:
+            return self.EXCEPTIONS[word]
+        
+        word = word.lstrip("'")
+        if word.startswith("y"):
+            word = "Y" + word[1:]
+        word = "".join(
+            "Y" if char == "y" and i > 0 and word[i - 1] in self.VOWELS else char
+            for i, char in enumerate(word)
+        )
+        r1, r2 = self._regions(word)
+        
+        # Шаг 0: притяжательные формы
+        for suffix in ("'s'", "'s", "'"):
+            if word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        
+        word = self._step_1a(word)
+        if word in self.EXCEPTIONS_AFTER_1A:
+            return word
+        word = self._step_1b(word, r1)
+        
+        # Шаг 1c: y -> i после согласной (не первой буквы)
+        if len(word) > 2 and word[-1] in "yY" and word[-2] not in self.VOWELS:
+            word = word[:-1] + "i"
+        
+        word = self._step_2(word, r1)
+        word = self._step_3(word, r1, r2)
+        word = self._step_4(word, r2)
+        word = self._step_5(word, r1, r2)
+        return word.replace("Y", "y")
+    
+    def _regions(self, word: str) -> Tuple[int, int]:
+        """Начала областей R1 и R2"""
+        for prefix in ("gener", "commun", "arsen"):
+            if word.startswith(prefix):
+                r1 = len(prefix)
+                break
+        else:
+            r1 = self._next_region(word, 0)
+        return r1, self._next_region(word, r1)
+    
+    def _next_region(self, word: str, start: int) -> int:
+        """Позиция после первой согласной, следующей за гласной"""
+        vowels = self.VOWELS
+        for i in range(start + 1, len(word)):
+            if word[i] not in vowels and word[i - 1] in vowels:
+                return i + 1
+        return len(word)
+    
+    def _ends_with_short_syllable(self, word: str) -> bool:
+        """Оканчивается ли слово коротким слогом (гласная между согласными)"""
+        vowels = self.VOWELS
+        if len(word) == 2:
+            return word[0] in vowels and word[1] not in vowels
+        return (len(word) >= 3 and word[-3] not in vowels and word[-2] in vowels
+                and word[-1] not in vowels and word[-1] not in "wxY")
+    
+    def _is_short(self, word: str) -> bool:
+        """Короткое слово: пустая область R1 и короткий последний слог"""
+        return self._next_region(word, 0) >= len(word) and self._ends_with_short_syllable(word)
+    
+    def _has_vowel(self, text: str) -> bool:
+        """Есть ли в тексте гласная"""
+        return any(char in self.VOWELS for char in text)
+    
+    def _step_1a(self, word: str) -> str:
+        """Шаг 1a: множественное число (-s, -es, -ies)"""
+        if word.endswith("sses"):
+            return word[:-2]
+        if word.endswith("ied") or word.endswith("ies"):
+            return word[:-2] if len(word) > 4 else word[:-1]
+        if word.endswith("us") or word.endswith("ss"):
+            return word
+        if word.endswith("s") and self._has_vowel(word[:-2]):
+            return word[:-1]
+        return word
+    
+    def _step_1b(self, word: str, r1: int) -> str:
+        """Шаг 1b: -ed, -ing и их наречные формы"""
+        for suffix in ("eedly", "eed"):
+            if word.endswith(suffix):
+                if len(word) - len(suffix) >= r1:
+                    return word[:-len(suffix)] + "ee"
+                return word
+        
+        for suffix in ("ingly", "edly", "ing", "ed"):
+            if word.endswith(suffix):
+                stem = word[:-len(suffix)]
+                if not self._has_vowel(stem):
+                    return word
+                if stem.endswith(("at", "bl", "iz")):
+                    return stem + "e"
+                if stem.endswith(self.DOUBLES):
+                    return stem[:-1]
+                if self._is_short(stem):
+                    return stem + "e"
+                return stem
+        return word
+    
+    def _step_2(self, word: str, r1: int) -> str:
+        """Шаг 2: двойные суффиксы в R1 (-ational, -ization, ...)"""
+        for suffix, replacement in self.STEP_2:
+            if word.endswith(suffix):
+                if len(word) - len(suffix) < r1:
+                    return word
+                stem = word[:-len(suffix)]
+                if suffix == "ogi" and not stem.endswith("l"):
+                    return word
+                if suffix == "li" and not (stem and stem[-1] in self.LI_ENDINGS):
+                    return word
+                return stem + replacement
+        return word
+    
+    def _step_3(self, word: str, r1: int, r2: int) -> str:
+        """Шаг 3: суффиксы -ful, -ness, -ical и подобные в R1"""
+        for suffix, replacement in self.STEP_3:
+            if word.endswith(suffix):
+                position = len(word) - len(suffix)
+                if position < r1 or (suffix == "ative" and position < r2):
+                    return word
+                return word[:position] + replacement
+        return word
+    
+    def _step_4(self, word: str, r2: int) -> str:
+        """Шаг 4: суффиксы в R2 (-ment, -ance, -ion, ...)"""
+        for suffix in self.STEP_4:
+            if word.endswith(suffix):
+                position = len(word) - len(suffix)
+                if position < r2:
+                    return word
+                if suffix == "ion" and not (position and word[position - 1] in "st"):
+                    return word
+                return word[:position]
+        return word
+    
+    def _step_5(self, word: str, r1: int, r2: int) -> str:
+        """Шаг 5: конечные -e и -ll"""
+        if word.endswith("e"):
+            position = len(word) - 1
+            if position >= r2 or (position >= r1
+                                  and not self._ends_with_short_syllable(word[:-1])):
+                return word[:-1]
+        elif word.endswith("ll") and len(word) - 1 >= r2:
+            return word[:-1]
+        return word
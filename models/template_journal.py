@@ -0,0 +1,175 @@
+"""
+Журнал изменений шаблонов (write-ahead log)
+
+Вместо перезаписи всего файла типа при каждом изменении запись о нём
+дописывается в конец журнала - одна компактная строка JSON:
+
+    {"op": "put", "type": ..., "category": ..., "template": {...}}
+    {"op": "delete", "type": ..., "category": ..., "id": ...}
+    {"op": "add_category" | "delete_category", "type": ..., "category": ...}
+    {"op": "rename_category", "type": ..., "category": ..., "new": ...}
+
+Записи идемпотентны (шаблон пишется целиком и ищется по ID), поэтому
+повторное применение уже сохранённых в файл записей ничего не портит.
+
+Контрольная точка переносит журнал в файлы шаблонов: запоминается
+размер журнала, файлы записываются, и из журнала удаляется только
+начало до запомненного размера - записи, дописанные во время записи
+файлов, остаются. Недописанная последняя строка (сбой во время записи)
+при открытии отбрасывается.
+"""
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+
+class TemplateJournal:
+    """Журнал изменений в одном файле (потокобезопасный)"""
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу журнала
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self._file = None
+        self._size = 0
+        self._first_record_time: Optional[float] = None
+    
+    @property
+    def size(self) -> int:
+        """Размер журнала в байтах (0 - все изменения уже в файлах)"""
+        return self._size
+    
+    @property
+    def age(self) -> float:
+        """Сколько секунд назад дописана самая старая запись журнала"""
+        if self._first_record_time is None:
+            return 0.0
+        return time.monotonic() - self._first_record_time
+    
+    def read(self) -> List[dict]:
+        """
+        Прочитать записи журнала (при открытии приложения).
+        
+        Недописанный или повреждённый хвост отбрасывается и обрезается
+        в файле, чтобы следующие записи не склеились с ним.
+        
+        Returns:
+            List[dict]: Записи в порядке добавления
+        """
+        with self.lock:
+            self._close_file()
+            records = []
+            valid_size = 0
+            try:
+                with open(self.path, 'rb') as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                raw = b""
+            except OSError as e:
+                print(f"Ошибка при чтении журнала шаблонов: {e}")
+                raw = b""
+            
+            for line in raw.splitlines(keepends=True):
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not isinstance(record, dict):
+                    break
+                records.append(record)
+                valid_size += len(line)
+            
+            if valid_size < len(raw):
+                print(f"Журнал шаблонов обрезан: отброшено {len(raw) - valid_size} байт")
+                try:
+                    with open(self.path, 'r+b') as f:
+                        f.truncate(valid_size)
+                except OSError as e:
+                    print(f"Ошибка при обрезке журнала шаблонов: {e}")
+            
+            self._size = valid_size
+            self._first_record_time = time.monotonic() if records else None
+            return records
+    
+    def append(self, record: dict) -> bool:
+        """
+        Дописать запись в конец журнала.
+        
+        Args:
+            record: Запись (JSON-совместимый словарь)
+        
+        Returns:
+            bool: True если запись дописана
+        """
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+        data = line.encode('utf-8')
+        with self.lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'ab')
+                self._file.write(data)
+                self._file.flush()
+            except OSError as e:
+                print(f"Ошибка при записи журнала шаблонов: {e}")
+                self._close_file()
+                return False
+            if self._size == 0:
+                self._first_record_time = time.monotonic()
+            self._size += len(data)
+            return True
+    
+    def discard_head(self, size: int) -> bool:
+        """
+        Удалить начало журнала (уже перенесённое в файлы шаблонов).
+        
+        Args:
+            size: Размер журнала на момент начала контрольной точки
+        
+        Returns:
+            bool: True если журнал обрезан
+        """
+        with self.lock:
+            self._close_file()
+            try:
+                if size >= self._size:
+                    with open(self.path, 'wb'):
+                        pass
+                else:
+                    # Записи, дописанные во время контрольной точки, остаются
+                    with open(self.path, 'rb') as f:
+                        f.seek(size)
+                        tail = f.read()
+                    temp_path = self.path + ".tmp"
+                    with open(temp_path, 'wb') as f:
+                        f.write(tail)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"Ошибка при обрезке журнала шаблонов: {e}")
+                return False
+            
+            self._size = max(0, self._size - size)
+            self._first_record_time = time.monotonic() if self._size else None
+            return True
+    
+    def close(self) -> None:
+        """Закрыть файл журнала"""
+        with self.lock:
+            self._close_file()
+    
+    def _close_file(self) -> None:
+        """Закрыть открытый для дописывания файл (под lock)"""
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
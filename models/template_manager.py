@@ -1,10 +1,27 @@
 """
 Менеджер шаблонов для работы с категориями и текстовыми шаблонами
 """
+import hashlib
 import json
 import os
-from typing import List, Dict, Optional
-from config.settings import CATEGORIES, PATHS
+import threading
+import uuid
+from typing import List, Dict, Optional, Set, Tuple
+from config.settings import CATEGORIES, PATHS, SEARCH, STORAGE
+from models.normalized_text import get_normalized_cache
+from models.search_indexer import get_search_indexer
+from models.template_journal import TemplateJournal
+from models.template_serializer import get_serializer
+from models.usage_counters import UsageCounters
+from utils.background_writer import BackgroundWriter
+
+
+# Ограничения тегов шаблона: количество и длина одного тега
+MAX_TAGS = 20
+MAX_TAG_LENGTH = 50
+
+# Ключ потока записи: перенести журнал в файлы (контрольная точка)
+_JOURNAL_CHECKPOINT = "journal"
 
 
 class TemplateManager:
@@ -14,7 +31,24 @@ class TemplateManager:
     Attributes:
         current_category_type (str): Текущий выбранный тип категорий
         files (dict): Словарь путей к файлам для каждого типа категорий
-        categories (dict): Словарь с категориями и их шаблонами
+        categories (dict): Словарь с категориями и их шаблонами (текущий тип)
+    
+    Каждый шаблон имеет постоянный ID (поле 'id' в JSON), по которому
+    операции над отдельным шаблоном выполняются за O(1).
+    
+    В памяти держатся шаблоны всех типов: глобальный поиск идёт по общему
+    индексу, а операции по ID работают с шаблоном любого типа.
+    
+    Шаблон может иметь теги (поле 'tags' - список строк): по ним ищут
+    и фильтруют результаты.
+    
+    Изменения не перезаписывают файл типа: каждое дописывается одной
+    записью в журнал (TemplateJournal), а файлы обновляются в фоне
+    контрольной точкой. При запуске хвост журнала применяется поверх
+    загруженных файлов.
+    
+    Счётчики использования хранятся не в шаблонах, а в отдельном файле
+    записей фиксированной ширины (UsageCounters).
     """
     
     def __init__(self):
@@ -31,17 +65,43 @@ class TemplateManager:
             CATEGORIES.COLLEAGUES: PATHS.TEMPLATES_COLLEAGUES
         }
         
-        # Категории и шаблоны
+        # Категории и шаблоны всех типов и текущего типа
+        self._type_categories: Dict[str, Dict[str, List[Dict]]] = {}
         self.categories: Dict[str, List[Dict]] = {}
         
-        # Оптимизация: отложенное сохранение
-        self._save_pending = False
-        self._save_timer_id = None
+        # Карта ID шаблона -> (тип, категория, шаблон)
+        self._templates_by_id: Dict[str, Tuple[str, str, Dict]] = {}
+        
+        # Состояние файлов шаблонов: тип -> (SHA-256 содержимого, mtime).
+        # Ключ снимка поискового индекса; None - файл не совпадает с памятью
+        self._file_states: Dict[str, Optional[Tuple[str, int]]] = {}
+        self._snapshot_source = None
+        
+        # Формат файлов шаблонов (читается любой: все форматы - JSON)
+        self.serializer = get_serializer(STORAGE.FORMAT)
+        
+        # Все записи файлов идут через один поток записи: серия изменений
+        # записывается одним разом, при закрытии ожидающее дописывается
+        self.writer = BackgroundWriter(self._write_pending, name="TemplateWriter")
+        
+        # Счётчики использования (отдельно от шаблонов, запись на месте)
+        self.usage = UsageCounters(PATHS.USAGE_COUNTERS)
+        
+        # Журнал изменений и типы, изменения которых есть только в журнале
+        self.journal = TemplateJournal(PATHS.TEMPLATES_JOURNAL)
+        self._journal_types: Set[str] = set()
+        self._checkpoint_lock = threading.Lock()
         
         # Кэш категорий (для быстрого доступа)
         self._category_cache: Dict[str, List[Dict]] = {}
         self._cache_dirty = True
         
+        # Поисковый индекс, обновляемый инкрементально при каждом изменении
+        self.search_indexer = get_search_indexer()
+        
+        # Нормализованные поля шаблонов (общие для всех путей поиска)
+        self.normalized_text = get_normalized_cache()
+        
         # Загружаем шаблоны
         self.load_templates()
     
@@ -55,27 +115,78 @@ class TemplateManager:
         return self.files[self.current_category_type]
     
     def load_templates(self) -> None:
-        """Загрузка шаблонов из файла текущего типа"""
-        filename = self.get_current_filename()
+        """Загрузка шаблонов всех типов (глобальный поиск идёт по обоим файлам)"""
+        for category_type in self.files:
+            self._type_categories[category_type] = self._load_type_templates(category_type)
+        self.categories = self._type_categories[self.current_category_type]
+        
+        # Старые файлы без ID: выдаём ID и сохраняем их отложенно
+        for category_type in self._ensure_template_ids():
+            self.schedule_save(category_type=category_type)
+        
+        # Новый набор шаблонов - карта ID строится заново, индекс берётся
+        # из снимка (если файлы не менялись) или строится заново в фоне
+        # (пока он строится, поиск просматривает шаблоны напрямую)
+        self._rebuild_id_map()
+        self._invalidate_category_cache()
+        self.normalized_text.clear()
+        self._snapshot_source = None
+        source_key = self._snapshot_source_key()
+        loaded = bool(source_key) and self.search_indexer.load_snapshot(
+            self, PATHS.INDEX_SNAPSHOT, source_key)
+        if loaded:
+            self._snapshot_source = source_key
+        
+        # Изменения, ещё не перенесённые из журнала в файлы, применяются
+        # поверх загруженного индекса так же, как обычные изменения
+        self._replay_journal()
+        self._move_usage_to_counters()
+        if not loaded:
+            self.search_indexer.build_index_in_background(self)
+    
+    def _move_usage_to_counters(self) -> None:
+        """
+        Перенести счётчики из stats шаблонов (прежний формат) в файл счётчиков
+        
+        Поле usage_count убирается из шаблона, а файлы затронутых типов
+        сохраняются отложенно: иначе старые значения остались бы в файлах
+        и переносились заново при каждом запуске.
+        """
+        changed = set()
+        for template_id, (category_type, _, template) in self._templates_by_id.items():
+            stats = template.get('stats')
+            if not isinstance(stats, dict) or 'usage_count' not in stats:
+                continue
+            usage_count = stats.pop('usage_count')
+            changed.add(category_type)
+            if template_id not in self.usage and isinstance(usage_count, int) and usage_count > 0:
+                self.usage.set(template_id, usage_count)
+        
+        for category_type in changed:
+            self.schedule_save(category_type=category_type)
+    
+    def _load_type_templates(self, category_type: str) -> Dict[str, List[Dict]]:
+        """Загрузить шаблоны одного типа из его файла"""
+        filename = self.files[category_type]
         
         if os.path.exists(filename):
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Валидация структуры
-                    if isinstance(data, dict):
-                        self.categories = self._validate_templates(data)
-                    else:
-                        raise ValueError("Неверный формат JSON")
+                with open(filename, 'rb') as f:
+                    raw = f.read()
+                data = self.serializer.loads(raw)
+                # Валидация структуры
+                if isinstance(data, dict):
+                    self._remember_file_state(category_type, raw)
+                    return self._validate_templates(data, category_type)
+                else:
+                    raise ValueError("Неверный формат JSON")
             except (json.JSONDecodeError, IOError, ValueError) as e:
                 print(f"Ошибка при загрузке шаблонов из {filename}: {e}")
-                self._create_default_templates()
-        else:
-            self._create_default_templates()
+        
+        return self._create_default_templates(category_type)
     
-    def _validate_templates(self, data: dict) -> dict:
+    def _validate_templates(self, data: dict, category_type: str = None) -> dict:
         """Валидация загруженных шаблонов"""
-        MAX_TEXT_LENGTH = 50000  # Максимум 50KB текста на шаблон
         validated = {}
         
         for category, templates in data.items():
@@ -84,32 +195,67 @@ class TemplateManager:
             
             valid_templates = []
             for template in templates:
-                if not isinstance(template, dict):
-                    continue
-                
-                title = template.get('title', '').strip()
-                text = template.get('text', '').strip()
-                
-                # Пропускаем пустые или очень большие шаблоны
-                if not title or not text or len(text) > MAX_TEXT_LENGTH:
-                    continue
-                
-                # Включаем валидный шаблон
-                valid_templates.append({
-                    'title': title[:200],  # Ограничиваем заголовок
-                    'text': text,
-                    'pinned': template.get('pinned', False),
-                    'stats': template.get('stats', {})
-                })
+                valid_template = self._validate_template(template)
+                if valid_template is not None:
+                    valid_templates.append(valid_template)
             
             if valid_templates:
                 validated[category] = valid_templates
         
-        return validated if validated else self._get_default_templates()
+        return validated if validated else self._get_default_templates(category_type)
     
-    def _get_default_templates(self) -> dict:
-        """Получить стандартные шаблоны по умолчанию"""
-        if self.current_category_type == CATEGORIES.CLIENTS:
+    def _validate_template(self, template) -> Optional[Dict]:
+        """Валидация одного шаблона (None - шаблон пропускается)"""
+        MAX_TEXT_LENGTH = 50000  # Максимум 50KB текста на шаблон
+        if not isinstance(template, dict):
+            return None
+        
+        title = template.get('title', '').strip()
+        text = template.get('text', '').strip()
+        
+        # Пропускаем пустые или очень большие шаблоны
+        if not title or not text or len(text) > MAX_TEXT_LENGTH:
+            return None
+        
+        # Включаем валидный шаблон
+        valid_template = {
+            'id': template.get('id'),
+            'title': title[:200],  # Ограничиваем заголовок
+            'text': text,
+            'pinned': template.get('pinned', False),
+            'stats': template.get('stats', {})
+        }
+        tags = self.clean_tags(template.get('tags'))
+        if tags:
+            valid_template['tags'] = tags
+        return valid_template
+    
+    @staticmethod
+    def clean_tags(tags) -> List[str]:
+        """
+        Привести теги к виду для хранения
+        
+        Args:
+            tags: Список тегов или строка через запятую
+        
+        Returns:
+            List[str]: Теги без пробелов по краям и повторов (без учёта регистра)
+        """
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        if not isinstance(tags, list):
+            return []
+        
+        cleaned = {}
+        for tag in tags:
+            tag = ' '.join(str(tag).split())[:MAX_TAG_LENGTH]
+            if tag and tag.casefold() not in cleaned:
+                cleaned[tag.casefold()] = tag
+        return list(cleaned.values())[:MAX_TAGS]
+    
+    def _get_default_templates(self, category_type: str = None) -> dict:
+        """Получить стандартные шаблоны по умолчанию (для текущего или заданного типа)"""
+        if (category_type or self.current_category_type) == CATEGORIES.CLIENTS:
             return {
                 "Приветствие": [
                     {"title": "Стандартное приветствие", "text": "Здравствуйте! Чем могу помочь?"}
@@ -125,68 +271,389 @@ class TemplateManager:
                 ]
             }
     
-    def _create_default_templates(self) -> None:
+    def _create_default_templates(self, category_type: str) -> Dict[str, List[Dict]]:
         """Создание демо-шаблонов при первом запуске"""
-        self.categories = self._get_default_templates()
-        self.save_templates()
+        categories = self._get_default_templates(category_type)
+        for templates in categories.values():
+            for template in templates:
+                template['id'] = self._new_template_id()
+        self._type_categories[category_type] = categories
+        self.save_templates(category_type)
+        return categories
+    
+    @staticmethod
+    def _new_template_id() -> str:
+        """Сгенерировать новый постоянный ID шаблона"""
+        return uuid.uuid4().hex
+    
+    def _ensure_template_ids(self) -> Set[str]:
+        """
+        Выдать ID шаблонам без ID (или с повторяющимся ID) во всех типах
+        
+        Returns:
+            Set[str]: Типы категорий, в которых были выданы ID
+        """
+        seen = set()
+        changed = set()
+        for category_type, categories in self._type_categories.items():
+            for templates in categories.values():
+                for template in templates:
+                    template_id = template.get('id')
+                    if not isinstance(template_id, str) or not template_id or template_id in seen:
+                        template_id = self._new_template_id()
+                        template['id'] = template_id
+                        changed.add(category_type)
+                    seen.add(template_id)
+        return changed
+    
+    def _rebuild_id_map(self) -> None:
+        """Построить карту ID -> (тип, категория, шаблон) для шаблонов всех типов"""
+        self._templates_by_id = {
+            template['id']: (category_type, category, template)
+            for category_type, categories in self._type_categories.items()
+            for category, templates in categories.items()
+            for template in templates
+        }
+    
+    def _categories_of(self, category_type: str = None) -> Dict[str, List[Dict]]:
+        """Категории заданного типа (по умолчанию - текущего)"""
+        return self._type_categories.get(category_type or self.current_category_type, {})
+    
+    def get_template_by_id(self, template_id: str) -> Optional[Dict]:
+        """
+        Получить шаблон по его ID за O(1)
+        
+        Args:
+            template_id (str): ID шаблона
+        
+        Returns:
+            Optional[Dict]: Шаблон или None если не найден
+        """
+        record = self._templates_by_id.get(template_id)
+        return record[2] if record else None
     
-    def save_templates(self) -> bool:
+    def get_template_category(self, template_id: str) -> Optional[str]:
         """
-        Сохранение шаблонов в файл текущего типа
+        Получить категорию шаблона по его ID
+        
+        Args:
+            template_id (str): ID шаблона
+        
+        Returns:
+            Optional[str]: Название категории или None если шаблон не найден
+        """
+        record = self._templates_by_id.get(template_id)
+        return record[1] if record else None
+    
+    def get_template_location(self, template_id: str) -> Optional[Tuple[str, str]]:
+        """
+        Получить тип и категорию шаблона по его ID
+        
+        Args:
+            template_id (str): ID шаблона
+        
+        Returns:
+            Optional[Tuple[str, str]]: (тип категорий, категория) или None
+        """
+        record = self._templates_by_id.get(template_id)
+        return record[:2] if record else None
+    
+    def _find_template(self, category: str, template: dict,
+                       category_type: str = None) -> Optional[Dict]:
+        """
+        Найти хранимый шаблон категории по переданному словарю
+        
+        Шаблоны с ID ищутся за O(1). Словари без ID (старый формат вызова)
+        ищутся по названию и тексту.
+        """
+        category_type = category_type or self.current_category_type
+        template_id = template.get('id')
+        if template_id is not None:
+            record = self._templates_by_id.get(template_id)
+            if record and record[:2] == (category_type, category):
+                return record[2]
+            return None
+        
+        for tpl in self._categories_of(category_type).get(category, []):
+            if tpl.get('title') == template.get('title') and tpl.get('text') == template.get('text'):
+                return tpl
+        return None
+    
+    def save_templates(self, category_type: str = None) -> bool:
+        """
+        Сохранение шаблонов в файл текущего (или заданного) типа
+        
+        Args:
+            category_type (str): Тип категорий, по умолчанию текущий
         
         Returns:
             bool: True если сохранение успешно, False в случае ошибки
         """
+        category_type = category_type or self.current_category_type
         try:
-            filename = self.get_current_filename()
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.categories, f, ensure_ascii=False, indent=2)
+            filename = self.files[category_type]
+            raw = self.serializer.dumps(self._copy_categories(category_type))
+            # Атомарная замена: файл не останется недописанным при сбое
+            # (контрольная точка удаляет из журнала уже записанное)
+            self._write_file(filename, raw)
+            self._remember_file_state(category_type, raw)
             return True
         except IOError as e:
             print(f"Ошибка при сохранении шаблонов: {e}")
+            self._file_states[category_type] = None
             return False
     
-    def schedule_save(self, delay_ms: int = 500):
+    @staticmethod
+    def _write_file(filename: str, raw: bytes) -> None:
+        """Записать файл атомарно: временный файл, fsync и замена"""
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+    
+    def _copy_categories(self, category_type: str) -> Dict[str, List[Dict]]:
+        """
+        Копия категорий типа для записи в файл
+        
+        Файл пишется из потока записи: копия снимается
+        атомарными копированиями списков и словарей, чтобы одновременное
+        изменение шаблонов не прервало сериализацию. Изменение нескольких
+        полей заменяет шаблон новым словарём (_replace_template), а на месте
+        меняется только одно поле (закрепление), поэтому в копию попадает
+        целая версия шаблона.
+        """
+        copied = {}
+        for category, templates in list(self._categories_of(category_type).items()):
+            copied[category] = [self._copy_template(template) for template in list(templates)]
+        return copied
+    
+    @staticmethod
+    def _copy_template(template: dict) -> Dict:
+        """Копия шаблона (вложенные stats и tags тоже копируются)"""
+        copied = dict(template)
+        for key, value in copied.items():
+            if isinstance(value, (dict, list)):
+                copied[key] = value.copy()
+        return copied
+    
+    def _remember_file_state(self, category_type: str, raw: bytes) -> None:
+        """Запомнить хэш и mtime файла типа после чтения или записи"""
+        mtime = os.stat(self.files[category_type]).st_mtime_ns
+        self._file_states[category_type] = (hashlib.sha256(raw).hexdigest(), mtime)
+    
+    def _snapshot_source_key(self) -> Optional[List]:
+        """
+        Состояние файлов всех типов для ключа снимка индекса
+        
+        Returns:
+            Optional[List]: [[тип, хэш, mtime], ...] или None, если какой-то
+            файл не совпадает с шаблонами в памяти
+        """
+        if self.writer.pending or self.journal.size:
+            return None
+        key = []
+        for category_type in sorted(self.files):
+            state = self._file_states.get(category_type)
+            if state is None:
+                return None
+            key.append([category_type, *state])
+        return key
+    
+    def close(self) -> None:
+        """Завершение работы: дописать отложенные изменения и снимок индекса"""
+        self.usage.close()
+        
+        # Файлы без изменений не перезаписываются: их mtime входит в ключ снимка
+        self.writer.schedule({_JOURNAL_CHECKPOINT})
+        if not self.writer.close():
+            return
+        self.journal.close()
+        
+        # Снимок перезаписывается, только если шаблоны менялись
+        source_key = self._snapshot_source_key()
+        if source_key and source_key != self._snapshot_source:
+            if self.search_indexer.save_snapshot(PATHS.INDEX_SNAPSHOT, source_key):
+                self._snapshot_source = source_key
+    
+    def schedule_save(self, delay_ms: int = 500, category_type: str = None):
         """
         Отложенное сохранение для батчинга операций
         
+        Запросы за время задержки записываются потоком записи одним разом;
+        новый запрос не откладывает уже запланированную запись.
+        
         Args:
             delay_ms: Задержка в миллисекундах перед сохранением
+            category_type: Тип, файл которого нужно сохранить (по умолчанию текущий)
         """
-        import threading
+        self.writer.schedule({category_type or self.current_category_type}, delay_ms / 1000)
+    
+    def force_save(self) -> bool:
+        """
+        Принудительное немедленное сохранение (отложенное выполняется сейчас)
         
-        if self._save_timer_id:
-            try:
-                self._save_timer_id.cancel()
-            except:
-                pass
+        Returns:
+            bool: True если сохранение успешно
+        """
+        self.writer.schedule({self.current_category_type, _JOURNAL_CHECKPOINT})
+        return self.writer.flush()
+    
+    def _write_pending(self, keys: Set[str]) -> bool:
+        """
+        Запись в потоке записи: файлы запрошенных типов и контрольная точка
         
-        def delayed_save():
-            self.save_templates()
-            self._save_pending = False
-            self._save_timer_id = None
+        Args:
+            keys: Типы категорий и/или _JOURNAL_CHECKPOINT
         
-        self._save_pending = True
-        self._save_timer_id = threading.Timer(delay_ms / 1000, delayed_save)
-        self._save_timer_id.start()
+        Returns:
+            bool: True если всё записано
+        """
+        saved = all([self.save_templates(category_type)
+                     for category_type in keys if category_type in self.files])
+        if _JOURNAL_CHECKPOINT in keys:
+            saved = self.checkpoint() and saved
+            # Записи, дописанные во время контрольной точки, ждут следующей;
+            # после неудачи повтор назначает поток записи (с задержкой)
+            if saved:
+                self._schedule_checkpoint()
+        return saved
     
-    def force_save(self) -> bool:
+    def _commit(self, op: str, category_type: str, category: str, **fields) -> bool:
         """
-        Принудительное немедленное сохранение (отменяет отложенное)
+        Зафиксировать изменение: дописать запись в журнал
+        (без журнала или при ошибке журнала - запланировать запись файла типа)
+        
+        Args:
+            op: Операция записи журнала (put, delete, add_category, ...)
+            category_type: Тип категорий (None - текущий)
+            category: Категория
+            **fields: Остальные поля записи
         
         Returns:
-            bool: True если сохранение успешно
+            bool: True если изменение сохранено
         """
-        if self._save_timer_id:
-            self._save_timer_id.cancel()
-            self._save_timer_id = None
+        category_type = category_type or self.current_category_type
+        if not STORAGE.JOURNAL:
+            self.schedule_save(category_type=category_type)
+            return True
+        
+        record = {'op': op, 'type': category_type, 'category': category, **fields}
+        with self.journal.lock:
+            appended = self.journal.append(record)
+            if appended:
+                self._journal_types.add(category_type)
+        if not appended:
+            # Файл типа перезаписывается в потоке записи: интерфейс не ждёт fsync
+            self.schedule_save(category_type=category_type)
+            return True
+        
+        self._schedule_checkpoint()
+        return True
+    
+    def _schedule_checkpoint(self) -> None:
+        """Запланировать контрольную точку по размеру или возрасту журнала"""
+        if not self.journal.size:
+            return
+        if (self.journal.size >= STORAGE.CHECKPOINT_BYTES
+                or self.journal.age >= STORAGE.CHECKPOINT_AGE_S):
+            delay = 0.0
+        else:
+            delay = STORAGE.CHECKPOINT_AGE_S - self.journal.age
+        self.writer.schedule({_JOURNAL_CHECKPOINT}, delay)
+    
+    def checkpoint(self) -> bool:
+        """
+        Перенести журнал в файлы шаблонов (контрольная точка)
+        
+        Размер журнала запоминается до копирования шаблонов: всё, что
+        дописано до него, уже есть в памяти и попадёт в файлы, а более
+        поздние записи остаются в журнале.
         
-        self._save_pending = False
-        return self.save_templates()
+        Returns:
+            bool: True если журнал перенесён (или был пуст)
+        """
+        with self._checkpoint_lock:
+            with self.journal.lock:
+                size = self.journal.size
+                types, self._journal_types = self._journal_types, set()
+            if not size:
+                return True
+            
+            if not all([self.save_templates(category_type) for category_type in types]):
+                with self.journal.lock:
+                    self._journal_types |= types
+                return False
+            return self.journal.discard_head(size)
+    
+    def _replay_journal(self) -> None:
+        """Применить записи журнала, ещё не перенесённые в файлы шаблонов"""
+        records = self.journal.read()
+        if not records:
+            return
+        
+        for record in records:
+            try:
+                self._apply_record(record)
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                print(f"Пропущена запись журнала шаблонов: {e}")
+        self._check_index_consistency()
+        self._schedule_checkpoint()
+    
+    def _apply_record(self, record: dict) -> None:
+        """
+        Применить одну запись журнала к шаблонам в памяти и к индексу
+        
+        Записи идемпотентны: уже применённая (например, перенесённая в файл
+        перед сбоем) запись ничего не меняет.
+        """
+        op = record['op']
+        category_type = record['type']
+        category = record['category']
+        if category_type not in self.files:
+            return
+        categories = self._categories_of(category_type)
+        self._journal_types.add(category_type)
+        
+        if op == 'put':
+            template = self._validate_template(record['template'])
+            if template is None or not isinstance(template['id'], str) or not template['id']:
+                return
+            existing = self._templates_by_id.get(template['id'])
+            if existing and existing[:2] != (category_type, category):
+                # Шаблон перенесён в другую категорию: счётчик использования остаётся
+                self._categories_of(existing[0])[existing[1]].remove(existing[2])
+                self._detach_template(existing[1], existing[2], existing[0])
+                existing = None
+            if existing:
+                self._replace_template(category_type, category, existing[2], template)
+            else:
+                categories.setdefault(category, []).append(template)
+                self._templates_by_id[template['id']] = (category_type, category, template)
+                self._invalidate_category_cache(category, category_type)
+                self.search_indexer.add_template(category, template, category_type)
+        elif op == 'delete':
+            existing = self._templates_by_id.get(record['id'])
+            if existing:
+                self._remove_template(existing[1], existing[2], existing[0])
+        elif op == 'add_category':
+            categories.setdefault(category, [])
+        elif op == 'rename_category':
+            if category in categories and record['new'] not in categories:
+                self._rename_category(category, record['new'], category_type)
+        elif op == 'delete_category':
+            if category in categories:
+                self._remove_category(category, category_type)
+        else:
+            raise ValueError(f"неизвестная операция {op!r}")
     
     def set_category_type(self, category_type: str) -> bool:
         """
-        Установить текущий тип категорий и загрузить его шаблоны
+        Установить текущий тип категорий
+        
+        Шаблоны всех типов уже загружены и проиндексированы,
+        поэтому переключение не читает файл и не перестраивает индекс.
         
         Args:
             category_type (str): Тип категорий (CATEGORIES.CLIENTS или CATEGORIES.COLLEAGUES)
@@ -196,7 +663,9 @@ class TemplateManager:
         """
         if category_type in self.files:
             self.current_category_type = category_type
-            self.load_templates()
+            self.categories = self._type_categories[category_type]
+            self._invalidate_category_cache()
+            self.search_indexer.set_active_type(category_type)
             return True
         return False
     
@@ -209,14 +678,17 @@ class TemplateManager:
         """
         return list(self.files.keys())
     
-    def get_categories(self) -> List[str]:
+    def get_categories(self, category_type: str = None) -> List[str]:
         """
         Получить список категорий
         
+        Args:
+            category_type (str): Тип категорий, по умолчанию текущий
+        
         Returns:
             List[str]: Список названий категорий
         """
-        return list(self.categories.keys())
+        return list(self._categories_of(category_type).keys())
     
     def add_category(self, category_name: str) -> bool:
         """
@@ -232,7 +704,7 @@ class TemplateManager:
             return False
         
         self.categories[category_name] = []
-        return self.save_templates()
+        return self._commit('add_category', None, category_name)
     
     def rename_category(self, old_name: str, new_name: str) -> bool:
         """
@@ -248,8 +720,18 @@ class TemplateManager:
         if old_name not in self.categories or not new_name or new_name in self.categories:
             return False
         
-        self.categories[new_name] = self.categories.pop(old_name)
-        return self.save_templates()
+        self._rename_category(old_name, new_name, self.current_category_type)
+        self._check_index_consistency()
+        return self._commit('rename_category', None, old_name, new=new_name)
+    
+    def _rename_category(self, old_name: str, new_name: str, category_type: str) -> None:
+        """Переименовать категорию в памяти, в карте ID и в индексе"""
+        categories = self._categories_of(category_type)
+        categories[new_name] = categories.pop(old_name)
+        for template in categories[new_name]:
+            self._templates_by_id[template['id']] = (category_type, new_name, template)
+        self._invalidate_category_cache(old_name, category_type)
+        self.search_indexer.rename_category(old_name, new_name, category_type)
     
     def delete_category(self, category_name: str) -> bool:
         """
@@ -264,24 +746,35 @@ class TemplateManager:
         if category_name not in self.categories:
             return False
         
-        del self.categories[category_name]
-        return self.save_templates()
+        self._remove_category(category_name, self.current_category_type)
+        self._check_index_consistency()
+        return self._commit('delete_category', None, category_name)
     
-    def get_templates(self, category: str) -> List[Dict]:
+    def _remove_category(self, category_name: str, category_type: str) -> None:
+        """Удалить категорию из памяти, карты ID и индекса"""
+        for template in self._categories_of(category_type).pop(category_name):
+            self._templates_by_id.pop(template['id'], None)
+            self.normalized_text.forget(template['id'])
+            self.usage.remove(template['id'])
+        self._invalidate_category_cache(category_name, category_type)
+        self.search_indexer.remove_category(category_name, category_type)
+    
+    def get_templates(self, category: str, category_type: str = None) -> List[Dict]:
         """
         Получить шаблоны для категории, отсортированные по закреплению
         
         Args:
             category (str): Название категории
+            category_type (str): Тип категорий, по умолчанию текущий
         
         Returns:
             List[Dict]: Список шаблонов в категории (закреплённые первыми)
         """
-        templates = self.categories.get(category, [])
+        templates = self._categories_of(category_type).get(category, [])
         # Сортируем: закреплённые (pinned=True) идут первыми
         return sorted(templates, key=lambda t: not t.get('pinned', False))
     
-    def add_template(self, category: str, title: str, text: str) -> bool:
+    def add_template(self, category: str, title: str, text: str, tags: List[str] = None) -> bool:
         """
         Добавить шаблон в категорию
         
@@ -289,6 +782,7 @@ class TemplateManager:
             category (str): Название категории
             title (str): Заголовок шаблона
             text (str): Текст шаблона
+            tags (List[str]): Теги шаблона
         
         Returns:
             bool: True если шаблон добавлен успешно
@@ -296,11 +790,19 @@ class TemplateManager:
         if category not in self.categories:
             return False
         
-        self.categories[category].append({"title": title, "text": text})
+        template = {"id": self._new_template_id(), "title": title, "text": text}
+        tags = self.clean_tags(tags)
+        if tags:
+            template['tags'] = tags
+        self.categories[category].append(template)
+        self._templates_by_id[template['id']] = (self.current_category_type, category, template)
         self._invalidate_category_cache(category)
-        return self.save_templates()
+        self.search_indexer.add_template(category, template, self.current_category_type)
+        self._check_index_consistency()
+        return self._commit('put', None, category, template=template)
     
-    def edit_template(self, category: str, index: int, new_title: str, new_text: str) -> bool:
+    def edit_template(self, category: str, index: int, new_title: str, new_text: str,
+                      new_tags: List[str] = None) -> bool:
         """
         Редактировать шаблон
         
@@ -309,6 +811,7 @@ class TemplateManager:
             index (int): Индекс шаблона в категории
             new_title (str): Новый заголовок
             new_text (str): Новый текст
+            new_tags (List[str]): Новые теги (None - оставить прежние)
         
         Returns:
             bool: True если шаблон отредактирован успешно
@@ -319,9 +822,61 @@ class TemplateManager:
         if not (0 <= index < len(self.categories[category])):
             return False
         
-        self.categories[category][index] = {"title": new_title, "text": new_text}
-        self._invalidate_category_cache(category)
-        return self.save_templates()
+        return self._update_template(category, self.categories[category][index], new_title, new_text,
+                                     new_tags=new_tags)
+    
+    def edit_template_by_id(self, template_id: str, new_title: str, new_text: str,
+                            new_tags: List[str] = None) -> bool:
+        """
+        Редактировать шаблон по ID (закрепление и статистика сохраняются)
+        
+        Args:
+            template_id (str): ID шаблона
+            new_title (str): Новый заголовок
+            new_text (str): Новый текст
+            new_tags (List[str]): Новые теги (None - оставить прежние)
+        
+        Returns:
+            bool: True если шаблон отредактирован успешно
+        """
+        record = self._templates_by_id.get(template_id)
+        if not record:
+            return False
+        
+        category_type, category, template = record
+        return self._update_template(category, template, new_title, new_text, category_type, new_tags)
+    
+    def _update_template(self, category: str, template: dict, new_title: str, new_text: str,
+                         category_type: str = None, new_tags: List[str] = None) -> bool:
+        """Изменить шаблон: ID, закрепление и статистика сохраняются"""
+        category_type = category_type or self.current_category_type
+        updated = dict(template, title=new_title, text=new_text)
+        if new_tags is not None:
+            tags = self.clean_tags(new_tags)
+            if tags:
+                updated['tags'] = tags
+            else:
+                updated.pop('tags', None)
+        self._replace_template(category_type, category, template, updated)
+        self._check_index_consistency()
+        return self._commit('put', category_type, category, template=updated)
+    
+    def _replace_template(self, category_type: str, category: str, old: dict, new: dict) -> None:
+        """
+        Заменить шаблон новым словарём на том же месте (карта ID, кэши, индекс)
+        
+        Изменённый шаблон - новый словарь, а не правка прежнего на месте:
+        поток записи копирует шаблоны без блокировки и так видит либо
+        прежнюю, либо новую версию целиком (а не новое название со
+        старым текстом).
+        """
+        templates = self._categories_of(category_type)[category]
+        # ID уникальны, поэтому index() найдёт именно этот шаблон
+        templates[templates.index(old)] = new
+        self._templates_by_id[new['id']] = (category_type, category, new)
+        self.normalized_text.touch(new['id'])
+        self._invalidate_category_cache(category, category_type)
+        self.search_indexer.update_template(category, old, new, category_type)
     
     def delete_template(self, category: str, index: int) -> bool:
         """
@@ -340,9 +895,52 @@ class TemplateManager:
         if not (0 <= index < len(self.categories[category])):
             return False
         
-        self.categories[category].pop(index)
-        self._invalidate_category_cache(category)
-        return self.save_templates()
+        removed = self.categories[category].pop(index)
+        return self._after_template_removed(category, removed)
+    
+    def delete_template_by_id(self, template_id: str) -> bool:
+        """
+        Удалить шаблон по ID
+        
+        Args:
+            template_id (str): ID шаблона
+        
+        Returns:
+            bool: True если шаблон удалён успешно
+        """
+        record = self._templates_by_id.get(template_id)
+        if not record:
+            return False
+        
+        category_type, category, template = record
+        # ID уникальны, поэтому remove() удалит именно этот шаблон
+        self._categories_of(category_type)[category].remove(template)
+        return self._after_template_removed(category, template, category_type)
+    
+    def _after_template_removed(self, category: str, removed: dict,
+                                category_type: str = None) -> bool:
+        """Обновить карту ID, кэши и индекс после удаления шаблона"""
+        category_type = category_type or self.current_category_type
+        self._forget_template(category, removed, category_type)
+        self._check_index_consistency()
+        return self._commit('delete', category_type, category, id=removed['id'])
+    
+    def _forget_template(self, category: str, removed: dict, category_type: str) -> None:
+        """Убрать удалённый из категории шаблон из карты ID, кэшей, счётчиков и индекса"""
+        self._detach_template(category, removed, category_type)
+        self.usage.remove(removed['id'])
+    
+    def _detach_template(self, category: str, removed: dict, category_type: str) -> None:
+        """Убрать убранный из категории шаблон из карты ID, кэшей и индекса (счётчик остаётся)"""
+        self._templates_by_id.pop(removed['id'], None)
+        self.normalized_text.forget(removed['id'])
+        self._invalidate_category_cache(category, category_type)
+        self.search_indexer.remove_template(category, removed, category_type)
+    
+    def _remove_template(self, category: str, template: dict, category_type: str) -> None:
+        """Удалить шаблон из категории (без записи в журнал)"""
+        self._categories_of(category_type)[category].remove(template)
+        self._forget_template(category, template, category_type)
     
     def toggle_pin_template(self, category: str, index: int) -> bool:
         """
@@ -365,68 +963,79 @@ class TemplateManager:
         # Переключаем состояние закрепления
         current_pinned = templates[index].get('pinned', False)
         templates[index]['pinned'] = not current_pinned
+        self.search_indexer.set_pinned(templates[index])
         self._invalidate_category_cache(category)
         
-        return self.save_templates()
+        return self._commit('put', None, category, template=templates[index])
     
-    def toggle_pin_template_by_name(self, category: str, template: dict) -> bool:
+    def toggle_pin_template_by_name(self, category: str, template: dict,
+                                    category_type: str = None) -> bool:
         """
-        Переключить закрепление шаблона по названию
+        Переключить закрепление шаблона (по ID, для словарей без ID - по названию)
         
         Args:
             category (str): Название категории
-            template (dict): Словарь с 'title' шаблона
+            template (dict): Словарь шаблона с 'id' (или 'title')
+            category_type (str): Тип категорий, по умолчанию текущий
         
         Returns:
             bool: True если операция успешна
         """
-        if category not in self.categories:
+        categories = self._categories_of(category_type)
+        if category not in categories:
             return False
         
-        templates = self.categories[category]
-        title = template.get('title')
+        if template.get('id') is not None:
+            tpl = self._find_template(category, template, category_type)
+        else:
+            # Ищем только по названию (text может меняться при редактировании)
+            tpl = next((t for t in categories[category] if t.get('title') == template.get('title')), None)
         
-        # Ищем только по названию (text может меняться при редактировании)
-        for tpl in templates:
-            if tpl.get('title') == title:
-                # Переключаем состояние
-                tpl['pinned'] = not tpl.get('pinned', False)
-                self._invalidate_category_cache(category)
-                return self.save_templates()
+        if tpl is None:
+            return False
         
-        return False
+        # Переключаем состояние
+        tpl['pinned'] = not tpl.get('pinned', False)
+        self.search_indexer.set_pinned(tpl)
+        self._invalidate_category_cache(category, category_type)
+        return self._commit('put', category_type, category, template=tpl)
     
-    def increment_usage(self, category: str, template: dict) -> bool:
+    def increment_usage(self, category: str, template: dict, category_type: str = None) -> bool:
         """
         Увеличить счётчик использований шаблона
         
         Args:
             category (str): Название категории
             template (dict): Словарь шаблона
+            category_type (str): Тип категорий, по умолчанию текущий
         
         Returns:
             bool: True если операция успешна
         """
-        if category not in self.categories:
+        if category not in self._categories_of(category_type):
             return False
         
-        templates = self.categories[category]
-        title = template.get('title')
-        text = template.get('text')
-        
         # Находим шаблон и увеличиваем счётчик
-        for tpl in templates:
-            if tpl.get('title') == title and tpl.get('text') == text:
-                # Инициализируем stats если их нет
-                if 'stats' not in tpl:
-                    tpl['stats'] = {'usage_count': 0}
-                
-                tpl['stats']['usage_count'] = tpl['stats'].get('usage_count', 0) + 1
-                # Используем отложенное сохранение для лучшей производительности
-                self.schedule_save(delay_ms=1000)
-                return True
+        tpl = self._find_template(category, template, category_type)
+        if tpl is None:
+            return False
         
-        return False
+        # Счётчик - запись фиксированной ширины в файле счётчиков:
+        # ни шаблон, ни файлы шаблонов не меняются
+        self.usage.increment(tpl['id'])
+        return True
+    
+    def get_usage_count(self, template: dict) -> int:
+        """
+        Число копирований шаблона (из файла счётчиков)
+        
+        Args:
+            template (dict): Словарь шаблона (с 'id')
+        
+        Returns:
+            int: Счётчик использований
+        """
+        return self.usage.get(template.get('id'))
     
     def get_top_used_templates(self, category: str, limit: int = 3) -> List[Dict]:
         """
@@ -446,33 +1055,32 @@ class TemplateManager:
         # Сортируем по usage_count в убывающем порядке
         sorted_templates = sorted(
             templates,
-            key=lambda t: t.get('stats', {}).get('usage_count', 0),
+            key=self.get_usage_count,
             reverse=True
         )
         
         return sorted_templates[:limit]
     
-    def get_template_stats(self, category: str, template: dict) -> dict:
+    def get_template_stats(self, category: str, template: dict, category_type: str = None) -> dict:
         """
         Получить статистику шаблона
         
         Args:
             category (str): Название категории
             template (dict): Словарь шаблона
+            category_type (str): Тип категорий, по умолчанию текущий
         
         Returns:
             dict: Статистика шаблона
         """
-        if category not in self.categories:
+        if category not in self._categories_of(category_type):
             return {}
         
-        templates = self.categories[category]
-        
-        for tpl in templates:
-            if tpl.get('title') == template.get('title') and tpl.get('text') == template.get('text'):
-                return tpl.get('stats', {'usage_count': 0})
+        tpl = self._find_template(category, template, category_type)
+        if tpl is None:
+            return {}
         
-        return {}
+        return {**tpl.get('stats', {}), 'usage_count': self.get_usage_count(tpl)}
     
     def reset_statistics(self, category: str) -> bool:
         """
@@ -488,16 +1096,13 @@ class TemplateManager:
             return False
         
         # Сбрасываем счётчик для всех шаблонов в категории
+        # (счётчики в своём файле - шаблоны сохранять не нужно)
         for template in self.categories[category]:
-            if 'stats' not in template:
-                template['stats'] = {}
-            template['stats']['usage_count'] = 0
+            self.usage.set(template['id'], 0)
         
         # Инвалидировать кэш
         self._invalidate_category_cache(category)
-        
-        # Сохраняем изменения
-        return self.save_templates()
+        return True
     
     def get_templates_cached(self, category: str) -> List[Dict]:
         """
@@ -519,10 +1124,47 @@ class TemplateManager:
         self._cache_dirty = False
         return templates
     
-    def _invalidate_category_cache(self, category: str = None) -> None:
-        """Инвалидировать кэш"""
-        if category:
-            self._category_cache.pop(category, None)
-        else:
-            self._category_cache.clear()
-        self._cache_dirty = True
\ No newline at end of file
+    def search_templates(self, query: str, category: str = None, category_type: str = None,
+                         tags: tuple = (), should_stop=None) -> Optional[List[Tuple[str, str, Dict]]]:
+        """
+        Поиск средствами хранилища (пока поисковый индекс строится)
+        
+        Args:
+            query: Поисковый запрос
+            category: Категория или None - все категории
+            category_type: Тип категорий или None - все типы
+            tags: Теги, которые должен иметь шаблон
+            should_stop: Проверка, что запрос устарел
+        
+        Returns:
+            Список (тип, категория, шаблон) или None - хранилище не умеет
+            искать (JSON-файлы), шаблоны нужно просмотреть
+        """
+        return None
+    
+    def _invalidate_category_cache(self, category: str = None, category_type: str = None) -> None:
+        """Инвалидировать кэш (свой и кэш категорий поискового индекса)"""
+        category_type = category_type or self.current_category_type
+        if category_type == self.current_category_type:
+            if category:
+                self._category_cache.pop(category, None)
+            else:
+                self._category_cache.clear()
+            self._cache_dirty = True
+        self.search_indexer.invalidate_cache(category, category_type)
+    
+    def _check_index_consistency(self) -> None:
+        """В режиме проверки сравнить инкрементальный индекс с полной пересборкой"""
+        if not SEARCH.CHECK_INDEX_CONSISTENCY:
+            return
+        
+        for problem in self.search_indexer.check_consistency(self):
+            print(f"[ERROR] Рассогласование поискового индекса: {problem}")
+
+
+def create_template_manager() -> TemplateManager:
+    """Менеджер шаблонов с хранилищем из настроек (STORAGE.BACKEND)"""
+    if STORAGE.BACKEND == 'sqlite':
+        from models.sqlite_template_manager import SQLiteTemplateManager
+        return SQLiteTemplateManager()
+    return TemplateManager()
@@ -0,0 +1,110 @@
+"""
+Форматы записи файлов шаблонов
+
+Все форматы пишут обычный JSON, поэтому файл, записанный одним
+форматом, читается любым другим - формат можно сменить в любой момент:
+
+    pretty  - с отступами (читается человеком, но файл почти вдвое больше
+              и запись медленнее)
+    compact - без отступов и пробелов, стандартный модуль json
+    orjson  - без отступов через orjson (если установлен), в несколько
+              раз быстрее стандартного модуля
+    auto    - orjson, если он установлен, иначе compact
+"""
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class TemplateSerializer(ABC):
+    """Формат файла шаблонов: данные <-> байты UTF-8"""
+    
+    name = ""
+    
+    @abstractmethod
+    def dumps(self, data: Any) -> bytes:
+        """Записать данные в байты файла"""
+    
+    @abstractmethod
+    def loads(self, raw: bytes) -> Any:
+        """Прочитать данные из байтов файла"""
+
+
+class PrettyJsonSerializer(TemplateSerializer):
+    """JSON с отступами (прежний формат файлов)"""
+    
+    name = "pretty"
+    
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    
+    def loads(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class CompactJsonSerializer(TemplateSerializer):
+    """Компактный JSON через стандартный модуль"""
+    
+    name = "compact"
+    
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    
+    def loads(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class OrjsonSerializer(CompactJsonSerializer):
+    """
+    Компактный JSON через orjson
+    
+    Данные, которые orjson не принимает (например, целые больше 64 бит),
+    записываются стандартным модулем в том же компактном виде.
+    """
+    
+    name = "orjson"
+    
+    def dumps(self, data: Any) -> bytes:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            return super().dumps(data)
+    
+    def loads(self, raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+
+SERIALIZERS: Dict[str, type] = {
+    PrettyJsonSerializer.name: PrettyJsonSerializer,
+    CompactJsonSerializer.name: CompactJsonSerializer,
+    OrjsonSerializer.name: OrjsonSerializer,
+}
+
+
+def available_serializers() -> List[str]:
+    """Форматы, доступные в этой установке (orjson - только если установлен)"""
+    return [name for name in SERIALIZERS if name != OrjsonSerializer.name or orjson is not None]
+
+
+def get_serializer(name: str = "auto") -> TemplateSerializer:
+    """
+    Формат файлов по имени
+    
+    Args:
+        name: pretty, compact, orjson или auto
+    
+    Returns:
+        TemplateSerializer: Формат (orjson без установленного orjson
+        и неизвестное имя заменяются на compact)
+    """
+    if name == "auto":
+        name = OrjsonSerializer.name if orjson is not None else CompactJsonSerializer.name
+    if name not in available_serializers():
+        print(f"Формат файлов шаблонов '{name}' недоступен, используется compact")
+        name = CompactJsonSerializer.name
+    return SERIALIZERS[name]()
@@ -0,0 +1,41 @@
+"""
+Нормализация текста для поискового индекса
+
+Приводит текст к единой форме (NFKC, casefold, ё -> е) и сводит слова
+к основам, чтобы разные формы одного слова были одним термином.
+Одна и та же нормализация применяется и к шаблонам, и к запросу.
+"""
+from functools import lru_cache
+import unicodedata
+
+from models.stemmer import EnglishStemmer, RussianStemmer
+
+
+_russian_stemmer = RussianStemmer()
+_english_stemmer = EnglishStemmer()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Привести текст к единой форме для сравнения.
+    
+    NFKC сводит совместимые символы (лигатуры, полноширинные буквы),
+    casefold - регистр, а "ё" заменяется на "е".
+    """
+    return unicodedata.normalize('NFKC', text).casefold().replace('ё', 'е')
+
+
+@lru_cache(maxsize=65536)
+def stem_word(word: str) -> str:
+    """
+    Основа слова: русский или английский стеммер по алфавиту слова.
+    
+    Слова с цифрами или смешанным алфавитом не изменяются.
+    """
+    if word.isascii():
+        if word.isalpha():
+            return _english_stemmer.stem(word)
+        return word
+    if all('а' <= char <= 'я' for char in word):
+        return _russian_stemmer.stem(word)
+    return word
@@ -0,0 +1,215 @@
+"""
+Счётчики использования шаблонов в отображённом в память файле
+
+Формат файла:
+    MAGIC (4 байта) | версия формата (uint32) | число записей (uint32)
+    | резерв (uint32) | записи
+
+Запись фиксированной ширины: ключ шаблона (32 байта, ID в ASCII,
+дополненный нулями; более длинный ID заменяется его хэшем) и счётчик
+(uint64). Пустой ключ - свободная запись (шаблон удалён).
+
+Место записи каждого шаблона известно из словаря, который строится при
+открытии одним проходом по файлу, поэтому увеличение счётчика - одна
+запись 8 байт на месте, без сериализации шаблонов и перезаписи файлов.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, List
+
+
+MAGIC = b"HTUC"
+
+# Версия формата: увеличивается при изменении структуры записи
+COUNTERS_VERSION = 1
+
+KEY_SIZE = 32
+
+# Заголовок: MAGIC, версия, число записей, резерв
+_HEADER = struct.Struct("<4sIII")
+_RECORD = struct.Struct(f"<{KEY_SIZE}sQ")
+_COUNT = struct.Struct("<Q")
+
+# Сколько записей добавлять при росте файла (минимум)
+GROW_RECORDS = 1024
+
+
+def _key(template_id: str) -> bytes:
+    """Ключ записи: ID шаблона (или его хэш, если ID не помещается)"""
+    raw = str(template_id).encode('utf-8')
+    if len(raw) > KEY_SIZE or b"\0" in raw:
+        raw = hashlib.blake2b(raw, digest_size=KEY_SIZE // 2).hexdigest().encode('ascii')
+    return raw.ljust(KEY_SIZE, b"\0")
+
+
+class UsageCounters:
+    """
+    Счётчики использования по ID шаблона.
+    
+    Если файл не удаётся отобразить в память (нет доступа, повреждение),
+    счётчики работают в памяти без сохранения, чтобы копирование шаблонов
+    не ломалось.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу счётчиков
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._buffer = None
+        self._slots: Dict[bytes, int] = {}
+        self._free: List[int] = []
+        self._count = 0
+        self._capacity = 0
+        self._open()
+    
+    def __contains__(self, template_id) -> bool:
+        return template_id is not None and _key(template_id) in self._slots
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def _open(self) -> None:
+        """Отобразить файл в память и прочитать расположение записей"""
+        try:
+            exists = os.path.exists(self.path) and os.path.getsize(self.path) >= _HEADER.size
+            self._file = open(self.path, 'r+b' if exists else 'w+b')
+            if not exists:
+                self._file.truncate(_HEADER.size + GROW_RECORDS * _RECORD.size)
+                self._file.write(_HEADER.pack(MAGIC, COUNTERS_VERSION, 0, 0))
+                self._file.flush()
+            self._buffer = mmap.mmap(self._file.fileno(), 0)
+            magic, version, count, _ = _HEADER.unpack_from(self._buffer)
+            self._capacity = (len(self._buffer) - _HEADER.size) // _RECORD.size
+            if magic != MAGIC or version != COUNTERS_VERSION or count > self._capacity:
+                raise ValueError("неизвестный формат файла счётчиков")
+        except (OSError, ValueError) as e:
+            print(f"Счётчики использования не сохраняются ({self.path}): {e}")
+            self._close_file()
+            self._buffer = bytearray(_HEADER.pack(MAGIC, COUNTERS_VERSION, 0, 0))
+            self._capacity = 0
+            count = 0
+        
+        self._count = count
+        records = memoryview(self._buffer)[_HEADER.size:_HEADER.size + count * _RECORD.size]
+        for slot, (key, _) in enumerate(_RECORD.iter_unpack(records)):
+            if key.strip(b"\0"):
+                self._slots[key] = slot
+            else:
+                self._free.append(slot)
+        records.release()
+    
+    def _offset(self, slot: int) -> int:
+        """Смещение записи в файле"""
+        return _HEADER.size + slot * _RECORD.size
+    
+    def get(self, template_id) -> int:
+        """Счётчик шаблона (0 - шаблон ещё не использовался)"""
+        if template_id is None:
+            return 0
+        with self._lock:
+            slot = self._slots.get(_key(template_id))
+            if slot is None:
+                return 0
+            return _COUNT.unpack_from(self._buffer, self._offset(slot) + KEY_SIZE)[0]
+    
+    def increment(self, template_id) -> int:
+        """
+        Увеличить счётчик шаблона на 1 (запись 8 байт на месте)
+        
+        Returns:
+            int: Новое значение счётчика
+        """
+        with self._lock:
+            key = _key(template_id)
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._allocate(key)
+            offset = self._offset(slot) + KEY_SIZE
+            value = _COUNT.unpack_from(self._buffer, offset)[0] + 1
+            _COUNT.pack_into(self._buffer, offset, value)
+            return value
+    
+    def set(self, template_id, value: int) -> None:
+        """Установить счётчик шаблона (например, сбросить в 0)"""
+        with self._lock:
+            key = _key(template_id)
+            slot = self._slots.get(key)
+            if slot is None:
+                if not value:
+                    return
+                slot = self._allocate(key)
+            _COUNT.pack_into(self._buffer, self._offset(slot) + KEY_SIZE, value)
+    
+    def remove(self, template_id) -> None:
+        """Освободить запись удалённого шаблона"""
+        with self._lock:
+            slot = self._slots.pop(_key(template_id), None)
+            if slot is None:
+                return
+            _RECORD.pack_into(self._buffer, self._offset(slot), b"", 0)
+            self._free.append(slot)
+    
+    def _allocate(self, key: bytes) -> int:
+        """Запись для нового шаблона: свободная или новая в конце (под _lock)"""
+        if self._free:
+            slot = self._free.pop()
+            _RECORD.pack_into(self._buffer, self._offset(slot), key, 0)
+        else:
+            if self._count >= self._capacity:
+                self._grow()
+            slot = self._count
+            self._count += 1
+            # Запись заполняется до увеличения числа записей в заголовке
+            _RECORD.pack_into(self._buffer, self._offset(slot), key, 0)
+            _HEADER.pack_into(self._buffer, 0, MAGIC, COUNTERS_VERSION, self._count, 0)
+        self._slots[key] = slot
+        return slot
+    
+    def _grow(self) -> None:
+        """Увеличить файл (вдвое, но не меньше GROW_RECORDS записей)"""
+        capacity = self._capacity + max(GROW_RECORDS, self._capacity)
+        size = _HEADER.size + capacity * _RECORD.size
+        if isinstance(self._buffer, bytearray):
+            self._buffer.extend(bytes(size - len(self._buffer)))
+        else:
+            self._buffer.flush()
+            self._buffer.close()
+            self._file.truncate(size)
+            self._buffer = mmap.mmap(self._file.fileno(), 0)
+        self._capacity = capacity
+    
+    def flush(self) -> None:
+        """Сбросить изменённые страницы на диск"""
+        with self._lock:
+            if isinstance(self._buffer, mmap.mmap):
+                try:
+                    self._buffer.flush()
+                except OSError as e:
+                    print(f"Ошибка при сохранении счётчиков использования: {e}")
+    
+    def close(self) -> None:
+        """Сбросить изменения и закрыть файл"""
+        self.flush()
+        with self._lock:
+            self._close_file()
+            self._buffer = bytearray(_HEADER.pack(MAGIC, COUNTERS_VERSION, 0, 0))
+            self._slots.clear()
+            self._free.clear()
+            self._count = 0
+            self._capacity = 0
+    
+    def _close_file(self) -> None:
+        """Закрыть отображение и файл"""
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
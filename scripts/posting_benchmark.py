@@ -0,0 +1,106 @@
+"""
+Бенчмарк списков вхождений: множества ID против массивов номеров (posting_list)
+
+Память считается по контейнерам списков (сами строки ID общие и не
+учитываются), пересечение - на парах слов разной частоты, объединение -
+на списках всех терминов, содержащих подстроку (как для слова запроса).
+
+Запуск:
+    python scripts/posting_benchmark.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.posting_list import intersect_postings, union_postings
+from models.search_indexer import SearchIndexer
+from search_benchmark import SyntheticManager
+
+
+# Количество пар слов для замера пересечений
+PAIR_SAMPLES = 500
+
+# Подстроки для замера объединений: от сотен подходящих терминов до единиц
+UNION_SAMPLES = ["ка", "ста", "ставка", "заказ"]
+
+
+def measure(func, repeat: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def postings_size(index: dict) -> int:
+    """Суммарный размер контейнеров списков в байтах"""
+    return sum(sys.getsizeof(postings) for postings in index.values())
+
+
+def run(size: int) -> None:
+    manager = SyntheticManager(size)
+    print(f"\n{'=' * 60}\n📚 Шаблонов: {size}\n{'=' * 60}")
+    
+    indexer = SearchIndexer()
+    build_ms = measure(lambda: indexer.build_index(manager), 1)
+    print(f"  Индекс: {build_ms:.0f}ms, терминов {len(indexer.terms)}")
+    
+    # Прежнее представление: слово -> set(ID шаблонов), триграмма -> set(ID терминов)
+    word_sets = {word: set(map(indexer.doc_ids.__getitem__, ordinals))
+                 for word, ordinals in indexer.word_index.items()}
+    gram_sets = {gram: set(term_ids) for gram, term_ids in indexer.gram_index.items()}
+    
+    print(f"\n  {'Списки':<12}{'Записей':>10}{'set, MB':>10}{'array, MB':>11}"
+          f"{'set, Б/зап':>12}{'array, Б/зап':>14}")
+    for name, sets, arrays in (("слова", word_sets, indexer.word_index),
+                               ("триграммы", gram_sets, indexer.gram_index)):
+        entries = sum(len(postings) for postings in arrays.values())
+        set_bytes = postings_size(sets)
+        array_bytes = postings_size(arrays)
+        print(f"  {name:<12}{entries:>10}{set_bytes / 1024 / 1024:>10.1f}"
+              f"{array_bytes / 1024 / 1024:>11.1f}{set_bytes / entries:>12.1f}"
+              f"{array_bytes / entries:>14.1f}")
+    
+    # Пары "частое слово + произвольное": типичный запрос из двух слов
+    rng = random.Random(3)
+    words = sorted(indexer.word_index, key=lambda w: len(indexer.word_index[w]))
+    frequent = words[-len(words) // 20:]
+    pairs = [(rng.choice(frequent), rng.choice(words)) for _ in range(PAIR_SAMPLES)]
+    
+    set_ms = measure(lambda: [word_sets[a] & word_sets[b] for a, b in pairs], 3)
+    array_ms = measure(lambda: [intersect_postings(indexer.word_index[a], indexer.word_index[b])
+                                for a, b in pairs], 3)
+    print(f"\n  Пересечение {PAIR_SAMPLES} пар: set {set_ms:.2f}ms, array {array_ms:.2f}ms")
+    
+    # Прежнее объединение: set.update по всем спискам и сортировка
+    def set_union(lists):
+        merged = set()
+        for postings in lists:
+            merged.update(postings)
+        return sorted(merged)
+    
+    print(f"\n  {'Объединение':<14}{'Списков':>9}{'Записей':>10}{'set, ms':>10}{'array, ms':>11}")
+    for sample in UNION_SAMPLES:
+        lists = [postings for word, postings in indexer.word_index.items() if sample in word]
+        set_ms = measure(lambda: set_union(lists), 10)
+        array_ms = measure(lambda: union_postings(lists), 10)
+        entries = sum(map(len, lists))
+        print(f"  {sample:<14}{len(lists):>9}{entries:>10}{set_ms:>10.2f}{array_ms:>11.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    
+    for size in args.sizes:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Бенчмарк поиска: старый полный просмотр word_index против индекса SearchIndexer
+
+Запуск:
+    python scripts/search_benchmark.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.search_indexer import SearchIndexer
+
+
+SYLLABLES = [
+    "ша", "бло", "на", "за", "каз", "но", "мер", "кли", "ент", "до", "став",
+    "ка", "оп", "ла", "та", "при", "вет", "от", "вет", "сро", "ки", "ра",
+    "бо", "ты", "ме", "нед", "жер", "ски", "дка", "воз", "врат", "чек",
+]
+
+QUERIES = ["ша", "заказ", "ент до", "ставка", "оплата чек", "несуществующее",
+           "cnfdrf", "oplata"]
+
+# Количество слов с опечатками для замера нечёткого поиска
+FUZZY_SAMPLES = 200
+
+
+class LegacyScanIndex:
+    """Копия старого алгоритма: все подстроки слов и полный просмотр словаря"""
+    
+    def __init__(self):
+        self.word_index = defaultdict(set)
+        self.category_index = defaultdict(list)
+    
+    def build_index(self, manager):
+        for category in manager.get_categories():
+            for template in manager.get_templates(category):
+                template_id = id(template)
+                self.category_index[category].append(template_id)
+                for word in self._tokenize(template['title'] + ' ' + template['text']):
+                    self.word_index[word].add(template_id)
+    
+    def search(self, query, category):
+        result_ids = set(self.category_index[category])
+        for word in self._tokenize(query.lower()):
+            matching_ids = set()
+            for indexed_word, template_ids in self.word_index.items():
+                if word in indexed_word or indexed_word.startswith(word):
+                    matching_ids.update(template_ids)
+            result_ids &= matching_ids
+            if not result_ids:
+                break
+        return result_ids
+    
+    @staticmethod
+    def _tokenize(text):
+        words = re.findall(r'[a-яa-z0-9]{1,}', text.lower())
+        substrings = set()
+        for word in words:
+            for i in range(len(word) - 1):
+                for j in range(i + 2, len(word) + 1):
+                    substrings.add(word[i:j])
+        return list(set(words)) + list(substrings)
+
+
+class SyntheticManager:
+    """Минимальный заменитель TemplateManager со сгенерированной библиотекой"""
+    
+    CATEGORY = "Бенчмарк"
+    
+    # Второй тип категорий (для глобального поиска) - четверть основного объёма
+    CATEGORY_TYPE = "Клиенты"
+    OTHER_TYPE = "Коллеги"
+    
+    def __init__(self, size: int, seed: int = 42):
+        rng = random.Random(seed)
+        vocabulary = [
+            "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+            for _ in range(max(500, size // 2))
+        ]
+        
+        def generate(count):
+            return [
+                {
+                    "title": f"Шаблон {i}: " + " ".join(rng.choices(vocabulary, k=3)),
+                    "text": " ".join(rng.choices(vocabulary, k=rng.randint(10, 30))),
+                }
+                for i in range(count)
+            ]
+        
+        self.templates = generate(size)
+        self.types = {
+            self.CATEGORY_TYPE: {self.CATEGORY: self.templates},
+            self.OTHER_TYPE: {self.CATEGORY: generate(size // 4)},
+        }
+        self.current_category_type = self.CATEGORY_TYPE
+    
+    def get_category_types(self):
+        return list(self.types)
+    
+    def get_categories(self, category_type=None):
+        return list(self.types[category_type or self.current_category_type])
+    
+    def get_templates(self, category, category_type=None):
+        return self.types[category_type or self.current_category_type][category]
+
+
+def measure(func, repeat: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def run(size: int, with_legacy: bool) -> None:
+    manager = SyntheticManager(size)
+    category = SyntheticManager.CATEGORY
+    print(f"\n{'=' * 60}\n📚 Шаблонов: {size}\n{'=' * 60}")
+    
+    indexer = SearchIndexer()
+    build_ms = measure(lambda: indexer.build_index(manager), 1)
+    print(f"  Новый индекс: {build_ms:.0f}ms, терминов {len(indexer.terms)}, "
+          f"триграмм {len(indexer.gram_index)}")
+    print(f"  Раскладка и транслит: ключей {len(indexer.alternate_index)}, "
+          f"~{indexer.alternate_memory_usage() / 1024 / 1024:.1f} MB")
+    
+    legacy = None
+    if with_legacy:
+        legacy = LegacyScanIndex()
+        legacy_ms = measure(lambda: legacy.build_index(manager), 1)
+        print(f"  Старый индекс: {legacy_ms:.0f}ms, ключей {len(legacy.word_index)}")
+    
+    print(f"\n  {'Запрос':<18}{'Найдено':>9}{'Новый, ms':>12}{'Старый, ms':>13}")
+    for query in QUERIES:
+        found = len(indexer.search_in_category(query, category, manager))
+        new_ms = measure(lambda: indexer.search_in_category(query, category, manager), 5)
+        legacy_text = "-"
+        if legacy is not None:
+            legacy_text = f"{measure(lambda: legacy.search(query, category), 1):.2f}"
+        print(f"  {query:<18}{found:>9}{new_ms:>12.2f}{legacy_text:>13}")
+    
+    run_global(indexer, category)
+    run_typing(indexer, category, manager)
+    run_fuzzy(indexer)
+
+
+def run_global(indexer: SearchIndexer, category: str) -> None:
+    """Ранжированный поиск в категории против глобального по обоим типам"""
+    print(f"\n  {'Запрос':<18}{'Категория, ms':>15}{'Везде, ms':>12}{'Найдено везде':>15}")
+    for query in QUERIES:
+        category_ms = measure(lambda: indexer.search_ranked(query, category), 5)
+        global_ms = measure(lambda: indexer.search_global(query), 5)
+        found = len(indexer.search_global(query, limit=10 ** 9))
+        print(f"  {query:<18}{category_ms:>15.2f}{global_ms:>12.2f}{found:>15}")
+
+
+def run_typing(indexer: SearchIndexer, category: str, manager) -> None:
+    """
+    Поиск по мере ввода: каждый префикс запроса с кэшем и без него.
+    
+    Отдельно - время дописанных префиксов (со второй буквы): с кэшем они
+    уточняют результат предыдущего префикса, а не ищут по индексу.
+    """
+    print(f"\n  {'По мере ввода':<18}{'Без кэша, ms':>14}{'С кэшем, ms':>13}"
+          f"{'Дописывание без кэша':>22}{'с кэшем':>9}")
+    for query in QUERIES:
+        prefixes = [query[:end] for end in range(1, len(query) + 1)]
+        
+        def typing(clear_cache):
+            """Время всех префиксов и дописанных (без первого)"""
+            indexer.query_cache.clear()
+            timings = []
+            for prefix in prefixes:
+                if clear_cache:
+                    indexer.query_cache.clear()
+                start = time.perf_counter()
+                indexer.search_in_category(prefix, category, manager)
+                timings.append((time.perf_counter() - start) * 1000)
+            return sum(timings), sum(timings[1:])
+        
+        uncached = [typing(True) for _ in range(3)]
+        cached = [typing(False) for _ in range(3)]
+        uncached_ms, uncached_tail = (sum(values) / len(values) for values in zip(*uncached))
+        cached_ms, cached_tail = (sum(values) / len(values) for values in zip(*cached))
+        print(f"  {query:<18}{uncached_ms:>14.2f}{cached_ms:>13.2f}"
+              f"{uncached_tail:>22.2f}{cached_tail:>9.2f}")
+
+
+def make_typo(word: str, rng: random.Random) -> str:
+    """Испортить слово: удаление, вставка, замена или перестановка букв"""
+    i = rng.randrange(len(word) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rng.choice("абвгдеклмнопрст") + word[i:]
+    if kind == 2:
+        return word[:i] + rng.choice("абвгдеклмнопрст") + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def run_fuzzy(indexer: SearchIndexer) -> None:
+    """Замер нечёткого поиска терминов по словам с опечатками"""
+    rng = random.Random(7)
+    words = [make_typo(term, rng) for term in
+             rng.sample([t for t in indexer.terms if len(t) >= 6], FUZZY_SAMPLES)]
+    
+    build_ms = measure(indexer._get_fuzzy_index, 1)
+    lookup_ms = measure(lambda: [indexer._match_fuzzy(w) for w in words], 1) / len(words)
+    recovered = sum(1 for w in words if indexer._match_fuzzy(w))
+    
+    print(f"\n  Индекс опечаток: {build_ms:.0f}ms, "
+          f"вариантов {len(indexer._fuzzy_index)}")
+    print(f"  Поиск термина с опечаткой: {lookup_ms:.3f}ms, "
+          f"найдено для {recovered}/{len(words)} слов")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--no-legacy", action="store_true",
+                        help="Не измерять старый алгоритм (он строится очень долго)")
+    args = parser.parse_args()
+    
+    for size in args.sizes:
+        run(size, with_legacy=not args.no_legacy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Бенчмарк форматов файлов шаблонов: запись, чтение и размер файла
+
+Для каждого доступного формата (pretty, compact, orjson) и размера
+библиотеки измеряется запись в файл (сериализация + запись на диск),
+чтение (разбор JSON) и загрузка целиком (разбор + валидация шаблонов,
+как при запуске приложения).
+
+Запуск:
+    python scripts/serialization_benchmark.py [--sizes 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.template_manager import TemplateManager
+from models.template_serializer import available_serializers, get_serializer
+
+
+SYLLABLES = [
+    "ша", "бло", "на", "за", "каз", "но", "мер", "кли", "ент", "до", "став",
+    "ка", "оп", "ла", "та", "при", "вет", "от", "вет", "сро", "ки", "ра",
+    "бо", "ты", "ме", "нед", "жер", "ски", "дка", "воз", "врат", "чек",
+]
+
+# Шаблонов в одной категории
+CATEGORY_SIZE = 200
+
+
+def generate_library(size: int, seed: int = 42) -> dict:
+    """Библиотека из size шаблонов в формате файла шаблонов"""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(2000)]
+    library = {}
+    for i in range(size):
+        category = f"Категория {i // CATEGORY_SIZE}"
+        template = {
+            "id": f"{rng.getrandbits(128):032x}",
+            "title": f"Шаблон {i}: " + " ".join(rng.choices(vocabulary, k=3)),
+            "text": " ".join(rng.choices(vocabulary, k=rng.randint(20, 80))),
+            "pinned": rng.random() < 0.05,
+            "stats": {},
+        }
+        if rng.random() < 0.3:
+            template["tags"] = rng.sample(["vip", "доставка", "оплата", "возврат"], k=2)
+        library.setdefault(category, []).append(template)
+    return library
+
+
+def measure(func, repeat: int) -> float:
+    """Лучшее время вызова в миллисекундах"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(size: int, repeat: int, directory: str) -> None:
+    library = generate_library(size)
+    # Валидация без чтения файлов приложения (как в load_templates)
+    manager = TemplateManager.__new__(TemplateManager)
+    path = os.path.join(directory, "templates.json")
+    
+    print(f"\n{'=' * 72}\n📚 Шаблонов: {size}\n{'=' * 72}")
+    print(f"  {'Формат':<10}{'Размер, КБ':>12}{'Запись, ms':>13}{'Чтение, ms':>13}"
+          f"{'Загрузка, ms':>15}{'МБ/с записи':>13}")
+    
+    for name in available_serializers():
+        serializer = get_serializer(name)
+        
+        def save():
+            raw = serializer.dumps(library)
+            with open(path, 'wb') as f:
+                f.write(raw)
+            return raw
+        
+        raw = save()
+        save_ms = measure(save, repeat)
+        parse_ms = measure(lambda: serializer.loads(raw), repeat)
+        load_ms = measure(lambda: manager._validate_templates(serializer.loads(raw)), repeat)
+        throughput = len(raw) / 1024 / 1024 / (save_ms / 1000)
+        print(f"  {name:<10}{len(raw) / 1024:>12.0f}{save_ms:>13.1f}{parse_ms:>13.1f}"
+              f"{load_ms:>15.1f}{throughput:>13.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    print(f"Доступные форматы: {', '.join(available_serializers())}; "
+          f"auto = {get_serializer('auto').name}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            run(size, args.repeat, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Размер индекса без нормализации, с нормализацией текста и со стеммингом
+
+Корпус по умолчанию - живой русский текст самого проекта: документация
+(README, CHANGELOG, заметки к релизам) и комментарии/докстроки кода,
+по абзацу на шаблон. Можно передать свой файл шаблонов (templates.json).
+
+Запуск:
+    python scripts/stemming_benchmark.py [--templates path/to/templates.json]
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.stdout.reconfigure(encoding='utf-8')
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config.settings import SEARCH
+from models.search_indexer import SearchIndexer
+
+
+DOCUMENTS = ["README.md", "CHANGELOG.md", "RELEASE_NOTES_v3.0.1.md", "RELEASE_DESCRIPTION.txt"]
+
+# Комментарий или строка докстроки с русским текстом
+CODE_TEXT = re.compile(r'^\s*(?:#\s*|"""\s*)?(.*[а-яё].*?)(?:""")?\s*$', re.IGNORECASE)
+
+# Запросы в разных формах: стемминг должен находить все формы
+QUERIES = ["шаблонами", "поиска", "категорию", "обновления", "templates", "ошибки"]
+
+MODES = [
+    ("Без нормализации", False, False),
+    ("NFKC + ё", True, False),
+    ("NFKC + ё + стемминг", True, True),
+]
+
+
+class CorpusManager:
+    """Минимальный заменитель TemplateManager с готовым набором шаблонов"""
+    
+    current_category_type = "Корпус"
+    
+    def __init__(self, categories: dict):
+        self.categories = categories
+    
+    def get_category_types(self):
+        return [self.current_category_type]
+    
+    def get_categories(self, category_type=None):
+        return list(self.categories)
+    
+    def get_templates(self, category, category_type=None):
+        return self.categories[category]
+
+
+def project_corpus() -> dict:
+    """Абзацы документации и комментариев проекта как шаблоны"""
+    paragraphs = []
+    for name in DOCUMENTS:
+        path = ROOT / name
+        if path.exists():
+            text = path.read_text(encoding='utf-8')
+            paragraphs.extend(p for p in re.split(r'\n\s*\n', text) if p.strip())
+    
+    for path in sorted(ROOT.glob("**/*.py")):
+        block = []
+        for line in path.read_text(encoding='utf-8').splitlines():
+            match = CODE_TEXT.match(line)
+            if match and ('#' in line or block or '"""' in line):
+                block.append(match.group(1))
+            elif block:
+                paragraphs.append(" ".join(block))
+                block = []
+    
+    templates = [
+        {"id": str(i), "title": paragraph.strip().splitlines()[0][:80], "text": paragraph}
+        for i, paragraph in enumerate(paragraphs)
+    ]
+    return {"Проект": templates}
+
+
+def load_templates(path: str) -> dict:
+    """Шаблоны из файла в формате TemplateManager"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def index_size(indexer: SearchIndexer) -> dict:
+    """Основные размеры индекса"""
+    return {
+        "терминов": len(indexer.terms),
+        "триграмм": len(indexer.gram_index),
+        "записей": sum(len(ids) for ids in indexer.word_index.values()),
+        "ключей раскладки": len(indexer.alternate_index),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--templates", help="Файл шаблонов (templates.json)")
+    args = parser.parse_args()
+    
+    categories = load_templates(args.templates) if args.templates else project_corpus()
+    manager = CorpusManager(categories)
+    total = sum(len(templates) for templates in categories.values())
+    print(f"📚 Шаблонов: {total}")
+    
+    for title, normalize, stemming in MODES:
+        SEARCH.NORMALIZE_TEXT = normalize
+        SEARCH.STEMMING = stemming
+        
+        indexer = SearchIndexer()
+        start = time.perf_counter()
+        indexer.build_index(manager)
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        print(f"\n{'=' * 60}\n{title}\n{'=' * 60}")
+        print(f"  Построение: {build_ms:.0f}ms")
+        for name, value in index_size(indexer).items():
+            print(f"  {name:<18}{value:>8}")
+        
+        print("  Найдено по запросу:")
+        for query in QUERIES:
+            found = sum(len(indexer.search_in_category(query, category, manager))
+                        for category in categories)
+            print(f"    {query:<16}{found:>6}")
+
+
+if __name__ == "__main__":
+    main()
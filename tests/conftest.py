@@ -0,0 +1,108 @@
+"""
+Общие фикстуры тестов: данные приложения во временной директории
+"""
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+# PATHS вычисляется при импорте настроек из APPDATA
+os.environ.setdefault('APPDATA', tempfile.mkdtemp(prefix="helper-tests-"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+import models.template_manager as template_manager_module
+from config.settings import PATHS, STORAGE
+from models.normalized_text import get_normalized_cache
+from models.search_indexer import SearchIndexer
+from models.template_manager import TemplateManager
+
+
+# Слоги для слов сгенерированной библиотеки (как в scripts/search_benchmark.py)
+SYLLABLES = [
+    "ша", "бло", "на", "за", "каз", "но", "мер", "кли", "ент", "до", "став",
+    "ка", "оп", "ла", "та", "при", "вет", "от", "сро", "ки", "ра", "бо",
+]
+
+
+class Library:
+    """Сгенерированная библиотека шаблонов с интерфейсом TemplateManager для индекса"""
+    
+    CATEGORY_TYPE = "Клиенты"
+    
+    def __init__(self, size: int = 400, seed: int = 1):
+        rng = random.Random(seed)
+        self.vocabulary = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+                           for _ in range(150)] + ["oplata", "delivery", "order"]
+        self.categories = {"Первая": [], "Вторая": []}
+        for i in range(size):
+            template = {
+                "id": f"t{i}",
+                "title": f"Шаблон {i}: " + " ".join(rng.choices(self.vocabulary, k=2)),
+                "text": " ".join(rng.choices(self.vocabulary, k=rng.randint(3, 12))),
+                "pinned": rng.random() < 0.05,
+            }
+            self.categories["Первая" if i % 3 else "Вторая"].append(template)
+        self.current_category_type = self.CATEGORY_TYPE
+    
+    def get_category_types(self):
+        return [self.CATEGORY_TYPE]
+    
+    def get_categories(self, category_type=None):
+        return list(self.categories)
+    
+    def get_templates(self, category, category_type=None):
+        return self.categories[category]
+
+
+@pytest.fixture
+def library():
+    """Сгенерированная библиотека и построенный по ней индекс"""
+    # Общий кэш нормализации помнит шаблоны по ID - а ID в тестах повторяются
+    get_normalized_cache().clear()
+    library = Library()
+    indexer = SearchIndexer()
+    indexer.build_index(library)
+    return library, indexer
+
+
+@pytest.fixture
+def app_data(tmp_path, monkeypatch):
+    """Пути к файлам приложения во временной директории теста"""
+    monkeypatch.setattr(PATHS, 'APP_DATA_DIR', str(tmp_path))
+    for name, filename in {
+        'TEMPLATES_CLIENTS': "templates_clients.json",
+        'TEMPLATES_COLLEAGUES': "templates_colleagues.json",
+        'INDEX_SNAPSHOT': "search_index.bin",
+        'TEMPLATES_JOURNAL': "templates.journal",
+        'TEMPLATES_DB': "templates.db",
+        'USAGE_COUNTERS': "usage_counters.bin",
+    }.items():
+        monkeypatch.setattr(PATHS, name, str(tmp_path / filename))
+    # Настройки хранилища, которые меняют тесты
+    for name in ('JOURNAL', 'CHECKPOINT_BYTES', 'CHECKPOINT_AGE_S', 'FORMAT'):
+        monkeypatch.setattr(STORAGE, name, getattr(STORAGE, name))
+    return tmp_path
+
+
+@pytest.fixture
+def make_manager(app_data, monkeypatch):
+    """
+    Создать менеджер шаблонов со своим поисковым индексом
+    (построение индекса дожидается); открытые менеджеры закрываются
+    """
+    monkeypatch.setattr(template_manager_module, 'get_search_indexer', SearchIndexer)
+    managers = []
+    
+    def make(cls=TemplateManager):
+        manager = cls()
+        assert manager.search_indexer.wait_until_built(30)
+        managers.append(manager)
+        return manager
+    
+    yield make
+    for manager in managers:
+        manager.writer.close()
+        manager.journal.close()
@@ -0,0 +1,158 @@
+"""
+Тесты потока записи: групповая запись, дописывание при закрытии, повторы
+"""
+import json
+import subprocess
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import utils.background_writer as background_writer
+from config.settings import PATHS, STORAGE
+from utils.background_writer import BackgroundWriter
+
+
+def test_burst_is_written_once():
+    calls = []
+    writer = BackgroundWriter(lambda keys: calls.append(set(keys)) or True)
+    for i in range(50):
+        writer.schedule({i % 3}, 0.2)
+    assert calls == [] and writer.pending
+    
+    assert writer.flush()
+    assert calls == [{0, 1, 2}]
+    assert not writer.pending
+    writer.close()
+
+
+def test_later_requests_do_not_postpone_write():
+    calls = []
+    writer = BackgroundWriter(lambda keys: calls.append(set(keys)) or True)
+    start = time.monotonic()
+    writer.schedule({"a"}, 0.2)
+    while not calls and time.monotonic() - start < 2:
+        writer.schedule({"b"}, 0.2)
+        time.sleep(0.01)
+    assert calls and time.monotonic() - start < 0.5
+    writer.close()
+
+
+def test_close_stops_thread_and_schedule_restarts_it():
+    calls = []
+    writer = BackgroundWriter(lambda keys: calls.append(set(keys)) or True)
+    writer.schedule({"x"}, 60)
+    assert writer.close()
+    assert calls == [{"x"}] and writer._worker is None
+    
+    writer.schedule({"y"}, 60)
+    assert writer.flush() and calls[-1] == {"y"}
+    writer.close()
+
+
+def test_close_after_failure_returns_false_without_retrying():
+    writer = BackgroundWriter(lambda keys: False)
+    writer.schedule({"z"}, 60)
+    start = time.monotonic()
+    assert writer.close() is False
+    assert time.monotonic() - start < 1 and not writer.pending
+
+
+def test_pending_writes_are_flushed_at_exit(tmp_path):
+    output = tmp_path / "written.txt"
+    code = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {str(Path(__file__).resolve().parent.parent)!r})
+        from utils.background_writer import BackgroundWriter
+        writer = BackgroundWriter(lambda keys: open({str(output)!r}, 'w').write(repr(sorted(keys))) or True)
+        writer.schedule({{'q'}}, 60)
+    """)
+    subprocess.run([sys.executable, "-c", code], check=True, timeout=30)
+    assert output.read_text() == "['q']"
+
+
+def test_manager_close_writes_scheduled_save(make_manager):
+    STORAGE.JOURNAL = False
+    manager = make_manager()
+    for i in range(5):
+        manager.add_category(f"Категория {i}")
+    assert manager.writer.pending
+    manager.close()
+    
+    with open(PATHS.TEMPLATES_CLIENTS, encoding='utf-8') as f:
+        saved = json.load(f)
+    assert "Категория 4" in saved and not manager.writer.pending
+
+
+def test_manager_close_checkpoints_journal(make_manager):
+    manager = make_manager()
+    manager.add_category("Журнал")
+    assert manager.journal.size
+    manager.close()
+    
+    assert manager.journal.size == 0
+    with open(PATHS.TEMPLATES_CLIENTS, encoding='utf-8') as f:
+        assert "Журнал" in json.load(f)
+
+
+def test_failing_checkpoint_is_retried_with_backoff(make_manager, monkeypatch):
+    monkeypatch.setattr(background_writer, 'RETRY_DELAY_S', 0.1)
+    STORAGE.CHECKPOINT_BYTES = 1
+    manager = make_manager()
+    
+    attempts = []
+    
+    def failing_write(filename, raw):
+        attempts.append(time.monotonic())
+        raise OSError("диск заполнен")
+    
+    manager._write_file = failing_write
+    manager.add_category("A")
+    # Новые изменения (журнал больше CHECKPOINT_BYTES) не приближают повтор
+    deadline = time.monotonic() + 1.0
+    while time.monotonic() < deadline:
+        manager.add_category(f"B{len(attempts)}")
+        time.sleep(0.02)
+    
+    # Задержки 0.1, 0.2, 0.4 с: за секунду не больше пяти попыток
+    assert 2 <= len(attempts) <= 5, len(attempts)
+    gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+    assert all(gap >= 0.08 for gap in gaps), gaps
+    
+    # После восстановления диска журнал переносится в файл
+    del manager._write_file
+    assert manager.force_save()
+    assert manager.journal.size == 0
+    with open(PATHS.TEMPLATES_CLIENTS, encoding='utf-8') as f:
+        assert "A" in json.load(f)
+
+
+def test_edit_replaces_template_instead_of_changing_it(make_manager):
+    manager = make_manager()
+    manager.add_category("A")
+    manager.add_template("A", "Старое название", "старый текст")
+    template = manager.categories["A"][-1]
+    
+    # Копия, которую снимает поток записи, видит шаблон целиком старым или новым
+    assert manager.edit_template_by_id(template['id'], "Новое название", "новый текст", ["тег"])
+    assert (template['title'], template['text'], template.get('tags')) == ("Старое название", "старый текст", None)
+    updated = manager.get_template_by_id(template['id'])
+    assert updated is manager.categories["A"][-1]
+    assert (updated['title'], updated['text'], updated['tags']) == ("Новое название", "новый текст", ["тег"])
+    assert manager.search_indexer.check_consistency(manager) == []
+
+
+def test_journal_failure_schedules_write_without_waiting(make_manager):
+    manager = make_manager()
+    manager.journal.append = lambda record: False
+    
+    def blocking_flush(timeout=None):
+        raise AssertionError("запись не должна ждать в потоке интерфейса")
+    
+    manager.writer.flush = blocking_flush
+    assert manager.add_category("Без журнала")
+    assert manager.writer.pending
+    del manager.writer.flush
+    assert manager.writer.flush()
+    with open(PATHS.TEMPLATES_CLIENTS, encoding='utf-8') as f:
+        assert "Без журнала" in json.load(f)
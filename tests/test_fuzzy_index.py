@@ -0,0 +1,57 @@
+"""
+Тесты поиска с опечатками: индекс удалений против полного перебора
+"""
+import random
+
+from config.settings import SEARCH
+from models.fuzzy_index import bounded_distance
+
+
+def test_fuzzy_matches_brute_force(library):
+    library, indexer = library
+    rng = random.Random(9)
+    alphabet = "абвгдезклмнопрст"
+    words = []
+    for term in rng.sample([term for term in indexer.terms if len(term) >= 4], 80):
+        chars = list(term)
+        for _ in range(rng.randint(1, 2)):
+            position = rng.randrange(len(chars))
+            edit = rng.choice(("replace", "insert", "delete", "swap"))
+            if edit == "replace":
+                chars[position] = rng.choice(alphabet)
+            elif edit == "insert":
+                chars.insert(position, rng.choice(alphabet))
+            elif edit == "delete" and len(chars) > 1:
+                del chars[position]
+            elif position + 1 < len(chars):
+                chars[position], chars[position + 1] = chars[position + 1], chars[position]
+        words.append("".join(chars))
+    
+    for word in words + ["абв", "ставкаа", "доставкаа"]:
+        if len(word) < SEARCH.FUZZY_MIN_WORD_LENGTH:
+            expected = set()
+        else:
+            max_distance = 2 if len(word) >= SEARCH.FUZZY_DISTANCE_2_WORD_LENGTH else 1
+            expected = {term_id for term_id, term in enumerate(indexer.terms)
+                        if bounded_distance(word, term, max_distance) <= max_distance}
+        assert indexer._match_fuzzy(word) == expected, word
+
+
+def test_bounded_distance_matches_full_table():
+    def distance(a, b):
+        table = [[i + j if not i or not j else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+        for i in range(1, len(a) + 1):
+            for j in range(1, len(b) + 1):
+                table[i][j] = min(table[i - 1][j] + 1, table[i][j - 1] + 1,
+                                  table[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+                if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                    table[i][j] = min(table[i][j], table[i - 2][j - 2] + 1)
+        return table[-1][-1]
+    
+    rng = random.Random(3)
+    for _ in range(2000):
+        a = "".join(rng.choices("абвг", k=rng.randint(0, 7)))
+        b = "".join(rng.choices("абвг", k=rng.randint(0, 7)))
+        for max_distance in (1, 2):
+            expected = distance(a, b)
+            assert bounded_distance(a, b, max_distance) == min(expected, max_distance + 1), (a, b)
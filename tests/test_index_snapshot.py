@@ -0,0 +1,54 @@
+"""
+Тесты снимка индекса: формат без pickle, отбраковка чужих и повреждённых снимков
+"""
+from array import array
+
+from models.index_snapshot import read_snapshot, write_snapshot
+from models.search_indexer import SearchIndexer
+
+
+def test_state_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    state = {
+        "ids": ["a", None, "в"],
+        "nested": {"x": [1, 2], "y": 3},
+        "numbers": array('I', [1, 5, 9]),
+        "postings": {"слово": array('I', [1, 2]), "пусто": array('I'), "ещё": array('I', [7])},
+        "positions": {"a": array('Q', [1 << 40])},
+        "empty": {},
+    }
+    assert write_snapshot(path, {"k": 1}, state)
+    assert read_snapshot(path, {"k": 1}) == state
+
+
+def test_other_key_or_damaged_payload_is_rejected(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    assert write_snapshot(path, "k", {"postings": {"a": array('I', range(100))}})
+    assert read_snapshot(path, "другой") is None
+    
+    with open(path, 'r+b') as f:
+        f.seek(-5, 2)
+        f.write(b"\xff")
+    assert read_snapshot(path, "k") is None
+
+
+def test_indexer_loads_its_snapshot(library, tmp_path):
+    manager, indexer = library
+    path = str(tmp_path / "index.bin")
+    assert indexer.save_snapshot(path, "files")
+    
+    loaded = SearchIndexer()
+    assert loaded.load_snapshot(manager, path, "files")
+    assert loaded.check_consistency(manager) == []
+    assert loaded.doc_terms == indexer.doc_terms
+    assert loaded.doc_lengths == indexer.doc_lengths
+    assert loaded.surface_forms == indexer.surface_forms
+    for query in ("ша", manager.vocabulary[7], "oplata"):
+        assert ([(hit.template['id'], hit.score) for hit in loaded.search_global(query, limit=50)]
+                == [(hit.template['id'], hit.score) for hit in indexer.search_global(query, limit=50)])
+    
+    # Загруженный индекс изменяется инкрементально, как построенный
+    template = {"id": "new", "title": "Снимок", "text": "после загрузки"}
+    manager.categories["Первая"].append(template)
+    loaded.add_template("Первая", template)
+    assert loaded.check_consistency(manager) == []
@@ -0,0 +1,94 @@
+"""
+Тесты журнала изменений: восстановление после аварийного завершения
+"""
+from config.settings import CATEGORIES, PATHS, STORAGE
+
+
+def snapshot_of(manager):
+    """Категории всех типов в сравнимом виде"""
+    return {category_type: {category: [{'pinned': False, 'stats': {}, **template} for template in templates]
+                            for category, templates in categories.items()}
+            for category_type, categories in manager._type_categories.items()}
+
+
+def crash(manager):
+    """Бросить менеджер без закрытия: отложенные записи пропадают"""
+    manager.writer.write_func = lambda keys: True
+
+
+def test_journal_is_replayed_after_crash(make_manager):
+    manager = make_manager()
+    manager.add_category("A")
+    for i in range(10):
+        manager.add_template("A", f"Шаблон {i}", f"текст {i}")
+    manager.close()
+    ids = [t["id"] for t in manager.categories["A"]]
+    
+    STORAGE.CHECKPOINT_AGE_S = 1000
+    STORAGE.CHECKPOINT_BYTES = 10 ** 9
+    manager = make_manager()
+    manager.edit_template_by_id(ids[0], "Изменённый", "новый текст")
+    manager.add_template("A", "Добавленный", "текст добавлен", tags=["x"])
+    new_id = manager.categories["A"][-1]["id"]
+    manager.toggle_pin_template_by_name("A", {"id": ids[1]})
+    manager.delete_template_by_id(ids[2])
+    manager.add_category("B")
+    manager.rename_category("B", "C")
+    manager.set_category_type(CATEGORIES.COLLEAGUES)
+    manager.add_category("Z")
+    manager.add_template("Z", "z", "zz")
+    manager.set_category_type(CATEGORIES.CLIENTS)
+    assert manager.journal.size > 0
+    expected = snapshot_of(manager)
+    
+    crash(manager)
+    # Запись, оборванная на середине
+    with open(PATHS.TEMPLATES_JOURNAL, 'ab') as f:
+        f.write(b'{"op":"put","ty')
+    
+    restored = make_manager()
+    assert snapshot_of(restored) == expected
+    assert restored.get_template_by_id(ids[1])["pinned"]
+    assert restored.search_indexer.check_consistency(restored) == []
+    assert [h.template["id"] for h in restored.search_indexer.search_global("добавлен")] == [new_id]
+    
+    # Повторное применение безопасно: файлы уже содержат часть журнала
+    restored.save_templates(CATEGORIES.CLIENTS)
+    crash(restored)
+    assert snapshot_of(make_manager()) == expected
+
+
+def test_checkpoint_empties_journal(make_manager):
+    STORAGE.CHECKPOINT_AGE_S = 1000
+    STORAGE.CHECKPOINT_BYTES = 10 ** 9
+    manager = make_manager()
+    manager.add_category("E")
+    manager.add_template("E", "e", "ee")
+    assert manager.journal.size > 0
+    
+    assert manager.checkpoint() and manager.journal.size == 0
+    crash(manager)
+    assert "E" in make_manager().categories
+
+
+def test_replayed_move_keeps_usage(make_manager):
+    manager = make_manager()
+    manager.add_category("A")
+    manager.add_category("B")
+    manager.add_template("A", "Шаблон", "текст")
+    template = manager.categories["A"][-1]
+    for _ in range(3):
+        manager.increment_usage("A", template)
+    manager.close()
+    
+    # Запись о шаблоне в другой категории - перенос при применении журнала
+    manager = make_manager()
+    manager.journal.append({'op': 'put', 'type': manager.current_category_type, 'category': "B",
+                            'template': {**template, 'title': "Перенесён"}})
+    crash(manager)
+    
+    restored = make_manager()
+    assert [t["title"] for t in restored.categories["B"]] == ["Перенесён"]
+    assert restored.categories["A"] == []
+    assert restored.get_usage_count(template) == 3
+    assert restored.search_indexer.check_consistency(restored) == []
@@ -0,0 +1,95 @@
+"""
+Тесты доставки вызовов в главный поток: обработка назначается по запросу
+"""
+import threading
+
+from utils.main_thread import MainThreadDispatcher
+
+
+class FakeRoot:
+    """Цикл событий Tk в миниатюре: назначенные вызовы выполняет run()"""
+    
+    def __init__(self):
+        self.scheduled = []
+        self.armed = 0
+    
+    def after_idle(self, callback):
+        self.armed += 1
+        self.scheduled.append(callback)
+        return f"after#{len(self.scheduled)}"
+    
+    def after(self, delay_ms, callback):
+        return self.after_idle(callback)
+    
+    def after_cancel(self, timer):
+        pass
+    
+    def run(self):
+        while self.scheduled:
+            self.scheduled.pop(0)()
+
+
+def test_no_polling_when_queue_is_empty():
+    root = FakeRoot()
+    dispatcher = MainThreadDispatcher(root)
+    root.run()
+    assert root.armed == 1 and root.scheduled == []
+    
+    # Пустая очередь больше не опрашивается
+    root.run()
+    assert root.armed == 1
+
+
+def test_burst_arms_single_pump():
+    root = FakeRoot()
+    dispatcher = MainThreadDispatcher(root)
+    root.run()
+    results = []
+    for i in range(10):
+        dispatcher.post(results.append, i)
+    assert root.armed == 2
+    
+    root.run()
+    assert results == list(range(10)) and root.scheduled == []
+    
+    dispatcher.post(results.append, 10)
+    assert root.armed == 3
+    root.run()
+    assert results[-1] == 10
+
+
+def test_keyed_calls_are_collapsed():
+    root = FakeRoot()
+    dispatcher = MainThreadDispatcher(root)
+    results = []
+    for i in range(5):
+        dispatcher.post(results.append, i, key="progress")
+    dispatcher.post(results.append, "other")
+    root.run()
+    assert results == [4, "other"]
+
+
+def test_posts_from_background_threads():
+    root = FakeRoot()
+    dispatcher = MainThreadDispatcher(root)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: [dispatcher.post(results.append, (i, j)) for j in range(100)])
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    root.run()
+    assert sorted(results) == [(i, j) for i in range(4) for j in range(100)]
+    assert root.armed <= 1 + 4
+
+
+def test_stop_drops_pending_and_new_calls():
+    root = FakeRoot()
+    dispatcher = MainThreadDispatcher(root)
+    results = []
+    dispatcher.post(results.append, 1)
+    dispatcher.stop()
+    dispatcher.post(results.append, 2)
+    root.scheduled.clear()
+    assert results == [] and root.armed == 1
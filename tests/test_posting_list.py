@@ -0,0 +1,35 @@
+"""
+Тесты списков вхождений: пересечения и объединения против операций с set
+"""
+import random
+
+from models.posting_list import intersect_postings, intersect_union, new_postings, union_postings
+
+
+def random_postings(rng, size, count):
+    return new_postings(sorted(rng.sample(range(size), min(count, size))))
+
+
+def test_intersection_matches_sets():
+    rng = random.Random(1)
+    for _ in range(500):
+        size = rng.choice((10, 100, 5000))
+        first = random_postings(rng, size, rng.choice((0, 1, 3, 5, 40, 400)))
+        second = random_postings(rng, size, rng.choice((0, 1, 2, 8, 60, 3000)))
+        result = intersect_postings(first, second)
+        assert list(result) == sorted(set(first) & set(second))
+        assert result.typecode == first.typecode
+
+
+def test_union_and_intersect_union_match_sets():
+    rng = random.Random(2)
+    for _ in range(300):
+        size = rng.choice((50, 2000))
+        lists = [random_postings(rng, size, rng.choice((0, 1, 10, 300))) for _ in range(rng.randint(0, 6))]
+        postings = random_postings(rng, size, rng.choice((1, 30, 500)))
+        expected = set().union(*lists)
+        assert list(union_postings(lists)) == sorted(expected)
+        
+        result, union_size = intersect_union(postings, lists)
+        assert list(result) == sorted(expected & set(postings))
+        assert union_size == len(expected)
@@ -0,0 +1,71 @@
+"""
+Тесты кэша запросов: поиск по мере ввода совпадает с поиском без кэша
+"""
+import random
+
+
+def typed_prefixes(query):
+    return [query[:end] for end in range(1, len(query) + 1)]
+
+
+def ids(templates):
+    return [template['id'] for template in templates]
+
+
+def test_typing_through_cache_matches_cold_search(library):
+    manager, indexer = library
+    rng = random.Random(5)
+    queries = rng.sample(manager.vocabulary, 15) + ["ставка до", "оплата", "oplata", "ощдфеф"]
+    for category in manager.categories:
+        for query in queries:
+            indexer.query_cache.clear()
+            for prefix in typed_prefixes(query):
+                cached = indexer.search_in_category(prefix, category, manager)
+                cached_ranked = indexer.search_ranked(prefix, category, limit=20)
+                indexer.query_cache.clear()
+                assert ids(indexer.search_in_category(prefix, category, manager)) == ids(cached)
+                cold_ranked = indexer.search_ranked(prefix, category, limit=20)
+                assert ([(hit.template['id'], hit.score) for hit in cold_ranked]
+                        == [(hit.template['id'], hit.score) for hit in cached_ranked])
+                # Следующий префикс уточняет результат этого
+                indexer.search_in_category(prefix, category, manager)
+
+
+def test_results_keep_category_order_with_pinned_first(library):
+    manager, indexer = library
+    category = "Первая"
+    templates = manager.categories[category]
+    # Небольшой результат упорядочивается сортировкой, большой - просмотром категории
+    for query in (manager.vocabulary[0], "а"):
+        found = set(ids(indexer.search_in_category(query, category, manager)))
+        expected = ([t['id'] for t in templates if t['id'] in found and t['pinned']]
+                    + [t['id'] for t in templates if t['id'] in found and not t['pinned']])
+        assert ids(indexer.search_in_category(query, category, manager)) == expected
+
+
+def test_changed_category_is_not_refined_from_stale_entry(library):
+    manager, indexer = library
+    category = "Вторая"
+    word = manager.vocabulary[3]
+    indexer.search_in_category(word[:2], category, manager)
+    
+    template = {"id": "new", "title": "Новый", "text": f"{word} {word}"}
+    manager.categories[category].append(template)
+    indexer.add_template(category, template)
+    
+    found = ids(indexer.search_in_category(word, category, manager))
+    indexer.query_cache.clear()
+    assert "new" in found
+    assert found == ids(indexer.search_in_category(word, category, manager))
+
+
+def test_extended_words_are_not_matched_against_dictionary(library, monkeypatch):
+    manager, indexer = library
+    matched = []
+    match_terms = indexer._match_terms
+    monkeypatch.setattr(indexer, '_match_terms', lambda word: matched.append(word) or match_terms(word))
+    
+    for prefix in typed_prefixes("ставка"):
+        indexer.search_in_category(prefix, "Первая", manager)
+    # Термины дописанных слов выбираются из терминов предыдущего префикса
+    assert matched == ["с"]
@@ -0,0 +1,77 @@
+"""
+Тесты операторов запроса: разбор фраз и NEAR/k, поиск по позициям слов
+"""
+import json
+
+import pytest
+
+from config.settings import PATHS
+from models.query_syntax import MAX_NEAR_DISTANCE, parse_query_syntax
+
+
+def test_phrase_is_extracted_and_quotes_removed():
+    parsed = parse_query_syntax('"номер заказа" срок')
+    assert parsed.phrases == ["номер заказа"] and parsed.nears == []
+    assert parsed.text.split() == ["номер", "заказа", "срок"]
+    assert parsed.has_operators
+
+
+def test_near_chain_and_distance_cap():
+    parsed = parse_query_syntax("а NEAR/2 б near/3 в")
+    assert parsed.nears == [("а", "б", 2), ("б", "в", 3)]
+    assert parsed.text.split() == ["а", "б", "в"]
+    
+    assert parse_query_syntax("а NEAR/100 б").nears == [("а", "б", MAX_NEAR_DISTANCE)]
+    assert parse_query_syntax('"а б" NEAR/1 в').nears == [("б", "в", 1)]
+
+
+def test_incomplete_operators_are_plain_words():
+    for query in ('"номер заказ', "заказ NEAR/2", "номер заказа"):
+        parsed = parse_query_syntax(query)
+        assert not parsed.has_operators, query
+    assert parse_query_syntax("заказ NEAR/2").text.split() == ["заказ"]
+
+
+@pytest.fixture
+def orders(make_manager):
+    """Менеджер с шаблонами, где слова "номер" и "заказа" стоят по-разному"""
+    with open(PATHS.TEMPLATES_CLIENTS, 'w', encoding='utf-8') as f:
+        json.dump({"A": [
+            {"title": "Номер заказа", "text": "Уточните, пожалуйста"},
+            {"title": "Заказ", "text": "Номер вашего заказа указан в письме"},
+            {"title": "Оплата", "text": "Счёт на оплату заказа отправлен. Номер счёта в письме"},
+            {"title": "Номер", "text": "заказа нет"},
+        ]}, f, ensure_ascii=False)
+    manager = make_manager()
+    
+    def titles(query):
+        return [t['title'] for t in manager.search_indexer.search_in_category(query, "A", manager)]
+    
+    return manager, titles
+
+
+def test_phrase_search(orders):
+    manager, titles = orders
+    assert titles("номер заказа") == ["Номер заказа", "Заказ", "Оплата", "Номер"]
+    assert titles('"номер заказа"') == ["Номер заказа"]
+    assert titles('"оплату заказа"') == ["Оплата"] and titles('"заказа оплату"') == []
+    # Пока кавычка не закрыта, ищутся обычные слова
+    assert titles('"номер заказа') == titles("номер заказа")
+    assert [h.template['title'] for h in manager.search_indexer.search_global('"номер заказа"')] == ["Номер заказа"]
+
+
+def test_near_search(orders):
+    manager, titles = orders
+    assert titles("номер NEAR/1 заказа") == ["Номер заказа"]
+    assert titles("заказа NEAR/1 номер") == ["Номер заказа"]
+    assert titles("номер NEAR/2 заказа") == ["Номер заказа", "Заказ", "Оплата"]
+    assert titles("счёт NEAR/3 оплату") == ["Оплата"]
+
+
+def test_phrase_search_after_changes(orders):
+    manager, titles = orders
+    manager.add_template("A", "Новый", "номер заказа тут")
+    assert titles('"номер заказа"') == ["Номер заказа", "Новый"]
+    manager.delete_template_by_id(manager.categories["A"][0]["id"])
+    assert titles('"номер заказа"') == ["Новый"]
+    assert manager.search_indexer.check_consistency(manager) == []
@@ -0,0 +1,97 @@
+"""
+Тесты индекса: инкрементальные изменения против построения заново,
+поиск подстрок против полного перебора
+"""
+import random
+
+from models.normalized_text import get_normalized_cache, normalize_field
+from models.search_indexer import WORD_PATTERN
+
+
+def test_incremental_updates_match_rebuild(library):
+    library, indexer = library
+    first, second = library.categories["Первая"], library.categories["Вторая"]
+    
+    new = {"id": "new", "title": "Добавленный шаблон", "text": "oplata delivery", "tags": ["срочно"]}
+    first.append(new)
+    indexer.add_template("Первая", new)
+    
+    old = first[5]
+    edited = {**old, "text": "совсем другой текст", "tags": ["новый"]}
+    first[5] = edited
+    get_normalized_cache().touch(old["id"])
+    indexer.update_template("Первая", old, edited)
+    
+    removed = second.pop(3)
+    indexer.remove_template("Вторая", removed)
+    
+    pinned = first[10]
+    pinned["pinned"] = not pinned["pinned"]
+    indexer.set_pinned(pinned)
+    
+    library.categories["Третья"] = library.categories.pop("Вторая")
+    indexer.rename_category("Вторая", "Третья")
+    assert indexer.check_consistency(library) == []
+    
+    del library.categories["Третья"]
+    indexer.remove_category("Третья")
+    assert indexer.check_consistency(library) == []
+    assert [t["id"] for t in indexer.search_in_category("добавленный", "Первая", library)] == ["new"]
+    assert indexer.search_in_category("другой", "Первая", library) == [edited]
+
+
+def test_manager_operations_keep_index_consistent(make_manager):
+    manager = make_manager()
+    manager.add_category("A")
+    for i in range(20):
+        manager.add_template("A", f"Шаблон {i}", f"текст номер {i} заказа", tags=[f"тег{i % 3}"])
+    ids = [t["id"] for t in manager.categories["A"]]
+    
+    manager.edit_template_by_id(ids[0], "Изменённый", "новый текст")
+    manager.delete_template_by_id(ids[1])
+    manager.toggle_pin_template_by_name("A", {"id": ids[2]})
+    manager.add_category("B")
+    manager.rename_category("B", "C")
+    manager.add_template("C", "Перенесённый", "текст")
+    manager.delete_category("C")
+    
+    assert manager.search_indexer.check_consistency(manager) == []
+
+
+def brute_force(library, category, query):
+    """Шаблоны, в которых каждое слово запроса - подстрока какого-либо слова"""
+    query_words = WORD_PATTERN.findall(normalize_field(query))
+    found = []
+    for template in library.categories[category]:
+        text = normalize_field(" ".join((template["title"], template["text"], *template.get("tags", []))))
+        words = WORD_PATTERN.findall(text)
+        if all(any(part in word for word in words) for part in query_words):
+            found.append(template["id"])
+    return found
+
+
+def test_substring_search_matches_brute_force(library):
+    library, indexer = library
+    rng = random.Random(5)
+    queries = ["шаблон", "1", "42", "oplata", "LIVER"]
+    for _ in range(150):
+        word = rng.choice(library.vocabulary)
+        start = rng.randrange(len(word))
+        queries.append(word[start:start + rng.randint(1, 6)])
+    for _ in range(50):
+        queries.append(" ".join(rng.choice(queries) for _ in range(rng.randint(2, 3))))
+    
+    for query in queries:
+        for category in library.categories:
+            found = [t["id"] for t in indexer.search_in_category(query, category, library)]
+            assert sorted(found) == sorted(brute_force(library, category, query)), query
+
+
+def test_default_settings_find_any_part_of_word(library):
+    library, indexer = library
+    template = {"id": "happy", "title": "Happy clients", "text": "доставками"}
+    library.categories["Первая"].append(template)
+    indexer.add_template("Первая", template)
+    
+    for query in ("happy", "ppy", "py", "доставками", "ками", "clients ставк"):
+        assert template in indexer.search_in_category(query, "Первая", library), query
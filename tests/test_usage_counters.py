@@ -0,0 +1,94 @@
+"""
+Тесты счётчиков использования: сохранение между запусками, рост файла
+"""
+import json
+
+from config.settings import PATHS
+from models.usage_counters import GROW_RECORDS, UsageCounters
+
+
+def test_counters_survive_reopen_and_growth(tmp_path):
+    path = str(tmp_path / "counters.bin")
+    counters = UsageCounters(path)
+    for i in range(3 * GROW_RECORDS):
+        counters.increment(f"k{i}")
+    counters.increment("k7")
+    counters.remove("k5")
+    counters.increment("new")
+    assert counters.get("k5") == 0 and "k5" not in counters
+    counters.close()
+    
+    counters = UsageCounters(path)
+    assert counters.get("k7") == 2 and counters.get("new") == 1 and counters.get("k5") == 0
+    assert len(counters) == 3 * GROW_RECORDS
+    counters.close()
+
+
+def test_long_ids_are_counted_separately(tmp_path):
+    path = str(tmp_path / "counters.bin")
+    counters = UsageCounters(path)
+    counters.increment("x" * 40)
+    counters.increment("x" * 41)
+    counters.increment("x" * 41)
+    counters.close()
+    
+    counters = UsageCounters(path)
+    assert counters.get("x" * 40) == 1 and counters.get("x" * 41) == 2
+    counters.close()
+
+
+def test_corrupt_file_falls_back_to_memory(tmp_path):
+    path = tmp_path / "counters.bin"
+    UsageCounters(str(path)).close()
+    with open(path, 'r+b') as f:
+        f.write(b"XXXX")
+    
+    counters = UsageCounters(str(path))
+    assert counters.increment("a") == 1 and counters.get("a") == 1
+    counters.close()
+
+
+def test_manager_usage_persists_without_template_writes(make_manager):
+    with open(PATHS.TEMPLATES_CLIENTS, 'w', encoding='utf-8') as f:
+        json.dump({"A": [
+            {"id": f"id{i}", "title": f"шаблон {i}", "text": "общий текст", "stats": {"usage_count": i}}
+            for i in range(5)
+        ]}, f, ensure_ascii=False)
+    manager = make_manager()
+    # Прежние счётчики из stats переносятся в файл счётчиков
+    assert manager.get_usage_count({"id": "id3"}) == 3
+    assert 'usage_count' not in manager.get_template_by_id("id3")['stats']
+    # Файл шаблонов перезаписывается без прежних счётчиков
+    assert manager.writer.pending and manager.writer.flush()
+    with open(PATHS.TEMPLATES_CLIENTS, encoding='utf-8') as f:
+        assert all('usage_count' not in template['stats'] for template in json.load(f)["A"])
+    manager.reset_statistics("A")
+    assert manager.get_usage_count({"id": "id3"}) == 0
+    
+    journal_size = manager.journal.size
+    for _ in range(10):
+        manager.increment_usage("A", {"id": "id1"})
+    assert manager.journal.size == journal_size and not manager.writer.pending
+    assert [t['id'] for t in manager.get_top_used_templates("A", 1)] == ["id1"]
+    
+    manager.increment_usage("A", {"id": "id2"})
+    manager.delete_template_by_id("id2")
+    manager.close()
+    
+    reopened = make_manager()
+    assert reopened.get_usage_count({"id": "id1"}) == 10
+    assert reopened.get_usage_count({"id": "id2"}) == 0
+    # Перенесённые счётчики не импортируются повторно
+    assert reopened.get_usage_count({"id": "id3"}) == 0
+
+
+def test_manager_close_releases_counters_file(make_manager):
+    manager = make_manager()
+    manager.add_category("A")
+    manager.add_template("A", "Шаблон", "текст")
+    template = manager.categories["A"][-1]
+    manager.increment_usage("A", template)
+    manager.close()
+    assert manager.usage._file is None
+    
+    assert make_manager().get_usage_count(template) == 1
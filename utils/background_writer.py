@@ -0,0 +1,183 @@
+"""
+Фоновая запись на диск одним потоком с групповой фиксацией
+
+Один долгоживущий поток записи и набор ключей "что нужно записать"
+(например, типы категорий). Запрос только добавляет ключ и срок записи;
+серия изменений до срока записывается одним вызовом (групповая
+фиксация). Срок не откладывается новыми запросами, поэтому задержка
+записи ограничена задержкой первого запроса серии.
+
+После неудачной записи следующая попытка откладывается с растущей
+задержкой (RETRY_DELAY_S, вдвое больше после каждой неудачи подряд, не
+больше MAX_RETRY_DELAY_S); новые запросы не приближают повтор, поэтому
+постоянная ошибка диска не превращается в непрерывную перезапись.
+
+flush() записывает всё ожидающее сразу и ждёт окончания записи, close()
+ещё и останавливает поток. При выходе из интерпретатора ожидающие записи
+всех писателей дописываются (atexit), даже если close() не был вызван.
+"""
+import atexit
+import time
+import weakref
+from threading import Condition, Thread
+from typing import Callable, Hashable, Iterable, Optional, Set
+
+
+# Повтор после неудачной записи (секунды): первая задержка и предел
+RETRY_DELAY_S = 5.0
+MAX_RETRY_DELAY_S = 300.0
+
+# Писатели, ожидающие записи которых дописываются при выходе
+_writers: 'weakref.WeakSet[BackgroundWriter]' = weakref.WeakSet()
+
+
+class BackgroundWriter:
+    """
+    Поток записи: копит ключи и записывает их пачкой.
+    
+    Функция записи выполняется только в потоке записи, поэтому две записи
+    никогда не идут одновременно.
+    """
+    
+    def __init__(self, write_func: Callable[[Set[Hashable]], bool], name: str = "BackgroundWriter"):
+        """
+        Args:
+            write_func: Функция записи write(keys) -> True при успехе;
+                при неудаче ключи будут записаны повторно
+            name: Имя потока (для отладки)
+        """
+        self.write_func = write_func
+        self.name = name
+        
+        self._condition = Condition()
+        self._pending: Set[Hashable] = set()
+        self._deadline: Optional[float] = None
+        self._requested = 0         # Номер последнего запроса
+        self._completed = 0         # Запросы до этого номера уже записаны (или не удались)
+        self._last_ok = True
+        self._failures = 0          # Неудачных записей подряд
+        self._retry_at: Optional[float] = None
+        self._closed = False
+        self._worker: Optional[Thread] = None
+        _writers.add(self)
+    
+    @property
+    def pending(self) -> bool:
+        """Есть ли незаписанные запросы (ожидающие, записываемые или повторяемые)"""
+        return self._completed < self._requested or bool(self._pending)
+    
+    def schedule(self, keys: Iterable[Hashable], delay: float = 0.0) -> None:
+        """
+        Запросить запись ключей не позже чем через delay секунд.
+        
+        Args:
+            keys: Что записать (передаётся в функцию записи)
+            delay: Сколько можно ждать, чтобы собрать серию изменений
+        """
+        with self._condition:
+            self._pending.update(keys)
+            deadline = time.monotonic() + max(0.0, delay)
+            if self._retry_at is not None:
+                deadline = max(deadline, self._retry_at)
+            if self._deadline is None or deadline < self._deadline:
+                self._deadline = deadline
+            self._requested += 1
+            self._ensure_worker()
+            self._condition.notify_all()
+    
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Записать всё ожидающее сейчас и дождаться окончания записи.
+        
+        Returns:
+            bool: True если запись успешна (или записывать было нечего)
+        """
+        with self._condition:
+            target = self._requested
+            if self._completed >= target:
+                return self._last_ok
+            self._deadline = time.monotonic()
+            self._ensure_worker()
+            self._condition.notify_all()
+            if not self._condition.wait_for(lambda: self._completed >= target, timeout):
+                return False
+            return self._last_ok
+    
+    def close(self, timeout: float = None) -> bool:
+        """
+        Дописать ожидающее и остановить поток записи
+        (следующий schedule запустит поток снова).
+        
+        Returns:
+            bool: True если всё записано
+        """
+        ok = self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        return ok and self._last_ok
+    
+    def _ensure_worker(self) -> None:
+        """Запустить поток записи (под _condition)"""
+        if self._worker is None or not self._worker.is_alive():
+            self._closed = False
+            self._worker = Thread(target=self._worker_loop, name=self.name, daemon=True)
+            self._worker.start()
+    
+    def _worker_loop(self) -> None:
+        """Поток записи: ждёт срока и записывает накопленные ключи"""
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        if not self._pending:
+                            self._worker = None
+                            return
+                        break
+                    if self._pending and self._deadline is not None:
+                        remaining = self._deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                keys, self._pending = self._pending, set()
+                self._deadline = None
+                target = self._requested
+            
+            try:
+                ok = bool(self.write_func(keys))
+            except Exception as e:
+                print(f"[ERROR] Ошибка фоновой записи: {e}")
+                ok = False
+            
+            with self._condition:
+                if not ok:
+                    if self._closed:
+                        # При остановке не повторяем: вернём False из close()
+                        self._pending.clear()
+                        target = self._requested
+                    else:
+                        # Повтор позже; ожидающие flush получат False
+                        self._failures += 1
+                        delay = min(RETRY_DELAY_S * 2 ** (self._failures - 1), MAX_RETRY_DELAY_S)
+                        self._retry_at = time.monotonic() + delay
+                        self._pending.update(keys)
+                        self._deadline = self._retry_at
+                else:
+                    self._failures = 0
+                    self._retry_at = None
+                self._last_ok = ok
+                self._completed = max(self._completed, target)
+                self._condition.notify_all()
+
+
+@atexit.register
+def _flush_all_writers() -> None:
+    """При выходе дописать ожидающие записи всех писателей"""
+    for writer in list(_writers):
+        if writer.pending:
+            writer.close()
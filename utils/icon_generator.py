@@ -8,6 +8,7 @@ from PIL import Image, ImageDraw, ImageFont
 import customtkinter as ctk
 import sys
 import io
+import threading
 import requests
 from urllib.parse import quote
 import emoji as emoji_lib
@@ -247,8 +248,17 @@ class EmojiIconButton:
         return None
     
     @staticmethod
-    def preload_common_icons():
-        """Предзагрузка часто используемых иконок для ускорения UI"""
+    def preload_common_icons(dispatcher=None):
+        """
+        Предзагрузка часто используемых иконок для ускорения UI
+        
+        Картинки (загрузка Twemoji и отрисовка) готовятся в фоновом потоке,
+        а CTkImage создаются в главном потоке через dispatcher.
+        
+        Args:
+            dispatcher: MainThreadDispatcher; без него всё делается сразу
+                в текущем потоке
+        """
         common_icons = [
             ('📋', 16),  # Copy
             ('📝', 16),  # Edit
@@ -261,12 +271,24 @@ class EmojiIconButton:
             ('📊', 20),  # Statistics
         ]
         
-        for emoji, size in common_icons:
-            # Загружаем иконки в фоне
-            try:
-                EmojiIconButton.get_ctk_image(emoji, size)
-            except:
-                pass
+        if dispatcher is None:
+            for emoji, size in common_icons:
+                try:
+                    EmojiIconButton.get_ctk_image(emoji, size)
+                except:
+                    pass
+            return
+        
+        def load_in_background():
+            for emoji, size in common_icons:
+                try:
+                    # Картинки попадают в _icon_cache, CTkImage из них - в главном потоке
+                    EmojiIconButton.create_emoji_image(emoji, size)
+                    dispatcher.post(EmojiIconButton.get_ctk_image, emoji, size)
+                except:
+                    pass
+        
+        threading.Thread(target=load_in_background, daemon=True).start()
 
 
 def create_emoji_button_text(emoji: str, text: str) -> str:
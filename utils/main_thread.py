@@ -0,0 +1,126 @@
+"""
+Доставка вызовов из фоновых потоков в главный поток Tk
+
+Tk можно трогать только из главного потока. Фоновые потоки кладут
+вызовы в очередь (post), а главный поток забирает их пачками. Опроса
+нет: обработка очереди назначается (after_idle) только когда вызов
+попадает в пустую очередь, и не назначается снова, пока очередь не
+опустеет. Из фонового потока after_idle передаётся в главный поток
+самим Tcl (собранным с поддержкой потоков, как в сборках Python).
+
+Вызовы с одинаковым ключом схлопываются: из серии обновлений (прогресс
+загрузки, результаты поиска по мере ввода) выполняется только последнее,
+на месте первого в очереди.
+"""
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from collections import deque
+from threading import Lock
+import time
+
+
+# Сколько времени за одну обработку можно выполнять вызовы (остальное -
+# в следующий раз, чтобы длинная пачка не подвешивала интерфейс)
+BATCH_TIME_BUDGET_MS = 8
+
+
+class MainThreadDispatcher:
+    """
+    Очередь вызовов для главного потока Tk.
+    
+    Создаётся в главном потоке; post можно вызывать из любого потока.
+    
+    Attributes:
+        root: Корневое окно, в цикле которого выполняются вызовы
+    """
+    
+    def __init__(self, root):
+        self.root = root
+        self._lock = Lock()
+        self._queue: deque = deque()
+        self._keyed: Dict[Hashable, List[Any]] = {}
+        self._stopped = False
+        # Назначена ли обработка очереди (меняется под _lock); первая
+        # назначается сразу - для вызовов до запуска цикла событий
+        self._scheduled = True
+        self._timer = self.root.after_idle(self._pump)
+    
+    def post(self, callback: Callable, *args, key: Hashable = None) -> None:
+        """
+        Выполнить callback(*args) в главном потоке.
+        
+        Args:
+            callback: Вызываемая функция
+            *args: Её аргументы
+            key: Ключ схлопывания: ещё не выполненный вызов с тем же ключом
+                заменяется новым
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            if key is not None:
+                entry = self._keyed.get(key)
+                if entry is not None:
+                    entry[0], entry[1] = callback, args
+                    return
+                entry = [callback, args, key]
+                self._keyed[key] = entry
+            else:
+                entry = [callback, args, None]
+            self._queue.append(entry)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._schedule()
+    
+    def _schedule(self) -> None:
+        """Назначить обработку очереди в главном потоке"""
+        try:
+            self._timer = self.root.after_idle(self._pump)
+        except RuntimeError as e:
+            # Цикл событий не запущен: следующий post попробует снова
+            print(f"[ERROR] Не удалось передать вызов в главный поток: {e}")
+            with self._lock:
+                self._scheduled = False
+    
+    def _pump(self) -> None:
+        """Выполнить накопившиеся вызовы (в пределах бюджета времени)"""
+        self._timer = None
+        deadline = time.perf_counter() + BATCH_TIME_BUDGET_MS / 1000
+        while True:
+            entry = self._pop()
+            if entry is None:
+                return
+            callback, args, _ = entry
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"[ERROR] Ошибка в вызове из фонового потока: {e}")
+            if time.perf_counter() >= deadline:
+                break
+        # Бюджет исчерпан: остаток - после обработки событий окна
+        self._timer = self.root.after(0, self._pump)
+    
+    def _pop(self) -> Optional[List[Any]]:
+        """Следующий вызов из очереди или None (очередь пуста - обработка снята)"""
+        with self._lock:
+            if not self._queue:
+                self._scheduled = False
+                return None
+            entry = self._queue.popleft()
+            if entry[2] is not None:
+                del self._keyed[entry[2]]
+            return entry
+    
+    def stop(self) -> None:
+        """Остановить обработку (невыполненные и новые вызовы отбрасываются)"""
+        with self._lock:
+            self._stopped = True
+        if self._timer is not None:
+            try:
+                self.root.after_cancel(self._timer)
+            except Exception:
+                pass
+            self._timer = None
+        with self._lock:
+            self._queue.clear()
+            self._keyed.clear()
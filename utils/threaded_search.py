@@ -1,85 +1,174 @@
 """
 Многопоточный поиск для UI без зависания
+
+Один долгоживущий рабочий поток и одна ячейка "последнего запроса":
+новый запрос заменяет ещё не начатый и отменяет выполняемый, поэтому при
+быстром наборе ищется только последний введённый текст. UI-поток никогда
+не ждёт рабочий поток - start_search только кладёт запрос в ячейку.
+
+Каждый запрос получает номер поколения. Функция поиска получает
+should_stop() и проверяет его между шагами поиска (кооперативная отмена);
+результат устаревшего поколения отбрасывается и не доставляется.
+
+Результат передаётся в главный поток через MainThreadDispatcher и ещё раз
+сверяется с поколением перед вызовом on_results_callback.
+
+Функция поиска может вернуть не список, а итератор частей результата:
+первая часть уходит в on_results_callback сразу, как только готова,
+остальные - по одной в on_more_results_callback.
 """
-from typing import Callable, List
-from threading import Thread
-from queue import Queue
-import time
+from typing import Callable, List, NamedTuple, Optional
+from threading import Condition, Thread
+
+from utils.main_thread import MainThreadDispatcher
+
+
+class SearchRequest(NamedTuple):
+    """Запрос в ячейке рабочего потока"""
+    generation: int                 # Номер поколения (растёт с каждым запросом)
+    query: str                      # Поисковый запрос
+    category: str                   # Категория для поиска
+    search_func: Callable           # search(query, category, should_stop) -> список или части
 
 
 class ThreadedSearcher:
     """
-    Поиск в отдельном потоке с передачей результатов через Queue.
+    Поиск в отдельном потоке: последний запрос побеждает.
     
-    UI отправляет запрос -> поиск выполняется в фоне -> результаты
-    поступают в очередь -> UI обновляется без задержек.
+    UI отправляет запрос -> рабочий поток берёт самый свежий -> результат
+    актуального запроса доставляется в главный поток -> UI обновляется
+    без задержек и без опроса.
     """
     
-    def __init__(self, on_results_callback: Callable[[List[dict]], None]):
+    def __init__(self, on_results_callback: Callable[[List[dict]], None],
+                 dispatcher: MainThreadDispatcher = None,
+                 on_more_results_callback: Callable[[List[dict]], None] = None):
         """
         Args:
             on_results_callback: Функция вызывается с результатами поиска
+                (или с их первой частью)
+            dispatcher: Доставка в главный поток Tk; без него callback
+                вызывается прямо из рабочего потока
+            on_more_results_callback: Функция вызывается с каждой следующей
+                частью результата (если поиск возвращает части)
         """
         self.on_results_callback = on_results_callback
-        self.results_queue: Queue = Queue()
-        self.search_thread = None
-        self.is_running = False
+        self.on_more_results_callback = on_more_results_callback
+        self.dispatcher = dispatcher
         self.current_query = None
         self.current_category = None
+        
+        self._condition = Condition()
+        self._pending: Optional[SearchRequest] = None
+        self._generation = 0
+        self._closed = False
+        self._worker: Optional[Thread] = None
+    
+    @property
+    def generation(self) -> int:
+        """Поколение последнего запроса"""
+        return self._generation
     
-    def start_search(self, query: str, category: str, search_func: Callable) -> None:
+    def start_search(self, query: str, category: str, search_func: Callable) -> int:
         """
-        Запустить поиск в отдельном потоке.
+        Поставить запрос вместо предыдущего (не блокирует вызывающий поток).
         
         Args:
             query: Поисковый запрос
             category: Категория для поиска
-            search_func: Функция search(query, category) -> List[dict]
-        """
-        # Отменяем предыдущий поиск
-        self.is_running = False
-        if self.search_thread and self.search_thread.is_alive():
-            self.search_thread.join(timeout=0.1)
-        
-        # Запускаем новый поиск
-        self.current_query = query
-        self.current_category = category
-        self.is_running = True
+            search_func: Функция search(query, category, should_stop), возвращающая
+                список результатов или итератор его частей;
+                should_stop() возвращает True, когда запрос устарел
         
-        self.search_thread = Thread(
-            target=self._search_worker,
-            args=(query, category, search_func),
-            daemon=True
-        )
-        self.search_thread.start()
+        Returns:
+            int: Поколение запроса
+        """
+        with self._condition:
+            self._generation += 1
+            self.current_query = query
+            self.current_category = category
+            self._pending = SearchRequest(self._generation, query, category, search_func)
+            self._ensure_worker()
+            self._condition.notify()
+            return self._generation
     
-    def _search_worker(self, query: str, category: str, search_func: Callable) -> None:
-        """Рабочая функция потока"""
-        try:
-            # Выполняем поиск
-            results = search_func(query, category)
+    def is_current(self, generation: int) -> bool:
+        """Актуален ли запрос этого поколения (не заменён и не остановлен)"""
+        return generation == self._generation and not self._closed
+    
+    def _ensure_worker(self) -> None:
+        """Запустить рабочий поток при первом запросе (под _condition)"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = Thread(target=self._worker_loop, name="ThreadedSearcher", daemon=True)
+            self._worker.start()
+    
+    def _worker_loop(self) -> None:
+        """Рабочий поток: ждёт запрос в ячейке и выполняет самый свежий"""
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                request, self._pending = self._pending, None
             
-            # Отправляем результаты в очередь (если поиск не был отменен)
-            if self.is_running and self.current_query == query:
-                self.results_queue.put(results)
+            self._run(request)
+    
+    def _run(self, request: SearchRequest) -> None:
+        """Выполнить запрос и доставить результат, если он ещё актуален"""
+        def should_stop() -> bool:
+            return not self.is_current(request.generation)
+        
+        delivered = False
+        try:
+            results = request.search_func(request.query, request.category, should_stop)
+            if isinstance(results, list):
+                results = iter((results,))
+            for chunk in results:
+                if should_stop():
+                    return  # Пока искали, пришёл новый запрос
+                self._post(request.generation, chunk, first=not delivered)
+                delivered = True
         except Exception as e:
+            if should_stop():
+                return  # Отменён (в том числе через исключение отмены)
             print(f"[ERROR] Ошибка при поиске: {e}")
-            if self.is_running:
-                self.results_queue.put([])  # Пустой результат при ошибке
-    
-    def get_results(self) -> List[dict] | None:
-        """
-        Получить результаты поиска, если они готовы.
-        Не блокирует UI (non-blocking).
         
-        Returns:
-            Список результатов или None если ещё не готовы
-        """
+        if not delivered and not should_stop():
+            self._post(request.generation, [], first=True)  # Пустой результат при ошибке
+    
+    def _post(self, generation: int, results: List[dict], first: bool) -> None:
+        """Передать результат (или его часть) в главный поток"""
+        if self.dispatcher is None:
+            self._deliver(generation, results, first)
+        elif first:
+            # Ключ - сам поисковик: недоставленный результат заменяется новым
+            self.dispatcher.post(self._deliver, generation, results, first, key=self)
+        else:
+            # Следующие части не схлопываются: каждая дописывает список
+            self.dispatcher.post(self._deliver, generation, results, first)
+    
+    def _deliver(self, generation: int, results: List[dict], first: bool = True) -> None:
+        """Передать результат, если за время доставки не пришёл новый запрос"""
+        if not self.is_current(generation):
+            return
+        callback = self.on_results_callback if first else self.on_more_results_callback
+        if callback is None:
+            return
         try:
-            return self.results_queue.get_nowait()
-        except:
-            return None
+            callback(results)
+        except Exception as e:
+            print(f"[ERROR] Ошибка при обработке результатов поиска: {e}")
     
     def stop_search(self) -> None:
-        """Остановить текущий поиск"""
-        self.is_running = False
+        """Остановить текущий поиск и отменить ожидающий запрос"""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+    
+    def shutdown(self) -> None:
+        """Остановить рабочий поток (поиск в процессе будет отменён)"""
+        with self._condition:
+            self._closed = True
+            self._pending = None
+            self._condition.notify()
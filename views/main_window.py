@@ -5,18 +5,24 @@ import customtkinter as ctk
 from typing import TYPE_CHECKING
 import threading
 import json
+from collections import deque
+from functools import partial
 from pathlib import Path
 import sys
 
 if TYPE_CHECKING:
     from models.template_manager import TemplateManager
 
-from views.template_widgets import CategoryHeader, TemplateWidget
+from views.template_widgets import CategoryHeader, TagFilterBar, TemplateWidget
 from utils.clipboard import copy_to_clipboard
 from utils.updater import AppUpdater
 from utils.icon_generator import EmojiIconButton
-from models.search_indexer import get_search_indexer
-from config.constants import COLORS, FONTS, SIZES
+from utils.main_thread import MainThreadDispatcher
+from utils.threaded_search import ThreadedSearcher
+from models.normalized_text import get_normalized_cache, normalize_field
+from models.query_syntax import parse_query_syntax
+from models.search_indexer import SearchHit, get_search_indexer
+from config.constants import COLORS, FONTS, SIZES, UI_CONFIG
 from config.settings import MESSAGES, EMOJI, PATHS, APP_NAME, APP_AUTHOR
 
 
@@ -35,10 +41,21 @@ class MainWindow:
         self.template_manager = template_manager
         self.is_always_on_top = False
         self.search_query = ""  # Переменная для хранения текста поиска
+        self.selected_tags = set()  # Теги, которыми отфильтрованы шаблоны
+        self._tags_scope = None  # (тип, категория), в которых выбраны теги
         
         # Инициализируем поисковый индекс
         self.search_indexer = get_search_indexer()
         
+        # Доставка результатов фоновых потоков в главный поток
+        self.dispatcher = MainThreadDispatcher(root)
+        
+        # Поиск по мере ввода - в рабочем потоке, результаты через dispatcher
+        # (большие результаты приходят частями и дорисовываются)
+        self.searcher = ThreadedSearcher(self._on_search_results, self.dispatcher,
+                                         self._on_more_search_results)
+        self.search_indexer.when_built(lambda: self.dispatcher.post(self._on_index_built))
+        
         # Флаги для предотвращения множественного открытия одних и тех же диалогов
         self.add_template_dialog_open = False
         self.edit_template_dialog_open = False
@@ -53,11 +70,16 @@ class MainWindow:
         self._last_search_query = None
         self._search_update_timer = None  # Таймер для debounce поиска
         
+        # Постепенная отрисовка карточек: очередь (шаблон, где лежит) и таймер
+        self._results_frame = None
+        self._render_queue = deque()
+        self._render_timer = None
+        
         self.setup_window()
         self.setup_ui()
         
         # Предзагрузка иконок в фоне для ускорения UI
-        self.root.after(100, EmojiIconButton.preload_common_icons)
+        EmojiIconButton.preload_common_icons(self.dispatcher)
         
         self.update_templates_display()
         
@@ -223,6 +245,9 @@ class MainWindow:
         self.templates_frame = ctk.CTkFrame(main_frame, fg_color=COLORS.BG_DARK)
         self.templates_frame.pack(fill=ctk.BOTH, expand=True, padx=SIZES.PADDING_MEDIUM, pady=SIZES.PADDING_MEDIUM)
         
+        # Фильтр по тегам (над шаблонами, появляется, когда есть теги)
+        self.tag_bar = TagFilterBar(main_frame, self.toggle_tag_filter, before=self.templates_frame)
+        
         # Статус-бар в правом нижнем углу
         self.setup_status_bar(main_frame)
         
@@ -291,7 +316,20 @@ class MainWindow:
             corner_radius=SIZES.CORNER_RADIUS_SMALL,
             height=32
         )
-        search_entry.pack(side=ctk.LEFT, fill=ctk.X, expand=True, padx=(0, SIZES.PADDING_LARGE), pady=SIZES.PADDING_MEDIUM)
+        search_entry.pack(side=ctk.LEFT, fill=ctk.X, expand=True, padx=(0, SIZES.PADDING_MEDIUM), pady=SIZES.PADDING_MEDIUM)
+        
+        # Глобальный поиск: по всем категориям клиентов и коллег
+        self.search_everywhere_var = ctk.BooleanVar(value=False)
+        search_everywhere = ctk.CTkSwitch(
+            search_frame,
+            text="Везде",
+            variable=self.search_everywhere_var,
+            command=self.force_update_templates_display,
+            font=FONTS.LABEL,
+            text_color=COLORS.TEXT_SECONDARY,
+            progress_color=COLORS.ACCENT_BLUE
+        )
+        search_everywhere.pack(side=ctk.LEFT, padx=(0, SIZES.PADDING_LARGE), pady=SIZES.PADDING_MEDIUM)
     
     def filter_templates_by_search(self, search_text: str) -> None:
         """Фильтрация шаблонов по тексту поиска с debounce"""
@@ -323,14 +361,15 @@ class MainWindow:
         
         # Получаем все шаблоны и сортируем по количеству копирований
         all_templates = self.template_manager.get_templates(current_category)
+        usage_counts = {t['id']: self.template_manager.get_usage_count(t) for t in all_templates}
         sorted_templates = sorted(
             all_templates, 
-            key=lambda t: t.get('stats', {}).get('usage_count', 0), 
+            key=lambda t: usage_counts[t['id']], 
             reverse=True
         )
         
         # Фильтруем только те, у которых есть статистика
-        templates_with_stats = [t for t in sorted_templates if t.get('stats', {}).get('usage_count', 0) > 0]
+        templates_with_stats = [t for t in sorted_templates if usage_counts[t['id']] > 0]
         
         if not templates_with_stats:
             self.show_status_message("Статистика ещё недоступна")
@@ -388,7 +427,7 @@ class MainWindow:
         
         # Список всех шаблонов со статистикой
         for idx, template in enumerate(templates_with_stats, 1):
-            usage_count = template.get('stats', {}).get('usage_count', 0)
+            usage_count = usage_counts[template['id']]
             
             item_frame = ctk.CTkFrame(scrollable_frame, fg_color="transparent")
             item_frame.pack(fill=ctk.X, pady=8)
@@ -797,8 +836,6 @@ class MainWindow:
         
         if category_name:
             if self.template_manager.add_category(category_name):
-                # ОПТИМИЗАЦИЯ: Обновляем индекс поиска
-                self.search_indexer.build_index(self.template_manager)
                 self.category_header.update_categories(self.template_manager.get_categories())
                 self.category_header.set_selected_category(category_name)
                 self.force_update_templates_display()
@@ -1011,6 +1048,20 @@ class MainWindow:
         title_entry.focus()
         self.setup_context_menu_for_widget(title_entry)
         
+        # Поле для тегов шаблона
+        ctk.CTkLabel(main_frame, text="Теги (через запятую):", text_color="white").pack(anchor="w", pady=(0, 3))
+        
+        tags_entry = ctk.CTkEntry(
+            main_frame,
+            font=("Segoe UI", 12),
+            text_color="white",
+            fg_color="#2b2b2b",
+            border_color="#404040",
+            border_width=1
+        )
+        tags_entry.pack(fill=ctk.X, pady=(0, 15))
+        self.setup_context_menu_for_widget(tags_entry)
+        
         # Поле для текста шаблона
         ctk.CTkLabel(main_frame, text="Текст шаблона:", text_color="white").pack(anchor="w", pady=(10, 3))
         
@@ -1034,6 +1085,7 @@ class MainWindow:
         def on_save():
             template_title = title_entry.get("1.0", ctk.END).strip()
             template_text = text_widget.get("1.0", ctk.END).strip()
+            template_tags = self.template_manager.clean_tags(tags_entry.get())
             
             if not template_title:
                 self.show_status_message("✗ Введите название")
@@ -1043,9 +1095,8 @@ class MainWindow:
                 self.show_status_message("✗ Введите текст")
                 return
             
-            if self.template_manager.add_template(current_category, template_title, template_text):
-                # ОПТИМИЗАЦИЯ: Обновляем индекс поиска
-                self.search_indexer.build_index(self.template_manager)
+            if self.template_manager.add_template(current_category, template_title, template_text,
+                                                  template_tags):
                 self.show_status_message("✓ Шаблон добавлен")
                 self.force_update_templates_display()
                 self.add_template_dialog_open = False
@@ -1135,16 +1186,34 @@ class MainWindow:
         return result[0] if result else None
     
     def update_templates_display(self) -> None:
-        """Обновление отображения шаблонов"""
+        """Обновление отображения шаблонов (поиск выполняется в фоне)"""
         current_category = self.category_header.get_selected_category()
         
+        # Теги выбираются в категории: при смене категории или типа фильтр сбрасывается
+        scope = (self.template_manager.current_category_type, current_category)
+        if scope != self._tags_scope:
+            self.selected_tags.clear()
+            self._tags_scope = scope
+        
         # Сохраняем текущее состояние
         self._last_displayed_category = current_category
         self._last_search_query = self.search_query
         
-        # Очистка текущего отображения
-        for widget in self.templates_frame.winfo_children():
-            widget.destroy()
+        search_everywhere = self.search_everywhere_var.get()
+        # Глобальный поиск идёт только по запросу, в категории - и по одним тегам
+        filtering = self.search_query or (self.selected_tags and not search_everywhere)
+        if filtering and (current_category or search_everywhere):
+            # Текущий список остаётся на экране, пока не придут результаты
+            category = None if search_everywhere else current_category
+            search_func = partial(self._search_templates, self.template_manager.current_category_type,
+                                  tuple(self.selected_tags))
+            self.searcher.start_search(self.search_query, category, search_func)
+            return
+        
+        # Результаты начатого поиска больше не нужны
+        self.searcher.stop_search()
+        self._clear_templates_display()
+        self._update_tag_bar(current_category if not search_everywhere else None)
         
         if not current_category:
             # Плейсхолдер при отсутствии выбранной категории
@@ -1159,13 +1228,153 @@ class MainWindow:
         
         # Получаем ВСЕ шаблоны из кэша
         templates = self.template_manager.get_templates_cached(current_category)
-        
-        # Фильтруем если есть поисковый запрос
-        if self.search_query:
-            templates = [t for t in templates 
-                        if self.search_query in t.get('title', '').lower() 
-                        or self.search_query in t.get('text', '').lower()]
-        
+        self.display_templates(templates, current_category)
+    
+    def _clear_templates_display(self) -> None:
+        """Очистка текущего отображения (и недорисованных карточек)"""
+        if self._render_timer is not None:
+            self.root.after_cancel(self._render_timer)
+            self._render_timer = None
+        self._render_queue.clear()
+        self._results_frame = None
+        for widget in self.templates_frame.winfo_children():
+            widget.destroy()
+    
+    def _search_templates(self, category_type: str, tags: tuple, query: str, category: str,
+                          should_stop) -> list:
+        """
+        Поиск для ThreadedSearcher (выполняется в рабочем потоке).
+        
+        Ищет через поисковый индекс; пока индекс строится - средствами
+        хранилища (FTS в SQLite) или простым просмотром шаблонов. Число
+        результатов по тегам считается здесь же и передаётся на панель
+        тегов отдельно от результатов.
+        
+        Args:
+            category_type: Тип категорий на момент запроса
+            tags: Выбранные теги (шаблон должен иметь все)
+            query: Поисковый запрос
+            category: Категория или None - поиск везде
+            should_stop: Проверка, что запрос устарел
+        
+        Returns:
+            Список SearchHit (с позициями совпадений) или итератор его частей
+        """
+        indexer = self.search_indexer
+        if category is None:
+            if indexer.is_built:
+                hits = indexer.search_global(query, should_stop=should_stop, tags=tags)
+                self._post_tag_counts(indexer.tag_counts(query, tags=tags, should_stop=should_stop),
+                                      should_stop)
+                return hits
+            found = self.template_manager.search_templates(query, tags=tags, should_stop=should_stop)
+            if found is not None:
+                return [SearchHit(template, 0.0, type_name, category_name)
+                        for type_name, category_name, template in found]
+            return [
+                SearchHit(template, 0.0, type_name, category_name)
+                for type_name in self.template_manager.get_category_types()
+                for category_name in self.template_manager.get_categories(type_name)
+                for template in self._scan_templates(
+                    query, self.template_manager.get_templates(category_name, type_name), should_stop,
+                    tags)
+            ]
+        
+        if indexer.is_built:
+            # Части: первая - сразу, остальные дорисовываются по мере готовности
+            chunks = indexer.iter_category_results(query, category, self.template_manager,
+                                                   category_type=category_type, should_stop=should_stop,
+                                                   with_spans=True, tags=tags)
+            # Запрос уже выполнен и лежит в кэше: счётчики - пересечения списков
+            self._post_tag_counts(indexer.tag_counts(query, category, category_type, tags=tags,
+                                                     should_stop=should_stop),
+                                  should_stop)
+            return chunks
+        found = self.template_manager.search_templates(query, category, category_type, tags, should_stop)
+        if found is not None:
+            return [SearchHit(template, 0.0, category_type, category) for _, _, template in found]
+        return [
+            SearchHit(template, 0.0, category_type, category)
+            for template in self._scan_templates(
+                query, self.template_manager.get_templates(category, category_type), should_stop, tags)
+        ]
+    
+    @staticmethod
+    def _scan_templates(query: str, templates: list, should_stop, tags: tuple = ()) -> list:
+        """
+        Шаблоны, где каждое слово запроса есть в названии или тексте (без индекса;
+        фразы и NEAR здесь проверяются как обычные слова)
+        """
+        # Поля шаблонов уже нормализованы (общий кэш) - нормализуем только запрос
+        normalized = get_normalized_cache()
+        words = normalize_field(parse_query_syntax(query).text).split()
+        wanted_tags = {normalize_field(tag) for tag in tags}
+        found = []
+        for template in templates:
+            if should_stop():
+                return []
+            fields = normalized.get(template)
+            if not wanted_tags.issubset(fields.tags):
+                continue
+            haystack = f"{fields.title} {fields.text}"
+            if all(word in haystack for word in words):
+                found.append(template)
+        return found
+    
+    def _post_tag_counts(self, counts: dict, should_stop) -> None:
+        """Передать счётчики тегов на панель (из рабочего потока поиска)"""
+        self.dispatcher.post(self._on_tag_counts, counts, should_stop, key=self.tag_bar)
+    
+    def _on_tag_counts(self, counts: dict, should_stop) -> None:
+        """Показать счётчики тегов, если запрос ещё актуален (в главном потоке)"""
+        if not should_stop():
+            self.tag_bar.update_tags(counts, self.selected_tags)
+    
+    def _update_tag_bar(self, category: str = None) -> None:
+        """Счётчики тегов для шаблонов категории без поиска (или скрыть панель)"""
+        counts = {}
+        if category and self.search_indexer.is_built:
+            counts = self.search_indexer.tag_counts(
+                "", category, self.template_manager.current_category_type)
+        self.tag_bar.update_tags(counts, self.selected_tags)
+    
+    def toggle_tag_filter(self, tag: str) -> None:
+        """Выбрать тег для фильтра или снять его"""
+        if tag in self.selected_tags:
+            self.selected_tags.discard(tag)
+        else:
+            self.selected_tags.add(tag)
+        self.force_update_templates_display()
+    
+    def _on_search_results(self, hits: list) -> None:
+        """Показать результаты фонового поиска (в главном потоке)"""
+        self._clear_templates_display()
+        category = self.searcher.current_category
+        if category is None:
+            self.display_global_search_results(hits)
+        else:
+            self.display_templates([hit.template for hit in hits], category, self._hit_spans(hits))
+    
+    def _on_more_search_results(self, hits: list) -> None:
+        """Дописать следующую часть результатов поиска (в главном потоке)"""
+        if self._results_frame is not None:
+            self._queue_template_widgets([hit.template for hit in hits], spans=self._hit_spans(hits))
+    
+    @staticmethod
+    def _hit_spans(hits: list) -> dict:
+        """Позиции совпадений по ID шаблона (для подсветки в карточках)"""
+        return {hit.template.get('id'): hit.spans for hit in hits if hit.spans}
+    
+    def _on_index_built(self) -> None:
+        """Индекс построен: повторить поиск, выполненный просмотром шаблонов, и показать теги"""
+        if self.search_query or self.selected_tags:
+            self.update_templates_display()
+        elif not self.search_everywhere_var.get():
+            # Список шаблонов не меняется - только счётчики тегов на панели
+            self._update_tag_bar(self.category_header.get_selected_category())
+    
+    def display_templates(self, templates: list, current_category: str, spans: dict = None) -> None:
+        """Показать шаблоны категории (или результаты поиска в ней; spans: ID -> совпадения)"""
         if not templates:
             # Плейсхолдер для пустой категории
             if self.search_query:
@@ -1190,7 +1399,32 @@ class MainWindow:
         content_container.pack(fill=ctk.BOTH, expand=True)
         
         # Создание современной прокручиваемой области
-        self.create_modern_scrollable_frame(templates, content_container, current_category)
+        self.create_modern_scrollable_frame(templates, content_container, current_category,
+                                            spans=spans)
+    
+    def display_global_search_results(self, hits: list) -> None:
+        """Результаты глобального поиска по всем категориям обоих типов"""
+        if not hits:
+            empty_label = ctk.CTkLabel(
+                self.templates_frame, 
+                text=f'Ничего не найдено: "{self.search_query}"', 
+                text_color="#a0a0a0",
+                font=("Segoe UI", 12)
+            )
+            empty_label.pack(expand=True, pady=100)
+            return
+        
+        # Рядом с названием показываем, где лежит каждый шаблон
+        templates = [hit.template for hit in hits]
+        locations = {
+            hit.template.get('id'): f"{hit.category_type} › {hit.category}"
+            for hit in hits
+        }
+        
+        content_container = ctk.CTkFrame(self.templates_frame, fg_color="transparent")
+        content_container.pack(fill=ctk.BOTH, expand=True)
+        self.create_modern_scrollable_frame(templates, content_container, None, locations,
+                                            self._hit_spans(hits))
     
     def force_update_templates_display(self) -> None:
         """Принудительное обновление отображения"""
@@ -1198,8 +1432,12 @@ class MainWindow:
         self._last_search_query = None
         self.update_templates_display()
     
-    def create_modern_scrollable_frame(self, templates: list, parent_container, current_category: str) -> None:
-        """Создание современной прокручиваемой области для шаблонов"""
+    def create_modern_scrollable_frame(self, templates: list, parent_container, current_category: str,
+                                       locations: dict = None, spans: dict = None) -> None:
+        """
+        Создание современной прокручиваемой области для шаблонов
+        (locations: ID -> где лежит, spans: ID -> позиции совпадений для подсветки)
+        """
         # ОПТИМИЗАЦИЯ: Поиск уже выполнен в update_templates_display,
         # если используются search_results, то фильтрация уже сделана
         filtered_templates = templates
@@ -1270,35 +1508,53 @@ class MainWindow:
         scrollable_frame.bind("<Button-4>", on_mousewheel)
         scrollable_frame.bind("<Button-5>", on_mousewheel)
         
-        # Отображение каждого шаблона
-        templates_full = self.template_manager.get_templates_cached(current_category)
-        for idx, template in enumerate(filtered_templates):
-            # Найди реальный индекс в полном списке
-            real_idx = None
-            for full_idx, full_tpl in enumerate(templates_full):
-                if full_tpl.get('title') == template.get('title'):
-                    real_idx = full_idx
-                    break
-            
+        # Упаковка элементов
+        canvas.pack(side="left", fill="both", expand=True, padx=(0, 5))
+        scrollbar.pack(side="right", fill="y")
+        
+        # Отображение каждого шаблона (операции над шаблоном идут по его ID):
+        # первый экран - сразу, остальное - небольшими порциями в цикле событий
+        self._results_frame = scrollable_frame
+        self._queue_template_widgets(filtered_templates, locations, UI_CONFIG.RENDER_FIRST_BATCH,
+                                     spans)
+    
+    def _queue_template_widgets(self, templates: list, locations: dict = None,
+                                batch: int = 0, spans: dict = None) -> None:
+        """Поставить карточки шаблонов в очередь отрисовки (batch - нарисовать сразу)"""
+        for template in templates:
+            template_id = template.get('id')
+            location = locations.get(template_id) if locations else None
+            match_spans = spans.get(template_id, ()) if spans else ()
+            self._render_queue.append((template, location, match_spans))
+        if batch:
+            self._render_template_widgets(batch)
+        elif self._render_timer is None:
+            self._render_timer = self.root.after(1, self._render_template_widgets)
+    
+    def _render_template_widgets(self, batch: int = None) -> None:
+        """Нарисовать очередную порцию карточек и запланировать следующую"""
+        self._render_timer = None
+        for _ in range(min(batch or UI_CONFIG.RENDER_BATCH, len(self._render_queue))):
+            template, location, match_spans = self._render_queue.popleft()
             TemplateWidget(
-                parent=scrollable_frame,
+                parent=self._results_frame,
                 template=template,
-                template_index=real_idx,
                 copy_callback=self.copy_template_text,
-                edit_callback=self.edit_template_with_index,
+                edit_callback=self.edit_template_from_widget,
                 pin_callback=self.toggle_pin_template_by_name,
-                stats_callback=self.show_template_stats
+                stats_callback=self.show_template_stats,
+                location=location,
+                match_spans=match_spans
             )
-        
-        # Упаковка элементов
-        canvas.pack(side="left", fill="both", expand=True, padx=(0, 5))
-        scrollbar.pack(side="right", fill="y")
+        if self._render_queue:
+            self._render_timer = self.root.after(1, self._render_template_widgets)
     
     def display_top_used_templates(self, parent_container, category: str) -> None:
         """Отображение топ 3 используемых шаблонов"""
         top_templates = self.template_manager.get_top_used_templates(category, limit=3)
         
-        if not top_templates or sum(t.get('stats', {}).get('usage_count', 0) for t in top_templates) == 0:
+        usage_counts = [self.template_manager.get_usage_count(t) for t in top_templates]
+        if not top_templates or sum(usage_counts) == 0:
             # Не показываем, если нет использованных шаблонов
             return
         
@@ -1319,8 +1575,7 @@ class MainWindow:
         header_label.pack(anchor="w")
         
         # Список топ шаблонов
-        for idx, template in enumerate(top_templates, 1):
-            usage_count = template.get('stats', {}).get('usage_count', 0)
+        for idx, (template, usage_count) in enumerate(zip(top_templates, usage_counts), 1):
             if usage_count == 0:
                 continue
             
@@ -1347,14 +1602,22 @@ class MainWindow:
             )
             info_label.pack(side=ctk.LEFT, fill=ctk.X, expand=True)
     
+    def _template_location(self, template: dict):
+        """(тип, категория) шаблона: по ID, иначе текущие тип и категория"""
+        location = self.template_manager.get_template_location(template.get('id'))
+        if location:
+            return location
+        return (self.template_manager.current_category_type,
+                self.category_header.get_selected_category())
+    
     def copy_template_text(self, template: dict) -> None:
         """Копирование текста шаблона в буфер обмена и увеличение счётчика использования"""
         text = template.get('text', '')
         if copy_to_clipboard(self.root, text):
             # Увеличиваем счётчик использования (без перерисовки)
-            current_category = self.category_header.get_selected_category()
-            if current_category:
-                self.template_manager.increment_usage(current_category, template)
+            category_type, category = self._template_location(template)
+            if category:
+                self.template_manager.increment_usage(category, template, category_type)
             self.show_status_message("✓ Текст скопирован")
         else:
             self.show_status_message("✗ Ошибка копирования")
@@ -1371,20 +1634,15 @@ class MainWindow:
             self.show_status_message("✗ Ошибка закрепления")
     
     def toggle_pin_template_by_name(self, template: dict) -> None:
-        """Переключение закрепления шаблона (по названию)"""
-        current_category = self.category_header.get_selected_category()
-        if not current_category:
+        """Переключение закрепления шаблона (по ID, в его собственной категории)"""
+        category_type, category = self._template_location(template)
+        if not category:
             return
         
-        if self.template_manager.toggle_pin_template_by_name(current_category, template):
+        if self.template_manager.toggle_pin_template_by_name(category, template, category_type):
             # Получаем новое состояние шаблона (ПОСЛЕ переключения)
-            templates = self.template_manager.get_templates(current_category)
-            for tpl in templates:
-                if tpl.get('title') == template.get('title'):
-                    is_pinned = tpl.get('pinned', False)
-                    break
-            else:
-                is_pinned = False
+            tpl = self.template_manager.get_template_by_id(template.get('id'))
+            is_pinned = tpl.get('pinned', False) if tpl else False
             
             # Обновляем отображение после изменения закрепления
             self.force_update_templates_display()
@@ -1397,28 +1655,16 @@ class MainWindow:
         else:
             self.show_status_message("✗ Ошибка закрепления")
     
-    def edit_template_with_index(self, template: dict, template_index: int = None) -> None:
-        """Редактирование шаблона с индексом или по названию"""
-        current_category = self.category_header.get_selected_category()
-        if not current_category:
-            return
-        
-        # Если индекс не передан, ищем по названию (для обратной совместимости)
-        if template_index is None:
-            templates = self.template_manager.get_templates(current_category)
-            for idx, tpl in enumerate(templates):
-                if tpl.get('title') == template.get('title'):
-                    template_index = idx
-                    break
-        
-        if template_index is None:
+    def edit_template_from_widget(self, template: dict) -> None:
+        """Редактирование шаблона из карточки (по его ID)"""
+        template_id = template.get('id')
+        if template_id is None:
             self.show_status_message("✗ Шаблон не найден")
             return
         
-        # Вызываем оригинальный метод редактирования
-        self.edit_template(template_index)
+        self.edit_template(template_id)
     
-    def edit_template(self, template_index: int) -> None:
+    def edit_template(self, template_id: str) -> None:
         """Редактирование выбранного шаблона"""
         # Проверка: если диалог уже открыт, не создавать новый
         if self.edit_template_dialog_open:
@@ -1429,14 +1675,15 @@ class MainWindow:
             self.show_status_message("⚠ Сначала выберите категорию")
             return
         
-        templates = self.template_manager.get_templates(current_category)
-        if not templates or template_index >= len(templates) or template_index < 0:
+        template = self.template_manager.get_template_by_id(template_id)
+        if template is None:
             self.show_status_message("⚠ Ошибка: шаблон не найден")
             return
         
-        self.edit_template_dialog_open = True
+        # Из глобального поиска шаблон может быть из другой категории
+        current_category = self.template_manager.get_template_category(template_id)
         
-        template = templates[template_index]
+        self.edit_template_dialog_open = True
         
         # Обработчик закрытия окна
         def on_close():
@@ -1477,6 +1724,21 @@ class MainWindow:
         title_entry.insert("1.0", template['title'])
         self.setup_context_menu_for_widget(title_entry)
         
+        # Поле для тегов шаблона
+        ctk.CTkLabel(main_frame, text="Теги (через запятую):", text_color="white").pack(anchor="w", pady=(0, 3))
+        
+        tags_entry = ctk.CTkEntry(
+            main_frame,
+            font=("Segoe UI", 12),
+            text_color="white",
+            fg_color="#2b2b2b",
+            border_color="#404040",
+            border_width=1
+        )
+        tags_entry.pack(fill=ctk.X, pady=(0, 15))
+        tags_entry.insert(0, ", ".join(template.get('tags', [])))
+        self.setup_context_menu_for_widget(tags_entry)
+        
         # Поле для текста шаблона
         ctk.CTkLabel(main_frame, text="Текст шаблона:", text_color="white").pack(anchor="w", pady=(10, 3))
         
@@ -1501,6 +1763,7 @@ class MainWindow:
         def on_save():
             template_title = title_entry.get("1.0", ctk.END).strip()
             template_text = text_widget.get("1.0", ctk.END).strip()
+            template_tags = self.template_manager.clean_tags(tags_entry.get())
             
             if not template_title:
                 self.show_status_message("✗ Введите название")
@@ -1510,9 +1773,8 @@ class MainWindow:
                 self.show_status_message("✗ Введите текст")
                 return
             
-            if self.template_manager.edit_template(current_category, template_index, template_title, template_text):
-                # ОПТИМИЗАЦИЯ: Обновляем индекс поиска
-                self.search_indexer.build_index(self.template_manager)
+            if self.template_manager.edit_template_by_id(template_id, template_title, template_text,
+                                                         template_tags):
                 self.show_status_message("✓ Шаблон обновлен")
                 self.force_update_templates_display()
                 self.edit_template_dialog_open = False
@@ -1540,9 +1802,7 @@ class MainWindow:
             btn_confirm_frame.pack(pady=10)
             
             def confirm_delete():
-                if self.template_manager.delete_template(current_category, template_index):
-                    # ОПТИМИЗАЦИЯ: Обновляем индекс поиска
-                    self.search_indexer.build_index(self.template_manager)
+                if self.template_manager.delete_template_by_id(template_id):
                     self.show_status_message("✓ Шаблон удален")
                     self.force_update_templates_display()
                     confirm_dialog.destroy()
@@ -1598,7 +1858,7 @@ class MainWindow:
             
             if has_update:
                 # Вызываем диалог в главном потоке
-                self.root.after(0, lambda: self.show_update_dialog(remote_version, download_url))
+                self.dispatcher.post(self.show_update_dialog, remote_version, download_url)
         except Exception as e:
             print(f"Ошибка при проверке обновлений: {e}")
     
@@ -1704,29 +1964,32 @@ class MainWindow:
     def _download_and_install(self, download_url, progress_bar, dialog):
         """Скачать и установить обновление"""
         def update_progress(value):
-            # Обновляем прогресс в главном потоке
-            self.root.after(0, lambda: progress_bar.set(value / 100))
+            # Обновляем прогресс в главном потоке (частые вызовы схлопываются)
+            self.dispatcher.post(progress_bar.set, value / 100, key=progress_bar)
         
         # Скачиваем обновление
         success, update_path = AppUpdater.download_update(download_url, update_progress)
         
         if success:
-            # Закрываем диалог
-            self.root.after(0, dialog.destroy)
-            # Устанавливаем обновление
-            self.root.after(100, lambda: AppUpdater.install_update(self.root))
+            # Закрываем диалог и устанавливаем обновление
+            self.dispatcher.post(self._finish_update, dialog)
         else:
             # Показываем ошибку
-            self.root.after(0, lambda: self._show_update_error(dialog))
+            self.dispatcher.post(self._show_update_error, dialog)
+    
+    def _finish_update(self, dialog):
+        """Закрыть диалог загрузки и запустить установку (в главном потоке)"""
+        dialog.destroy()
+        self.root.after(100, lambda: AppUpdater.install_update(self.root))
     
     def show_template_stats(self, template: dict) -> None:
         """Показать статистику использования шаблона"""
-        current_category = self.category_header.get_selected_category()
-        if not current_category:
+        category_type, category = self._template_location(template)
+        if not category:
             return
         
         # Получаем статистику
-        stats = self.template_manager.get_template_stats(current_category, template)
+        stats = self.template_manager.get_template_stats(category, template, category_type)
         usage_count = stats.get('usage_count', 0) if stats else 0
         
         # Создаём диалоговое окно
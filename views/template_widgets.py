@@ -2,12 +2,25 @@
 Виджеты для отображения шаблонов и категорий
 """
 import customtkinter as ctk
-from typing import Callable
-from config.constants import COLORS, FONTS, SIZES
+import tkinter
+from typing import Callable, Dict, Sequence, Set
+from config.constants import COLORS, FONTS, SIZES, UI_CONFIG
 from config.settings import EMOJI
+from models.search_indexer import FIELD_TEXT, FIELD_TITLE
 from utils.icon_generator import EmojiIconButton
 
 
+# Tk до 8.7 считает символы вне BMP (эмодзи) за два при адресации текста
+_TK_SURROGATE_PAIRS = tkinter.TkVersion < 8.7
+
+
+def _tk_index(text: str, offset: int) -> str:
+    """Индекс Tk для смещения offset (в символах Python) в тексте"""
+    if _TK_SURROGATE_PAIRS:
+        offset += sum(1 for char in text[:offset] if ord(char) > 0xFFFF)
+    return f"1.0 + {offset} chars"
+
+
 class ClickableComboBox(ctk.CTkComboBox):
     """
     Расширенный ComboBox, который открывается по клику на основное поле
@@ -105,24 +118,26 @@ class TemplateWidget:
     
     Attributes:
         parent: Родительский виджет
-        template (dict): Данные шаблона (title, text, pinned, stats)
-        template_index (int): Индекс шаблона в списке
+        template (dict): Данные шаблона (id, title, text, pinned, stats)
         copy_callback (Callable): Функция для копирования текста
         edit_callback (Callable): Функция для редактирования шаблона
         pin_callback (Callable): Функция для закрепления шаблона
         stats_callback (Callable): Функция для показа статистики
+        match_spans (Sequence[MatchSpan]): Позиции совпадений с поисковым запросом
     """
     
-    def __init__(self, parent, template: dict, template_index: int, 
+    def __init__(self, parent, template: dict,
                  copy_callback: Callable, edit_callback: Callable, pin_callback: Callable,
-                 stats_callback: Callable = None):
+                 stats_callback: Callable = None, location: str = None,
+                 match_spans: Sequence = ()):
         self.parent = parent
         self.template = template
-        self.template_index = template_index
         self.copy_callback = copy_callback
         self.edit_callback = edit_callback
         self.pin_callback = pin_callback
         self.stats_callback = stats_callback
+        self.location = location  # "Тип › Категория" для глобального поиска
+        self.match_spans = match_spans or ()
         
         self.create_widget()
     
@@ -141,15 +156,37 @@ class TemplateWidget:
         title_frame.pack(fill=ctk.X, pady=(SIZES.PADDING_LARGE, SIZES.PADDING_MEDIUM), 
                         padx=SIZES.PADDING_LARGE)
         
-        # Название шаблона
+        # Название шаблона (выделено цветом, если совпало с запросом)
+        title_matched = any(span.field == FIELD_TITLE for span in self.match_spans)
         title_label = ctk.CTkLabel(
             title_frame, 
             text=self.template['title'], 
             font=FONTS.SUBTITLE,
-            text_color=COLORS.TEXT_PRIMARY
+            text_color=COLORS.HIGHLIGHT_TEXT if title_matched else COLORS.TEXT_PRIMARY
         )
         title_label.pack(side=ctk.LEFT, expand=True, anchor="w")
         
+        # Где лежит шаблон (в результатах глобального поиска)
+        if self.location:
+            location_label = ctk.CTkLabel(
+                title_frame,
+                text=self.location,
+                font=FONTS.SMALL,
+                text_color=COLORS.TEXT_MUTED
+            )
+            location_label.pack(side=ctk.LEFT, padx=(SIZES.PADDING_MEDIUM, 0))
+        
+        # Теги шаблона
+        tags = self.template.get('tags')
+        if tags:
+            tags_label = ctk.CTkLabel(
+                title_frame,
+                text=" ".join(f"#{tag}" for tag in tags),
+                font=FONTS.SMALL,
+                text_color=COLORS.INFO
+            )
+            tags_label.pack(side=ctk.LEFT, padx=(SIZES.PADDING_MEDIUM, 0))
+        
         # Кнопка закрепления (звездочка)
         is_pinned = self.template.get('pinned', False)
         pin_emoji_char = "⭐" if is_pinned else "☆"
@@ -188,7 +225,7 @@ class TemplateWidget:
             text="Редактировать",
             image=edit_img,
             compound="left",
-            command=lambda: self.edit_callback(self.template, self.template_index),
+            command=lambda: self.edit_callback(self.template),
             width=150,
             height=SIZES.BUTTON_HEIGHT,
             corner_radius=SIZES.CORNER_RADIUS_SMALL
@@ -209,8 +246,93 @@ class TemplateWidget:
             font=FONTS.TEXT
         )
         self.text_widget.insert("1.0", self.template['text'])
+        self.highlight_matches()
         self.text_widget.configure(state="disabled")
         self.text_widget.pack(fill=ctk.BOTH, expand=True)
+    
+    def highlight_matches(self) -> None:
+        """
+        Подсветить совпадения в тексте по позициям из индекса.
+        
+        Текст прокручивается к первому совпадению, чтобы в карточке
+        был виден фрагмент вокруг него, а не только начало шаблона.
+        """
+        text = self.template['text']
+        spans = [span for span in self.match_spans if span.field == FIELD_TEXT]
+        if not spans:
+            return
+        
+        self.text_widget.tag_config("match", background=COLORS.HIGHLIGHT_BG,
+                                    foreground=COLORS.HIGHLIGHT_TEXT)
+        for span in spans:
+            self.text_widget.tag_add("match", _tk_index(text, span.start), _tk_index(text, span.end))
+        self.text_widget.see(_tk_index(text, spans[0].start))
+
+
+class TagFilterBar:
+    """
+    Панель фильтра по тегам с числом результатов у каждого тега
+    
+    Скрыта, пока показывать нечего. Выбранные теги идут первыми
+    и остаются на панели, даже если в результате их больше нет.
+    
+    Attributes:
+        parent: Родительский виджет
+        on_toggle (Callable): Обработчик выбора/снятия тега (получает тег)
+        before: Виджет, перед которым панель размещается при показе
+    """
+    
+    def __init__(self, parent, on_toggle: Callable, before=None):
+        self.parent = parent
+        self.on_toggle = on_toggle
+        self.before = before
+        self.frame = ctk.CTkFrame(parent, fg_color="transparent")
+        self.visible = False
+    
+    def update_tags(self, counts: Dict[str, int], selected: Set[str]) -> None:
+        """
+        Показать теги с числом результатов
+        
+        Args:
+            counts: Тег -> число результатов (частые первыми)
+            selected: Выбранные теги
+        """
+        for widget in self.frame.winfo_children():
+            widget.destroy()
+        
+        others = [tag for tag in counts if tag not in selected][:UI_CONFIG.TAG_BAR_LIMIT]
+        tags = sorted(selected, key=str.casefold) + others
+        if not tags:
+            self._set_visible(False)
+            return
+        
+        for tag in tags:
+            is_selected = tag in selected
+            ctk.CTkButton(
+                self.frame,
+                text=f"#{tag}  {counts.get(tag, 0)}",
+                command=lambda t=tag: self.on_toggle(t),
+                width=0,
+                height=24,
+                font=FONTS.SMALL,
+                corner_radius=SIZES.CORNER_RADIUS_SMALL,
+                fg_color=COLORS.ACCENT_BLUE if is_selected else COLORS.BG_LIGHT,
+                hover_color=COLORS.HOVER_LIGHT,
+                text_color=COLORS.TEXT_PRIMARY
+            ).pack(side=ctk.LEFT, padx=(0, SIZES.PADDING_SMALL))
+        self._set_visible(True)
+    
+    def _set_visible(self, visible: bool) -> None:
+        """Показать или скрыть панель"""
+        if visible == self.visible:
+            return
+        if visible:
+            self.frame.pack(fill=ctk.X, padx=SIZES.PADDING_MEDIUM, pady=(0, SIZES.PADDING_SMALL),
+                            before=self.before)
+        else:
+            self.frame.pack_forget()
+        self.visible = visible
+
 
 class CategoryHeader:
     """